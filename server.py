@@ -0,0 +1,34 @@
+"""
+GRC Brain AI - Headless HTTP API entry point
+Serves the RAG + LLM pipeline over HTTP (see src/api/http_server.py).
+Run: python server.py --port 8765 [--ollama-host http://localhost:11434]
+"""
+import asyncio
+import argparse
+from src.ai_core.services import ServiceContainer
+from src.api.http_server import GRCBrainServer
+
+def main():
+    parser = argparse.ArgumentParser(description="GRC Brain AI headless API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ollama-host", default="http://localhost:11434")
+    parser.add_argument("--model", default="llama3:8b")
+    parser.add_argument("--db-path", default="chromadb")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent jobs (retrieval + generation)")
+    parser.add_argument("--queue-size", type=int, default=64, help="Queued jobs before answering 503")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request deadline in seconds")
+    parser.add_argument("--ingest-root", default=None, help="Folder /ingest may read from (omit to disable /ingest)")
+    args = parser.parse_args()
+    services = ServiceContainer(db_path=args.db_path, ollama_host=args.ollama_host, model=args.model).start()
+    server = GRCBrainServer(services, host=args.host, port=args.port, workers=args.workers,
+                            queue_size=args.queue_size, request_timeout=args.timeout,
+                            ingest_root=args.ingest_root)
+    print(f"GRC Brain AI API listening on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+answer_cache.py - Semantic answer cache in front of GRCBrainLLM.ask
+An answer is reused when a new question is close enough (cosine similarity of the query
+embeddings) and was asked against the same retrieved context. Entries live in SQLite,
+are evicted least-recently-used, and are dropped when the model or the KB version changes.
+"""
+import time
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+
+def context_fingerprint(context, language="auto"):
+    digest = hashlib.sha256(language.encode("utf-8"))
+    if isinstance(context, list):
+        for c in context:
+            # Chat-memory hits change after every answer; only document chunks identify the context
+            if (c.get("metadata") or {}).get("source") == "chat":
+                continue
+            digest.update(b"\x00" + c.get("content", "").encode("utf-8"))
+    elif context:
+        digest.update(b"\x00" + str(context).encode("utf-8"))
+    return digest.hexdigest()
+
+class SemanticAnswerCache:
+    def __init__(self, path="answer_cache.sqlite3", embeddings=None, kb_version=None, threshold=0.95, max_entries=2000):
+        """
+        embeddings: object with embed_query(text) (the RAG embeddings, so vectors are cached too)
+        kb_version: callable returning the current knowledge-base version string
+        """
+        self.path = path
+        self.embeddings = embeddings
+        self.kb_version = kb_version or (lambda: "")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "id INTEGER PRIMARY KEY, model TEXT NOT NULL, kb_version TEXT NOT NULL, context_fp TEXT NOT NULL, "
+            "query TEXT NOT NULL, vector BLOB NOT NULL, answer TEXT NOT NULL, created REAL, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_scope ON answers (model, kb_version, context_fp)")
+        self._conn.commit()
+        self._scope = None      # (model, kb_version) the in-memory index was loaded for
+        self._ids = []
+        self._fps = []
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+
+    def lookup(self, model, query, context=None, language="auto"):
+        """Return a cached answer or None."""
+        vector = self._embed(query)
+        fp = context_fingerprint(context, language)
+        with self._lock:
+            self._load_scope(model)
+            if not self._ids:
+                self.misses += 1
+                return None
+            scores = self._matrix @ vector
+            mask = np.fromiter((f == fp for f in self._fps), dtype=bool, count=len(self._fps))
+            scores[~mask] = -1.0
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            row_id = self._ids[best]
+            row = self._conn.execute("SELECT answer FROM answers WHERE id = ?", (row_id,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE answers SET last_used = ? WHERE id = ?", (time.time(), row_id))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def store(self, model, query, context, answer, language="auto"):
+        if not answer or answer.startswith("[ERROR]"):
+            return
+        vector = self._embed(query)
+        fp = context_fingerprint(context, language)
+        now = time.time()
+        with self._lock:
+            self._load_scope(model)
+            cur = self._conn.execute(
+                "INSERT INTO answers (model, kb_version, context_fp, query, vector, answer, created, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (model, self._scope[1], fp, query, vector.tobytes(), answer, now, now)
+            )
+            self._ids.append(cur.lastrowid)
+            self._fps.append(fp)
+            self._matrix = vector[None, :] if self._matrix.size == 0 else np.vstack([self._matrix, vector])
+            overflow = len(self._ids) - self.max_entries
+            if overflow > 0:
+                # Least recently used answers go first
+                stale = [r[0] for r in self._conn.execute("SELECT id FROM answers ORDER BY last_used LIMIT ?", (overflow,))]
+                self._conn.executemany("DELETE FROM answers WHERE id = ?", [(i,) for i in stale])
+                stale = set(stale)
+                keep = [i for i, row_id in enumerate(self._ids) if row_id not in stale]
+                self._ids = [self._ids[i] for i in keep]
+                self._fps = [self._fps[i] for i in keep]
+                self._matrix = self._matrix[keep]
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
+            self._scope = None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"entries": len(self._ids), "hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def _embed(self, text):
+        vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _load_scope(self, model):
+        """(Re)load the in-memory index; answers from another model or KB version are purged."""
+        scope = (model, str(self.kb_version()))
+        if scope == self._scope:
+            return
+        self._conn.execute("DELETE FROM answers WHERE model != ? OR kb_version != ?", scope)
+        self._conn.commit()
+        rows = self._conn.execute("SELECT id, context_fp, vector FROM answers").fetchall()
+        self._ids = [r[0] for r in rows]
+        self._fps = [r[1] for r in rows]
+        self._matrix = np.vstack([np.frombuffer(r[2], dtype=np.float32) for r in rows]) if rows else np.zeros((0, 0), dtype=np.float32)
+        self._scope = scope
@@ -0,0 +1,186 @@
+"""
+batch.py - Batch question runner for regulatory questionnaires
+Reads questions from CSV/TXT/JSONL, retrieves context for many questions per vectorized
+search_batch call, runs generations concurrently against Ollama and appends every answer
+to a JSONL checkpoint as soon as it is ready, so an interrupted run resumes where it
+stopped. The final CSV or JSONL output keeps the input order.
+"""
+import os
+import csv
+import json
+import time
+import asyncio
+
+def read_questions(path, column="question", id_column="id"):
+    """Returns [{"id": ..., "question": ...}] in file order; blank questions are skipped."""
+    ext = os.path.splitext(path)[1].lower()
+    items = []
+    if ext == ".csv":
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            reader = csv.DictReader(f)
+            fields = reader.fieldnames or []
+            if column not in fields:
+                if not fields:
+                    return []
+                # No "question" header: use the first column
+                column = fields[0]
+            for number, row in enumerate(reader, start=1):
+                items.append({"id": (row.get(id_column) or "").strip() or str(number), "question": (row.get(column) or "").strip()})
+    elif ext == ".jsonl":
+        with open(path, "r", encoding="utf-8") as f:
+            for number, line in enumerate(f, start=1):
+                if line.strip():
+                    row = json.loads(line)
+                    items.append({"id": str(row.get(id_column) or number), "question": str(row.get(column, "")).strip()})
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            for number, line in enumerate(f, start=1):
+                items.append({"id": str(number), "question": line.strip()})
+    items = [item for item in items if item["question"]]
+    # Ids key the checkpoint, so they must be unique
+    seen = {}
+    for item in items:
+        n = seen.get(item["id"], 0)
+        seen[item["id"]] = n + 1
+        if n:
+            item["id"] = f"{item['id']}#{n + 1}"
+    return items
+
+def sources_of(context):
+    sources = []
+    for c in context or []:
+        meta = c.get("metadata") or {}
+        src = meta.get("source", "")
+        if not src:
+            continue
+        # Point at the page / rows / lines the chunk came from when the loader recorded it
+        where = next((f"{key} {meta[key]}" for key in ("page", "rows", "lines", "paragraphs") if meta.get(key)), "")
+        label = f"{src} ({where})" if where else src
+        if label not in sources:
+            sources.append(label)
+    return sources
+
+class BatchRunner:
+    def __init__(self, rag, llm, k=3, concurrency=4, retrieval_batch=64, language="en", filters=None):
+        self.rag = rag
+        self.llm = llm
+        self.k = k
+        self.concurrency = concurrency
+        self.retrieval_batch = retrieval_batch
+        self.language = language
+        # Chunk metadata filters for every retrieval, e.g. {"framework": "GDPR"}
+        self.filters = filters
+
+    @staticmethod
+    def checkpoint_path(output):
+        return f"{output}.checkpoint.jsonl"
+
+    @staticmethod
+    def load_checkpoint(path):
+        """Answered results by question id. Failed answers are not kept, so they are retried."""
+        done = {}
+        if not os.path.exists(path):
+            return done
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    # A run killed mid-write leaves a partial last line
+                    continue
+                if not row.get("error"):
+                    done[row["id"]] = row
+        return done
+
+    def run(self, questions, output, resume=True, progress=None):
+        """
+        Answer every question and write output (.csv or .jsonl). progress(done, total, rate)
+        is called after each answer; rate is questions per hour. Returns a summary dict.
+        """
+        checkpoint = self.checkpoint_path(output)
+        done = self.load_checkpoint(checkpoint) if resume else {}
+        if not resume and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        todo = [q for q in questions if q["id"] not in done]
+        started = time.perf_counter()
+        summary = {"total": len(questions), "resumed": len(questions) - len(todo), "answered": 0, "failed": 0}
+        if todo:
+            asyncio.run(self._run(todo, checkpoint, done, summary, started, progress))
+        summary["seconds"] = time.perf_counter() - started
+        summary["per_hour"] = summary["answered"] / summary["seconds"] * 3600 if summary["seconds"] else 0.0
+        self.write_output(questions, done, output)
+        if summary["failed"] == 0 and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        summary["output"] = output
+        return summary
+
+    async def _run(self, todo, checkpoint, done, summary, started, progress):
+        # Retrieval runs ahead of generation, but never more than a few batches ahead
+        jobs = asyncio.Queue(maxsize=max(self.retrieval_batch, self.concurrency * 2))
+        total = len(todo)
+        with open(checkpoint, "a", encoding="utf-8") as out:
+            async def retrieve():
+                for i in range(0, len(todo), self.retrieval_batch):
+                    batch = todo[i:i + self.retrieval_batch]
+                    try:
+                        contexts = await asyncio.to_thread(self.rag.search_batch, [q["question"] for q in batch], self.k, self.filters)
+                    except Exception as e:
+                        contexts = [e] * len(batch)
+                    for item, context in zip(batch, contexts):
+                        await jobs.put((item, context))
+                for _ in range(self.concurrency):
+                    await jobs.put(None)
+
+            async def generate():
+                while True:
+                    job = await jobs.get()
+                    if job is None:
+                        return
+                    item, context = job
+                    t0 = time.perf_counter()
+                    if isinstance(context, Exception):
+                        answer, context = f"[ERROR] Retrieval failed: {context}", []
+                    else:
+                        answer = await self.llm.aask(item["question"], context=context, language=self.language)
+                    row = {
+                        "id": item["id"],
+                        "question": item["question"],
+                        "answer": answer,
+                        "sources": sources_of(context),
+                        "seconds": round(time.perf_counter() - t0, 3),
+                        "error": answer.startswith("[ERROR]")
+                    }
+                    out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                    out.flush()
+                    if row["error"]:
+                        summary["failed"] += 1
+                    else:
+                        summary["answered"] += 1
+                        done[item["id"]] = row
+                    if progress:
+                        count = summary["answered"] + summary["failed"]
+                        elapsed = time.perf_counter() - started
+                        progress(count, total, count / elapsed * 3600 if elapsed else 0.0)
+
+            try:
+                await asyncio.gather(retrieve(), *(generate() for _ in range(self.concurrency)))
+            finally:
+                # The async Ollama pool is bound to this loop, which asyncio.run() is about to close
+                await self.llm.client.aclose()
+
+    @staticmethod
+    def write_output(questions, done, output):
+        """Write answered questions in input order; unanswered ones are left out."""
+        rows = [done[q["id"]] for q in questions if q["id"] in done]
+        folder = os.path.dirname(os.path.abspath(output))
+        os.makedirs(folder, exist_ok=True)
+        if output.lower().endswith(".csv"):
+            with open(output, "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["id", "question", "answer", "sources", "seconds"])
+                for row in rows:
+                    writer.writerow([row["id"], row["question"], row["answer"], "; ".join(row["sources"]), row["seconds"]])
+        else:
+            with open(output, "w", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps({key: row[key] for key in ("id", "question", "answer", "sources", "seconds")}, ensure_ascii=False) + "\n")
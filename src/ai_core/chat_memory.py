@@ -0,0 +1,115 @@
+"""
+chat_memory.py - Write-behind buffer for conversational memory
+Answered Q/A pairs are queued here instead of being embedded and written to the chat
+memory collection while the user waits. A background thread flushes them with one
+batched embedding + add_documents call when enough turns are pending or after a few
+seconds, and at exit. Greetings, failed answers and repeats are never stored; asking
+the same question again replaces the stored answer instead of adding another one.
+"""
+import atexit
+import hashlib
+import threading
+from src.ai_core.llm_client import is_conversational
+
+def _normalize(text):
+    return " ".join(text.lower().split())
+
+class ChatMemoryBuffer:
+    def __init__(self, rag, max_pending=16, flush_interval=10.0, enabled=True):
+        self.rag = rag
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.enabled = enabled
+        self.flushed = 0
+        self.dropped = 0
+        self._pending = {}  # chunk id -> (question, answer), in arrival order
+        self._written = {}  # chunk id -> hash of the answer stored this session
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="ChatMemoryFlush", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @staticmethod
+    def turn_id(question):
+        # One memory per question: a new answer to it replaces the old one
+        return "chat-" + hashlib.sha256(_normalize(question).encode("utf-8")).hexdigest()[:32]
+
+    @staticmethod
+    def worth_keeping(question, answer):
+        answer = (answer or "").strip()
+        if not question.strip() or not answer or answer.startswith("[ERROR]"):
+            return False
+        return not is_conversational(question)
+
+    def add(self, question, answer):
+        """Queue one answered turn; returns False if it is not stored (retention off, low value)."""
+        if not self.enabled or self._closed or not self.worth_keeping(question, answer):
+            self.dropped += 1
+            return False
+        turn_id = self.turn_id(question)
+        answer_hash = hashlib.sha256(_normalize(answer).encode("utf-8")).hexdigest()
+        with self._lock:
+            if self._written.get(turn_id) == answer_hash and turn_id not in self._pending:
+                # Same question, same answer: already in memory
+                self.dropped += 1
+                return False
+            # Re-inserting moves a repeated question to the end with its latest answer
+            self._pending.pop(turn_id, None)
+            self._pending[turn_id] = (question, answer)
+            self._written[turn_id] = answer_hash
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+        return True
+
+    def set_enabled(self, enabled):
+        """Data retention switch: turning it off also discards turns not written yet."""
+        self.enabled = enabled
+        if not enabled:
+            with self._lock:
+                self.dropped += len(self._pending)
+                for turn_id in self._pending:
+                    self._written.pop(turn_id, None)
+                self._pending.clear()
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def flush(self):
+        """Write every pending turn now; returns how many were written."""
+        with self._write_lock:
+            with self._lock:
+                batch = self._pending
+                self._pending = {}
+            if not batch or not self.enabled:
+                return 0
+            try:
+                self.rag.add_chat_turns(list(batch.values()), ids=list(batch))
+            except Exception as e:
+                print(f"[WARNING] Could not store chat memory: {e}")
+                # Keep them for the next flush, behind anything newer for the same question
+                with self._lock:
+                    for turn_id, turn in batch.items():
+                        self._pending.setdefault(turn_id, turn)
+                return 0
+            self.flushed += len(batch)
+            return len(batch)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=30)
+        self.flush()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if not self._closed:
+                self.flush()
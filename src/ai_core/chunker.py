@@ -0,0 +1,229 @@
+"""
+chunker.py - Structure-aware, token-budgeted text chunker for RAG ingestion
+Splits on headings, paragraphs and sentences, packs sentences up to a token budget
+measured with the embedding model's tokenizer, and carries a configurable overlap.
+Works as a streaming generator: input may be one string or any iterable of text pieces.
+"""
+import re
+
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?;])\s+(?=[\"'“(\[A-Z0-9ÁÉÍÓÚÑ¿¡-])")
+_LIST_ITEM = re.compile(r"\n(?=\s*(?:[-*•]|\d+[.)]|[a-z][.)])\s)")
+_HEADING = re.compile(
+    r"^(?:#{1,6}\s+.+"                                   # Markdown heading
+    r"|\[[^\]\n]{1,80}\]"                                # [Summary]
+    r"|(?:art(?:icle|ículo|\.)?|section|sección|chapter|capítulo|annex|anexo|title|título)\s+[\w.\-]+.{0,80})$",
+    re.IGNORECASE
+)
+_HEADING_CASED = re.compile(
+    r"^(?:(?:\d+(?:\.\d+)*|[A-Z](?:\.\d+)+)\.?\s+[A-ZÁÉÍÓÚÑ][^.!?]{0,80}"  # 4.2 Scope / A.8.24 Use of cryptography
+    r"|[A-Z0-9ÁÉÍÓÚÑ][A-Z0-9ÁÉÍÓÚÑ \-–:,/&()]{2,80})$"               # ALL CAPS line
+)
+# Flush a paragraph that never ends once it grows past this many characters
+_MAX_PENDING_CHARS = 64 * 1024
+
+_tokenizers = {}
+
+def _load_tokenizer(model_name):
+    if model_name not in _tokenizers:
+        try:
+            from transformers import AutoTokenizer
+            _tokenizers[model_name] = AutoTokenizer.from_pretrained(model_name)
+        except Exception:
+            # Offline or transformers missing: fall back to the word-piece estimate
+            _tokenizers[model_name] = None
+    return _tokenizers[model_name]
+
+class StructuredChunker:
+    def __init__(self, max_tokens=256, overlap_tokens=32, model_name=None, tokenizer=None):
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.model_name = model_name
+        self._tokenizer = tokenizer
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None and self.model_name:
+            self._tokenizer = _load_tokenizer(self.model_name)
+        return self._tokenizer
+
+    def count_tokens(self, text):
+        tokenizer = self.tokenizer
+        if tokenizer is not None:
+            return len(tokenizer.encode(text, add_special_tokens=False))
+        # Roughly 1.3 word pieces per word for English/Spanish regulatory text
+        words = len(re.findall(r"\w+|[^\w\s]", text))
+        return int(words * 1.3) + 1
+
+    def iter_chunks(self, source):
+        """Yield chunk strings from a string or an iterable of text pieces."""
+        for _, chunk in self.iter_sections(source):
+            yield chunk
+
+    def iter_sections(self, source):
+        """Like iter_chunks(), but yields (heading, chunk); heading is None before the first one."""
+        heading = None
+        current = []          # [(text, tokens)] sentences of the chunk being built
+        current_tokens = 0
+        for kind, text in self._iter_blocks(source):
+            if kind == "heading":
+                if self._has_body(current, heading):
+                    yield heading, self._join(current)
+                heading = text
+                current, current_tokens = [], 0
+                continue
+            heading_tokens = self.count_tokens(heading) if heading else 0
+            # Sentences are split so that the heading plus one sentence always fits
+            for sentence in self._iter_sentences(text, max(1, self.max_tokens - heading_tokens)):
+                tokens = self.count_tokens(sentence)
+                if not current and heading:
+                    current.append((heading, heading_tokens))
+                    current_tokens = heading_tokens
+                if self._has_body(current, heading) and current_tokens + tokens > self.max_tokens:
+                    yield heading, self._join(current)
+                    current = self._overlap(current, heading)
+                    current_tokens = sum(t for _, t in current)
+                    # The carried overlap must not push the new chunk over budget
+                    start = 1 if heading else 0
+                    while len(current) > start and current_tokens + tokens > self.max_tokens:
+                        current_tokens -= current.pop(start)[1]
+                current.append((sentence, tokens))
+                current_tokens += tokens
+            if current:
+                # Paragraph boundary inside a chunk
+                current[-1] = (current[-1][0] + "\n", current[-1][1])
+        if self._has_body(current, heading):
+            yield heading, self._join(current)
+
+    @staticmethod
+    def _has_body(sentences, heading):
+        return len(sentences) > (1 if heading else 0)
+
+    def _overlap(self, sentences, heading):
+        start = 1 if heading and sentences and sentences[0][0] == heading else 0
+        carried = []
+        total = 0
+        for sentence, tokens in reversed(sentences[start:]):
+            if total + tokens > self.overlap_tokens:
+                break
+            carried.insert(0, (sentence, tokens))
+            total += tokens
+        # Never carry the whole chunk over, or the next chunk would only repeat it
+        if len(carried) == len(sentences) - start:
+            carried = carried[1:]
+        if heading:
+            carried.insert(0, (heading, self.count_tokens(heading)))
+        return carried
+
+    @staticmethod
+    def _join(sentences):
+        out = []
+        for sentence, _ in sentences:
+            if out and not out[-1].endswith("\n"):
+                out.append(" ")
+            out.append(sentence)
+        return "".join(out).strip()
+
+    def _iter_sentences(self, paragraph, budget):
+        for item in _LIST_ITEM.split(paragraph):
+            for sentence in _SENTENCE_END.split(item.strip()):
+                if not sentence.strip():
+                    continue
+                if self.count_tokens(sentence) <= budget:
+                    # Keep line breaks: table rows (CSV/XLSX segments) stay one per line
+                    yield "\n".join(" ".join(line.split()) for line in sentence.split("\n") if line.strip())
+                else:
+                    yield from self._split_long(sentence, budget)
+
+    def _split_long(self, sentence, budget):
+        # A single "sentence" above budget (tables, dumps): pack whole lines, then words
+        piece = []
+        piece_tokens = 0
+        for line in sentence.split("\n"):
+            line = " ".join(line.split())
+            if not line:
+                continue
+            tokens = self.count_tokens(line)
+            if tokens > budget:
+                if piece:
+                    yield "\n".join(piece)
+                    piece, piece_tokens = [], 0
+                yield from self._split_words(line, budget)
+                continue
+            if piece and piece_tokens + tokens > budget:
+                yield "\n".join(piece)
+                piece, piece_tokens = [], 0
+            piece.append(line)
+            piece_tokens += tokens
+        if piece:
+            yield "\n".join(piece)
+
+    def _split_words(self, line, budget):
+        piece = []
+        piece_tokens = 0
+        for word in line.split(" "):
+            tokens = self.count_tokens(word)
+            if tokens > budget and len(word) > 1:
+                # One "word" above budget (URLs, hashes): cut it into character runs
+                if piece:
+                    yield " ".join(piece)
+                    piece, piece_tokens = [], 0
+                yield from self._split_chars(word, budget)
+                continue
+            if piece and piece_tokens + tokens > budget:
+                yield " ".join(piece)
+                piece, piece_tokens = [], 0
+            piece.append(word)
+            piece_tokens += tokens
+        if piece:
+            yield " ".join(piece)
+
+    def _split_chars(self, word, budget):
+        while word:
+            size = len(word)
+            while size > 1 and self.count_tokens(word[:size]) > budget:
+                size //= 2
+            yield word[:size]
+            word = word[size:]
+
+    def _iter_blocks(self, source):
+        """Yield ("heading" | "paragraph", text), reading the source incrementally."""
+        if isinstance(source, str):
+            source = (source,)
+        pending = ""
+        for piece in source:
+            if not piece:
+                continue
+            pending += piece.replace("\r\n", "\n")
+            parts = _PARAGRAPH_BREAK.split(pending)
+            pending = parts.pop()
+            if len(pending) > _MAX_PENDING_CHARS:
+                cut = pending.rfind("\n", 0, _MAX_PENDING_CHARS)
+                if cut <= 0:
+                    cut = pending.rfind(" ", 0, _MAX_PENDING_CHARS)
+                if cut <= 0:
+                    cut = _MAX_PENDING_CHARS
+                parts.append(pending[:cut])
+                pending = pending[cut:]
+            for part in parts:
+                yield from self._classify(part)
+        if pending.strip():
+            yield from self._classify(pending)
+
+    @staticmethod
+    def _classify(block):
+        block = block.strip()
+        if not block:
+            return
+        lines = block.split("\n")
+        # A heading may sit directly above its first paragraph without a blank line
+        first = lines[0].strip()
+        if len(first) <= 100 and not first.endswith((".", ",", ";")) and (_HEADING.match(first) or _HEADING_CASED.match(first)):
+            yield ("heading", first.lstrip("#").strip())
+            rest = "\n".join(lines[1:]).strip()
+            if rest:
+                yield ("paragraph", rest)
+        else:
+            yield ("paragraph", block)
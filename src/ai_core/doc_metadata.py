@@ -0,0 +1,108 @@
+"""
+doc_metadata.py - Document-level metadata extracted at ingest time
+Detects the framework a document is about (NIST, ISO27001, GDPR, ENS, ...), its
+jurisdiction and its date from the file name and the first segment of text, and builds
+Chroma `where` clauses from simple filter dicts so searches can be narrowed by them.
+Values are plain strings/ints because Chroma metadata cannot hold lists.
+"""
+import os
+import re
+
+# (framework, default jurisdiction, pattern); order breaks ties between equal mention counts
+FRAMEWORKS = [
+    ("GDPR", "EU", re.compile(r"\bGDPR\b|\bRGPD\b|General Data Protection Regulation|Reglamento General de Protecci[oó]n de Datos", re.I)),
+    ("NIS2", "EU", re.compile(r"\bNIS ?2\b", re.I)),
+    ("ENS", "ES", re.compile(r"\bENS\b|Esquema Nacional de Seguridad|Real Decreto 311/2022")),
+    ("NIST", "US", re.compile(r"\bNIST\b|Cybersecurity Framework|\bSP 800-\d+", re.I)),
+    ("ISO27001", "International", re.compile(r"\bISO(?:/IEC)? ?2700[12]\b", re.I)),
+    ("HIPAA", "US", re.compile(r"\bHIPAA\b")),
+    ("PCI-DSS", "International", re.compile(r"\bPCI[ -]?DSS\b", re.I)),
+    ("SOX", "US", re.compile(r"\bSOX\b|Sarbanes[- ]Oxley", re.I)),
+    ("CCPA", "US", re.compile(r"\bCCPA\b|\bCPRA\b")),
+    ("CIS", "International", re.compile(r"\bCIS (?:Controls?|Benchmarks?)\b|\bCIS \d{1,2}\b")),
+    ("ENISA", "EU", re.compile(r"\bENISA\b")),
+    ("CISA", "US", re.compile(r"\bCISA\b"))
+]
+
+_JURISDICTIONS = {
+    "usa": "US", "us": "US", "united states": "US", "eu": "EU", "european union": "EU", "europe": "EU",
+    "spain": "ES", "espana": "ES", "españa": "ES", "es": "ES", "international": "International", "global": "International"
+}
+_COUNTRY_LINE = re.compile(r"^\s*(?:Country|Jurisdiction|Pa[ií]s|Jurisdicci[oó]n)\s*:\s*(.+?)\s*$", re.I | re.M)
+_ISO_DATE = re.compile(r"\b((?:19|20)\d{2})-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])\b")
+_MONTHS = {m: i for i, m in enumerate(["january", "february", "march", "april", "may", "june", "july", "august",
+                                       "september", "october", "november", "december"], start=1)}
+_TEXT_DATE = re.compile(r"\b(\d{1,2}) (" + "|".join(_MONTHS) + r") ((?:19|20)\d{2})\b|\b(" + "|".join(_MONTHS) + r") (\d{1,2}), ((?:19|20)\d{2})\b", re.I)
+
+def detect_framework(name, text):
+    """Main framework of a document: the one named in the file name, else the most mentioned."""
+    counts = []
+    # Upper-cased so acronym patterns match names like ens.txt
+    name = os.path.splitext(name)[0].replace("_", " ").replace("-", " ").upper()
+    for framework, _, pattern in FRAMEWORKS:
+        if pattern.search(name):
+            return framework
+        counts.append((len(pattern.findall(text)), framework))
+    best = max(counts, key=lambda c: c[0])
+    return best[1] if best[0] else None
+
+def detect_jurisdiction(text, framework=None):
+    match = _COUNTRY_LINE.search(text)
+    if match:
+        value = match.group(1).strip().lower()
+        if value in _JURISDICTIONS:
+            return _JURISDICTIONS[value]
+    for name, jurisdiction, _ in FRAMEWORKS:
+        if name == framework:
+            return jurisdiction
+    return None
+
+def detect_date(text):
+    """First explicit date in the text as YYYY-MM-DD, or None."""
+    match = _ISO_DATE.search(text)
+    if match:
+        return match.group(0)
+    match = _TEXT_DATE.search(text)
+    if match:
+        if match.group(1):
+            day, month, year = match.group(1), match.group(2), match.group(3)
+        else:
+            month, day, year = match.group(4), match.group(5), match.group(6)
+        return f"{year}-{_MONTHS[month.lower()]:02d}-{int(day):02d}"
+    return None
+
+def document_metadata(path, text):
+    """Metadata shared by every chunk of a document, from its name and leading text."""
+    name = os.path.basename(path)
+    framework = detect_framework(name, text)
+    metadata = {}
+    if framework:
+        metadata["framework"] = framework
+    jurisdiction = detect_jurisdiction(text, framework)
+    if jurisdiction:
+        metadata["jurisdiction"] = jurisdiction
+    date = detect_date(text)
+    if date:
+        metadata["doc_date"] = date
+        metadata["doc_year"] = int(date[:4])
+    return metadata
+
+def build_where(filters):
+    """
+    Chroma `where` clause from {"framework": "GDPR", "jurisdiction": ["EU", "ES"],
+    "doc_year": {"$gte": 2020}}: lists mean any-of, dicts are passed through as operators.
+    Returns None when there is nothing to filter on.
+    """
+    clauses = []
+    for key, value in (filters or {}).items():
+        if value is None or value == [] or value == "":
+            continue
+        if isinstance(value, dict):
+            clauses.append({key: value})
+        elif isinstance(value, (list, tuple, set)):
+            clauses.append({key: {"$in": list(value)}})
+        else:
+            clauses.append({key: {"$eq": value}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
@@ -0,0 +1,127 @@
+"""
+embedding_cache.py - Persistent, content-addressed embedding cache for RAG ingestion
+Vectors are stored as float32 blobs in SQLite, keyed by model name + SHA-256 of the text,
+so re-ingesting identical chunks costs a disk read instead of a forward pass.
+Query vectors are only kept in a bounded in-memory LRU: every question asked is a new
+text, so persisting them would grow the file without limit.
+"""
+import os
+import hashlib
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from langchain_core.embeddings import Embeddings
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    _BATCH = 500  # stay below SQLite's host parameter limit
+
+    def __init__(self, path="embedding_cache.sqlite3"):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, hash TEXT NOT NULL, dim INTEGER NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, hash)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    def get_many(self, model, hashes):
+        """Returns {hash: [float, ...]} for the hashes present in the cache."""
+        found = {}
+        hashes = list(hashes)
+        with self._lock:
+            for i in range(0, len(hashes), self._BATCH):
+                part = hashes[i:i + self._BATCH]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                    [model] + part
+                )
+                for h, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[h] = vector.tolist()
+        return found
+
+    def put_many(self, model, items):
+        """items: iterable of (hash, vector)"""
+        rows = [(model, h, len(v), array("f", v).tobytes()) for h, v in items]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def delete(self, model):
+        """Remove every vector stored for model; returns how many were removed."""
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM embeddings WHERE model = ?", (model,)).rowcount
+            self._conn.commit()
+        return removed
+
+    def count(self, model=None):
+        with self._lock:
+            if model:
+                return self._conn.execute("SELECT COUNT(*) FROM embeddings WHERE model = ?", (model,)).fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only runs the underlying model for texts not seen before."""
+
+    def __init__(self, embeddings, model_name, cache, max_queries=1024):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache
+        self.max_queries = max_queries
+        self.hits = 0
+        self.misses = 0
+        self._queries = OrderedDict()  # hash -> vector, least recently used first
+        self._query_lock = threading.Lock()
+        # Older versions persisted every query vector under "<model>#query": drop them
+        cache.delete(f"{model_name}#query")
+
+    def embed_documents(self, texts):
+        hashes = [text_hash(t) for t in texts]
+        cached = self.cache.get_many(self.model_name, set(hashes))
+        # Embed each missing text once, even if it repeats inside the batch
+        missing = {}
+        for h, t in zip(hashes, texts):
+            if h not in cached and h not in missing:
+                missing[h] = t
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            new_items = list(zip(missing.keys(), vectors))
+            self.cache.put_many(self.model_name, new_items)
+            cached.update({h: list(v) for h, v in new_items})
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+        return [cached[h] for h in hashes]
+
+    def embed_query(self, text):
+        # Kept apart from document vectors: some models embed queries differently
+        h = text_hash(text)
+        with self._query_lock:
+            vector = self._queries.get(h)
+            if vector is not None:
+                self._queries.move_to_end(h)
+                self.hits += 1
+                return list(vector)
+        self.misses += 1
+        vector = list(self.embeddings.embed_query(text))
+        with self._query_lock:
+            self._queries[h] = vector
+            while len(self._queries) > self.max_queries:
+                self._queries.popitem(last=False)
+        return vector
@@ -1,6 +1,8 @@
 """
 file_loader.py - Carga y procesamiento de archivos para RAG
 Soporta TXT, PDF, DOCX, XLSX, CSV, HTML, Markdown, JSON
+load_file() returns the whole document as one string; iter_segments() streams it as
+page/row-block sized segments with location metadata so memory stays bounded.
 """
 import os
 import pandas as pd
@@ -9,9 +11,15 @@ import markdown
 import json
 from docx import Document as DocxDocument
 from PyPDF2 import PdfReader
+from src.utils.tracing import traced
+
+# Target size of a streamed text segment (characters) and rows per table segment
+SEGMENT_CHARS = 64 * 1024
+SEGMENT_ROWS = 1000
 
 class FileLoader:
     @staticmethod
+    @traced("loader.load_file")
     def load_file(path):
         ext = os.path.splitext(path)[1].lower()
         if ext == ".txt":
@@ -41,3 +49,110 @@ class FileLoader:
                 return json.dumps(json.load(f), indent=2)
         else:
             return None
+
+    @staticmethod
+    def iter_segments(path):
+        """
+        Yield {"text": str, "metadata": {...}} segments for a file without loading it whole.
+        Metadata locates the segment: page (PDF), sheet and rows (XLSX), rows (CSV),
+        items/keys (JSON), lines (TXT/Markdown), paragraphs (DOCX).
+        Unsupported formats yield nothing.
+        """
+        ext = os.path.splitext(path)[1].lower()
+        if ext in (".txt", ".md"):
+            yield from FileLoader._iter_text_segments(path)
+        elif ext == ".pdf":
+            reader = PdfReader(path)
+            for number, page in enumerate(reader.pages, start=1):
+                text = page.extract_text() or ""
+                if text.strip():
+                    yield {"text": text, "metadata": {"page": number}}
+        elif ext == ".docx":
+            doc = DocxDocument(path)
+            block, start = [], 1
+            for number, p in enumerate(doc.paragraphs, start=1):
+                block.append(p.text)
+                if sum(len(t) for t in block) >= SEGMENT_CHARS:
+                    yield {"text": "\n".join(block), "metadata": {"paragraphs": f"{start}-{number}"}}
+                    block, start = [], number + 1
+            if block:
+                yield {"text": "\n".join(block), "metadata": {"paragraphs": f"{start}-{start + len(block) - 1}"}}
+        elif ext == ".csv":
+            first_row = 1
+            for frame in pd.read_csv(path, chunksize=SEGMENT_ROWS):
+                last_row = first_row + len(frame) - 1
+                yield {"text": frame.to_string(index=False), "metadata": {"rows": f"{first_row}-{last_row}"}}
+                first_row = last_row + 1
+        elif ext == ".xlsx":
+            yield from FileLoader._iter_xlsx_segments(path)
+        elif ext == ".html":
+            # BeautifulSoup needs the whole tree; HTML pages are small compared to exports
+            with open(path, "r", encoding="utf-8") as f:
+                text = BeautifulSoup(f, "html.parser").get_text()
+            if text.strip():
+                yield {"text": text, "metadata": {}}
+        elif ext == ".json":
+            yield from FileLoader._iter_json_segments(path)
+
+    @staticmethod
+    def _iter_text_segments(path):
+        # Cut only on blank lines (when possible) so paragraphs stay in one segment
+        with open(path, "r", encoding="utf-8") as f:
+            block, size, start = [], 0, 1
+            for number, line in enumerate(f, start=1):
+                block.append(line)
+                size += len(line)
+                if size >= SEGMENT_CHARS and (not line.strip() or size >= 2 * SEGMENT_CHARS):
+                    yield {"text": "".join(block), "metadata": {"lines": f"{start}-{number}"}}
+                    block, size, start = [], 0, number + 1
+            if block:
+                yield {"text": "".join(block), "metadata": {"lines": f"{start}-{start + len(block) - 1}"}}
+
+    @staticmethod
+    def _iter_xlsx_segments(path):
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                header = None
+                block, start = [], 2
+                for number, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+                    cells = ["" if v is None else str(v) for v in row]
+                    if header is None:
+                        header = " | ".join(cells)
+                        continue
+                    if not any(cells):
+                        continue
+                    block.append(" | ".join(cells))
+                    if len(block) >= SEGMENT_ROWS:
+                        yield {"text": header + "\n" + "\n".join(block), "metadata": {"sheet": sheet.title, "rows": f"{start}-{number}"}}
+                        block, start = [], number + 1
+                if block:
+                    yield {"text": header + "\n" + "\n".join(block), "metadata": {"sheet": sheet.title, "rows": f"{start}-{number}"}}
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def _iter_json_segments(path):
+        from src.utils.json_stream import iter_json
+        with open(path, "r", encoding="utf-8") as f:
+            block, size, first = [], 0, None
+            for key, value in iter_json(f):
+                text = json.dumps(value, indent=2, ensure_ascii=False)
+                block.append(text if key is None or isinstance(key, int) else f'"{key}": {text}')
+                size += len(text)
+                if first is None:
+                    first = key
+                if size >= SEGMENT_CHARS:
+                    yield {"text": "\n".join(block), "metadata": FileLoader._json_location(first, key)}
+                    block, size, first = [], 0, None
+            if block:
+                yield {"text": "\n".join(block), "metadata": FileLoader._json_location(first, key)}
+
+    @staticmethod
+    def _json_location(first, last):
+        if first is None:
+            return {}
+        if isinstance(first, int):
+            return {"items": f"{first + 1}-{last + 1}"}
+        return {"keys": f"{first}..{last}" if first != last else str(first)}
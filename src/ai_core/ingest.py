@@ -0,0 +1,87 @@
+"""
+ingest.py - Worker-side file parsing for bulk RAG ingestion
+Runs inside process pool workers, so it only imports the lightweight loader modules
+(no torch, no Chroma). GRCRAGSystem.ingest_paths does embedding and storage.
+Chunks are spooled to a temporary JSONL file instead of being returned as a list,
+so neither the worker nor the parent holds a whole document in memory.
+"""
+import os
+import json
+import time
+import tempfile
+from src.ai_core.manifest import file_sha256
+
+_chunkers = {}
+
+def get_chunker(options=None):
+    """One StructuredChunker per option set and process, so the tokenizer loads only once."""
+    from src.ai_core.chunker import StructuredChunker
+    options = options or {}
+    key = tuple(sorted(options.items()))
+    if key not in _chunkers:
+        _chunkers[key] = StructuredChunker(**options)
+    return _chunkers[key]
+
+def chunk_text(text, options=None):
+    """Split text into structure-aware, token-budgeted chunks (generator)."""
+    return get_chunker(options).iter_chunks(text)
+
+def load_and_chunk(path, known_sha256=None, chunk_options=None):
+    """
+    Hash, stream-parse and chunk one file; every chunk's metadata carries its location, its
+    section heading and the document's framework/jurisdiction/date (see doc_metadata.py).
+    If the content hash equals known_sha256 the file is not parsed at all. Returns a dict
+    with path, size, mtime, sha256, status, parse_ms and chunks_file (JSONL of
+    {"text", "metadata"} records, to be read with iter_chunk_records).
+    """
+    from src.ai_core.doc_metadata import document_metadata
+    from src.ai_core.file_loader import FileLoader
+    started = time.perf_counter()
+    result = {"path": path, "size": None, "mtime": None, "sha256": None, "status": None, "chunks_file": None, "error": None, "parse_ms": None}
+    try:
+        stat = os.stat(path)
+        result["size"] = stat.st_size
+        result["mtime"] = stat.st_mtime
+        result["sha256"] = file_sha256(path)
+        if known_sha256 and result["sha256"] == known_sha256:
+            result["status"] = "unchanged"
+            result["parse_ms"] = (time.perf_counter() - started) * 1000
+            return result
+        chunker = get_chunker(chunk_options)
+        count = 0
+        fd, chunks_file = tempfile.mkstemp(prefix="grc_chunks_", suffix=".jsonl")
+        result["chunks_file"] = chunks_file
+        document = None
+        with os.fdopen(fd, "w", encoding="utf-8") as out:
+            # Chunk segment by segment so every chunk keeps its page/sheet/row location
+            for segment in FileLoader.iter_segments(path):
+                if document is None:
+                    # Framework, jurisdiction and date are read from the first segment
+                    document = document_metadata(path, segment["text"])
+                for heading, chunk in chunker.iter_sections(segment["text"]):
+                    metadata = dict(document, **segment["metadata"])
+                    if heading:
+                        metadata["section"] = heading[:200]
+                    out.write(json.dumps({"text": chunk, "metadata": metadata}, ensure_ascii=False) + "\n")
+                    count += 1
+        result["status"] = "parsed" if count else "failed"
+        result["chunks"] = count
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = str(e)
+    # Timed in the worker; the parent adds it to its trace (see GRCRAGSystem.ingest_paths)
+    result["parse_ms"] = (time.perf_counter() - started) * 1000
+    if result["status"] == "failed" and result["chunks_file"]:
+        os.remove(result["chunks_file"])
+        result["chunks_file"] = None
+    return result
+
+def iter_chunk_records(chunks_file, remove=True):
+    """Read back the chunk records written by load_and_chunk, then delete the spool file."""
+    try:
+        with open(chunks_file, "r", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+    finally:
+        if remove and os.path.exists(chunks_file):
+            os.remove(chunks_file)
@@ -0,0 +1,295 @@
+"""
+lexical_index.py - On-disk BM25 inverted index kept alongside the Chroma collection
+Dense embeddings match exact identifiers ("Art. 32", "PR.AC-1", "A.8.24", "CIS 16")
+poorly; this index scores chunks by BM25 over tokens that keep those identifiers intact.
+Postings live in immutable segments: a JSON vocabulary ({term: [start, end]}) plus two
+numpy arrays (uint32 document numbers, uint16 term frequencies) that are memory-mapped
+for search. Every add() writes a new small segment, deletes are tombstones in SQLite,
+and small segments are merged (dropping deleted postings) as they accumulate.
+"""
+import os
+import re
+import json
+import math
+import sqlite3
+import threading
+import unicodedata
+import numpy as np
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.\-/:][a-z0-9]+)*")
+_STOPWORDS = {
+    "a", "an", "the", "of", "to", "in", "on", "for", "and", "or", "is", "are", "was", "be", "as", "at",
+    "by", "it", "its", "this", "that", "with", "from", "what", "which", "does", "do", "how", "can",
+    "el", "la", "los", "las", "de", "del", "y", "o", "en", "un", "una", "que", "por", "para", "con", "se"
+}
+# Spellings of the same reference word, so "Article 32", "Art. 32" and "artículo 32" meet
+_ALIASES = {"article": "art", "articles": "art", "articulo": "art", "articulos": "art",
+            "section": "sec", "seccion": "sec", "control": "ctrl", "controls": "ctrl"}
+
+def tokenize(text):
+    """
+    BM25 terms of a text: words, whole identifiers (pr.ac-1, a.8.24) plus their parts,
+    and "word number" pairs (art 32, cis 16) so a reference matches as one term.
+    """
+    text = unicodedata.normalize("NFKD", text.lower()).encode("ascii", "ignore").decode("ascii")
+    words = [_ALIASES.get(w, w) for w in _TOKEN.findall(text)]
+    terms = []
+    previous = None
+    for word in words:
+        if word not in _STOPWORDS:
+            terms.append(word)
+        parts = re.split(r"[.\-/:]", word)
+        if len(parts) > 1:
+            terms.extend(p for p in parts if p and p not in _STOPWORDS)
+        if previous and previous[0].isalpha() and word[0].isdigit():
+            terms.append(f"{previous} {word}")
+        previous = word
+    return terms
+
+class LexicalIndex:
+    def __init__(self, folder, k1=1.2, b=0.75, max_segments=8, merge_factor=4):
+        self.folder = folder
+        self.k1 = k1
+        self.b = b
+        self.max_segments = max_segments
+        self.merge_factor = merge_factor
+        os.makedirs(folder, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(folder, "docs.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            "num INTEGER PRIMARY KEY, chunk_id TEXT NOT NULL, length INTEGER NOT NULL, segment INTEGER NOT NULL, live INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS docs_chunk ON docs (chunk_id) WHERE live = 1")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+        self._load()
+
+    # ---- state ----
+
+    def _load(self):
+        rows = self._conn.execute("SELECT num, chunk_id, length, live FROM docs").fetchall()
+        size = max((r[0] for r in rows), default=0) + 1
+        self._lengths = np.zeros(size, dtype=np.float32)
+        self._live = np.zeros(size, dtype=bool)
+        self._chunk_ids = {}
+        for num, chunk_id, length, live in rows:
+            self._lengths[num] = length
+            if live:
+                self._live[num] = True
+                self._chunk_ids[num] = chunk_id
+        self._next_num = size
+        self._total_length = float(self._lengths[self._live].sum())
+        self._segments = [self._open_segment(s) for s in json.loads(self.get_meta("segments", "[]"))]
+        self._remove_garbage()
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value)))
+            self._conn.commit()
+
+    @property
+    def count(self):
+        """Live (searchable) chunks."""
+        return len(self._chunk_ids)
+
+    def _ensure_capacity(self, size):
+        if size > len(self._live):
+            grown = max(size, len(self._live) * 2)
+            self._lengths = np.concatenate([self._lengths, np.zeros(grown - len(self._lengths), dtype=np.float32)])
+            self._live = np.concatenate([self._live, np.zeros(grown - len(self._live), dtype=bool)])
+
+    # ---- segments ----
+
+    def _segment_path(self, segment_id, part):
+        return os.path.join(self.folder, f"seg_{segment_id:06d}.{part}")
+
+    def _open_segment(self, segment_id):
+        with open(self._segment_path(segment_id, "vocab.json"), "r", encoding="utf-8") as f:
+            vocab = json.load(f)
+        return {
+            "id": segment_id,
+            "vocab": vocab,
+            "docs": np.load(self._segment_path(segment_id, "docs.npy"), mmap_mode="r"),
+            "tfs": np.load(self._segment_path(segment_id, "tfs.npy"), mmap_mode="r")
+        }
+
+    def _write_segment(self, postings):
+        """postings: {term: ([doc numbers], [term frequencies])} -> new segment id."""
+        segment_id = int(self.get_meta("next_segment", "1"))
+        self.set_meta("next_segment", segment_id + 1)
+        vocab = {}
+        docs, tfs = [], []
+        position = 0
+        for term in sorted(postings):
+            nums, freqs = postings[term]
+            order = np.argsort(nums, kind="stable")
+            docs.append(np.asarray(nums, dtype=np.uint32)[order])
+            tfs.append(np.minimum(np.asarray(freqs), 65535).astype(np.uint16)[order])
+            vocab[term] = [position, position + len(nums)]
+            position += len(nums)
+        np.save(self._segment_path(segment_id, "docs.npy"), np.concatenate(docs) if docs else np.zeros(0, dtype=np.uint32))
+        np.save(self._segment_path(segment_id, "tfs.npy"), np.concatenate(tfs) if tfs else np.zeros(0, dtype=np.uint16))
+        # Not searchable until listed in meta by _commit_segments; a crash before that leaves garbage only
+        with open(self._segment_path(segment_id, "vocab.json"), "w", encoding="utf-8") as f:
+            json.dump(vocab, f, separators=(",", ":"))
+        return segment_id
+
+    def _commit_segments(self, segments):
+        self._segments = segments
+        self.set_meta("segments", json.dumps([s["id"] for s in segments]))
+
+    def _remove_garbage(self):
+        """Delete segment files that are no longer listed (merged away, or left by a crash)."""
+        listed = {s["id"] for s in self._segments}
+        for name in os.listdir(self.folder):
+            match = re.match(r"seg_(\d+)\.", name)
+            if match and int(match.group(1)) not in listed:
+                try:
+                    os.remove(os.path.join(self.folder, name))
+                except OSError:
+                    # Still memory-mapped by a search in flight (Windows): retried next time
+                    pass
+
+    # ---- writes ----
+
+    def add(self, chunk_ids, texts):
+        """Index chunks as one new segment; an id that is already indexed is replaced."""
+        chunk_ids = list(chunk_ids)
+        if not chunk_ids:
+            return
+        with self._lock:
+            self._delete(chunk_ids)
+            postings = {}
+            rows = []
+            self._ensure_capacity(self._next_num + len(chunk_ids))
+            for chunk_id, text in zip(chunk_ids, texts):
+                num = self._next_num
+                self._next_num += 1
+                terms = tokenize(text)
+                counts = {}
+                for term in terms:
+                    counts[term] = counts.get(term, 0) + 1
+                for term, tf in counts.items():
+                    entry = postings.setdefault(term, ([], []))
+                    entry[0].append(num)
+                    entry[1].append(tf)
+                rows.append((num, chunk_id, len(terms)))
+            segment_id = self._write_segment(postings)
+            self._conn.executemany("INSERT INTO docs VALUES (?, ?, ?, ?, 1)", [(num, chunk_id, length, segment_id) for num, chunk_id, length in rows])
+            self._conn.commit()
+            for num, chunk_id, length in rows:
+                self._lengths[num] = length
+                self._live[num] = True
+                self._chunk_ids[num] = chunk_id
+                self._total_length += length
+            self._commit_segments(self._segments + [self._open_segment(segment_id)])
+            if len(self._segments) > self.max_segments:
+                self._merge_smallest()
+
+    def delete(self, chunk_ids):
+        with self._lock:
+            self._delete(list(chunk_ids))
+
+    def _delete(self, chunk_ids):
+        nums = []
+        for i in range(0, len(chunk_ids), 500):
+            part = chunk_ids[i:i + 500]
+            placeholders = ",".join("?" * len(part))
+            nums += [r[0] for r in self._conn.execute(f"SELECT num FROM docs WHERE live = 1 AND chunk_id IN ({placeholders})", part)]
+        if not nums:
+            return
+        self._conn.executemany("UPDATE docs SET live = 0 WHERE num = ?", [(n,) for n in nums])
+        self._conn.commit()
+        for num in nums:
+            self._live[num] = False
+            self._total_length -= float(self._lengths[num])
+            self._chunk_ids.pop(num, None)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM docs")
+            self._conn.commit()
+            self._commit_segments([])
+            self._load()
+
+    def _merge_smallest(self):
+        """Merge the smallest segments into one, dropping postings of deleted chunks."""
+        by_size = sorted(self._segments, key=lambda s: len(s["docs"]))
+        merging = by_size[:max(2, self.merge_factor)]
+        postings = {}
+        for segment in merging:
+            for term, (start, end) in segment["vocab"].items():
+                nums = np.asarray(segment["docs"][start:end])
+                keep = self._live[nums]
+                if not keep.any():
+                    continue
+                entry = postings.setdefault(term, ([], []))
+                entry[0].extend(nums[keep].tolist())
+                entry[1].extend(np.asarray(segment["tfs"][start:end])[keep].tolist())
+        merged_ids = [s["id"] for s in merging]
+        placeholders = ",".join("?" * len(merged_ids))
+        segments = [s for s in self._segments if s["id"] not in merged_ids]
+        if postings:
+            segment_id = self._write_segment(postings)
+            self._conn.execute(f"UPDATE docs SET segment = ? WHERE live = 1 AND segment IN ({placeholders})", [segment_id] + merged_ids)
+            segments.append(self._open_segment(segment_id))
+        self._conn.execute(f"DELETE FROM docs WHERE live = 0 AND segment IN ({placeholders})", merged_ids)
+        self._conn.commit()
+        self._commit_segments(segments)
+        self._remove_garbage()
+
+    # ---- search ----
+
+    def search(self, query, k=10):
+        """Top-k [(chunk_id, bm25 score)] for the query, best first."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            segments = list(self._segments)
+            live = self._live
+            lengths = self._lengths
+            doc_count = len(self._chunk_ids)
+            total_length = self._total_length
+            chunk_ids = self._chunk_ids
+        if not terms or not doc_count:
+            return []
+        avg_length = total_length / doc_count if doc_count else 1.0
+        # Gather each term's live postings across segments, then weight it by its document frequency
+        scores = np.zeros(len(live), dtype=np.float32)
+        for term in terms:
+            matches = []
+            for segment in segments:
+                bounds = segment["vocab"].get(term)
+                if bounds is None:
+                    continue
+                start, end = bounds
+                nums = np.asarray(segment["docs"][start:end])
+                keep = live[nums]
+                if keep.any():
+                    matches.append((nums[keep], np.asarray(segment["tfs"][start:end])[keep].astype(np.float32)))
+            df = sum(len(nums) for nums, _ in matches)
+            if not df:
+                continue
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            for nums, tfs in matches:
+                norm = self.k1 * (1 - self.b + self.b * lengths[nums] / avg_length)
+                scores[nums] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+        hits = np.flatnonzero(scores)
+        if not len(hits):
+            return []
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(chunk_ids[int(n)], float(scores[n])) for n in hits if int(n) in chunk_ids]
+
+    def close(self):
+        with self._lock:
+            self._segments = []
+            self._conn.close()
@@ -1,51 +1,76 @@
 """
 GRCBrainLLM - LLM Client for Ollama
 """
-from langchain_ollama import OllamaLLM
-import requests
 import os
+import re
 import shutil
+from src.ai_core.ollama_client import get_client
+from src.ai_core.prompt_builder import PromptBuilder
+from src.utils.tracing import span
+
+# Whole words only: "hi" must not match "which", "sup" must not match "supplier"
+_GREETING = re.compile(r"\b(?:hello|hi|hey|how are you|good (?:morning|afternoon|evening)|what'?s up|yo|sup)\b", re.IGNORECASE)
+_SMALL_TALK = {
+    "hello", "hi", "hey", "yo", "sup", "thanks", "thank", "you", "ok", "okay", "bye", "goodbye",
+    "cheers", "cool", "great", "nice", "please", "yes", "no", "sure", "good", "morning", "there"
+}
+
+def is_conversational(query):
+    # Simple intent detection using keywords only (compatible with Python 3.13)
+    if _GREETING.search(query):
+        return True
+    # A short query made only of small-talk words ("thanks!", "ok great")
+    words = re.findall(r"[\w']+", query.lower())
+    return len(words) <= 4 and all(w in _SMALL_TALK for w in words)
 
 class GRCBrainLLM:
     def _is_greeting_or_conversational(self, query):
-        # Simple intent detection using keywords only (compatible with Python 3.13)
-        greetings = ["hello", "hi", "hey", "how are you", "good morning", "good afternoon", "good evening", "what's up", "yo", "sup"]
-        query_lower = query.lower()
-        for g in greetings:
-            if g in query_lower:
-                return True
-        # If query is short and contains only conversational words
-        if len(query.split()) <= 4:
-            return True
-        return False
-    def __init__(self, host="http://localhost:11434", model="llama3:8b"):
+        return is_conversational(query)
+    def __init__(self, host="http://localhost:11434", model="llama3:8b", options=None):
         self.host = host
         self.model = model
+        # Ollama generation options (num_ctx, num_predict, num_thread, ...)
+        self.options = dict(options or {})
+        # Max context tokens put in the prompt (None: whatever fits in num_ctx)
+        self.context_tokens = None
+        self.prompt_builder = PromptBuilder()
         self.llm = None
+        # Optional SemanticAnswerCache (see src/ai_core/answer_cache.py), wired by the caller
+        self.answer_cache = None
         self.ollama_path = self._find_ollama_path()
-        if not self.ollama_path:
-            self.llm = None
-            self.error = "[ERROR] Ollama is not installed. Download from https://ollama.com/download and ensure it's in your PATH."
-        else:
-            try:
-                # Verificar si Ollama está activo
-                response = requests.get(f"{self.host}/api/tags", timeout=5)
-                if response.status_code != 200:
-                    self.llm = None
-                    self.error = "[ERROR] Ollama service is not running. Start Ollama with 'ollama serve' in terminal."
-                else:
-                    tags = response.json()
-                    available = [m['name'] for m in tags.get('models', [])]
-                    if self.model not in available:
-                        self.llm = None
-                        self.error = f"[ERROR] Model '{self.model}' not found. Run 'ollama pull {self.model}' in terminal. Available: {available}"
-                    else:
-                        self.llm = OllamaLLM(base_url=self.host, model=self.model)
-                        self.error = None
-            except Exception:
-                self.llm = None
+        # Pooled keep-alive client shared by every GRCBrainLLM pointing at this host
+        self.client = get_client(self.host)
+        try:
+            # Verificar si Ollama está activo
+            available = self.client.tags(timeout=5)
+            if self.model not in available:
+                self.error = f"[ERROR] Model '{self.model}' not found. Run 'ollama pull {self.model}' in terminal. Available: {available}"
+            else:
+                self.llm = self.client
+                self.error = None
+        except Exception as e:
+            if getattr(e, "status_code", None):
+                self.error = "[ERROR] Ollama service is not running. Start Ollama with 'ollama serve' in terminal."
+            elif not self.ollama_path:
+                self.error = "[ERROR] Ollama is not installed. Download from https://ollama.com/download and ensure it's in your PATH."
+            else:
                 self.error = "[ERROR] Could not connect to Ollama. Ensure Ollama is running and accessible."
 
+    def set_model(self, model):
+        """Switch to another local Ollama model; returns None, or an "[ERROR] ..." and keeps the current one."""
+        if model == self.model and self.llm:
+            return None
+        try:
+            available = self.client.tags(timeout=5)
+        except Exception as e:
+            return f"[ERROR] Could not reach Ollama to switch model: {e}"
+        if model not in available:
+            return f"[ERROR] Model '{model}' not found. Run 'ollama pull {model}' in terminal. Available: {available}"
+        self.model = model
+        self.llm = self.client
+        self.error = None
+        return None
+
     def _find_ollama_path(self):
         # Detectar Ollama en PATH o ruta estándar de Windows
         if shutil.which("ollama"):
@@ -55,51 +80,177 @@ class GRCBrainLLM:
             return win_path
         return None
 
+    def _build_prompt(self, query, context=None, language="auto"):
+        """(system, prompt, info): context fitted to the token budget, see src/ai_core/prompt_builder.py."""
+        # Flexible prompt: skip instructions/context for greetings
+        if self._is_greeting_or_conversational(query):
+            return None, query, {}
+        self.prompt_builder.context_tokens = self.context_tokens
+        return self.prompt_builder.build(query, context, language, self.options)
+
     def ask(self, query: str, context=None, language="auto") -> str:
         if not self.llm:
             return self.error or "[ERROR] No local LLM available. Check Ollama installation."
+        with span("llm.ask", model=self.model) as s:
+            try:
+                cached = self._cached_answer(query, context, language)
+                if cached is not None:
+                    s.set(cached=True)
+                    return cached
+                with span("llm.prompt") as p:
+                    system, prompt, info = self._build_prompt(query, context, language)
+                    p.set(**info)
+                # Query log for traceability
+                self._log_query(query, context, language)
+                stats = {}
+                with span("llm.generate", model=self.model, stream=False) as g:
+                    answer = self.llm.generate(prompt, self.model, system=system, options=self.options, stats=stats)
+                    g.set(**self._token_attrs(stats, g.elapsed_ms()))
+                self._store_answer(query, context, language, answer)
+                return answer
+            except Exception as e:
+                s.set(error=str(e))
+                return f"[ERROR] Could not get response from LLM: {e}"
+
+    def ask_stream(self, query: str, context=None, language="auto"):
+        """
+        Generator version of ask(): yields the answer in chunks as Ollama produces them,
+        so callers can render the first tokens while the rest is still being generated.
+        Errors are yielded as a single "[ERROR] ..." chunk, like ask() returns them.
+        """
+        if not self.llm:
+            yield self.error or "[ERROR] No local LLM available. Check Ollama installation."
+            return
+        with span("llm.ask_stream", model=self.model) as s:
+            try:
+                cached = self._cached_answer(query, context, language)
+                if cached is not None:
+                    s.set(cached=True)
+                    yield cached
+                    return
+                with span("llm.prompt") as p:
+                    system, prompt, info = self._build_prompt(query, context, language)
+                    p.set(**info)
+                self._log_query(query, context, language)
+                parts = []
+                stats = {}
+                with span("llm.generate", model=self.model, stream=True) as g:
+                    for chunk in self.llm.generate_stream(prompt, self.model, system=system, options=self.options, stats=stats):
+                        if chunk:
+                            if not parts:
+                                g.set(ttft_ms=g.elapsed_ms())
+                            parts.append(chunk)
+                            yield chunk
+                    g.set(**self._token_attrs(stats, g.elapsed_ms(), len(parts)))
+                self._store_answer(query, context, language, "".join(parts))
+            except Exception as e:
+                s.set(error=str(e))
+                yield f"[ERROR] Could not get response from LLM: {e}"
+
+    async def aask(self, query: str, context=None, language="auto") -> str:
+        """Async ask() for event-loop callers; generation goes through the shared async pool."""
+        import asyncio
+        if not self.llm:
+            return self.error or "[ERROR] No local LLM available. Check Ollama installation."
+        with span("llm.ask", model=self.model) as s:
+            try:
+                # Cache lookup embeds the query (CPU-bound): keep it off the event loop
+                cached = await asyncio.to_thread(self._cached_answer, query, context, language)
+                if cached is not None:
+                    s.set(cached=True)
+                    return cached
+                with span("llm.prompt") as p:
+                    system, prompt, info = self._build_prompt(query, context, language)
+                    p.set(**info)
+                self._log_query(query, context, language)
+                stats = {}
+                with span("llm.generate", model=self.model, stream=False) as g:
+                    answer = await self.llm.agenerate(prompt, self.model, system=system, options=self.options, stats=stats)
+                    g.set(**self._token_attrs(stats, g.elapsed_ms()))
+                await asyncio.to_thread(self._store_answer, query, context, language, answer)
+                return answer
+            except Exception as e:
+                s.set(error=str(e))
+                return f"[ERROR] Could not get response from LLM: {e}"
+
+    async def aask_stream(self, query: str, context=None, language="auto"):
+        """Async generator version of ask_stream()."""
+        import asyncio
+        if not self.llm:
+            yield self.error or "[ERROR] No local LLM available. Check Ollama installation."
+            return
+        with span("llm.ask_stream", model=self.model) as s:
+            try:
+                cached = await asyncio.to_thread(self._cached_answer, query, context, language)
+                if cached is not None:
+                    s.set(cached=True)
+                    yield cached
+                    return
+                with span("llm.prompt") as p:
+                    system, prompt, info = self._build_prompt(query, context, language)
+                    p.set(**info)
+                self._log_query(query, context, language)
+                parts = []
+                stats = {}
+                with span("llm.generate", model=self.model, stream=True) as g:
+                    async for chunk in self.llm.agenerate_stream(prompt, self.model, system=system, options=self.options, stats=stats):
+                        if chunk and not parts:
+                            g.set(ttft_ms=g.elapsed_ms())
+                        parts.append(chunk)
+                        yield chunk
+                    g.set(**self._token_attrs(stats, g.elapsed_ms(), len([p for p in parts if p])))
+                await asyncio.to_thread(self._store_answer, query, context, language, "".join(parts))
+            except Exception as e:
+                s.set(error=str(e))
+                yield f"[ERROR] Could not get response from LLM: {e}"
+
+    @staticmethod
+    def _token_attrs(stats, elapsed_ms, chunks=None):
+        """Token counts and rate for a generation span, from Ollama's counters when it sent them."""
+        tokens = stats.get("eval_count", chunks)
+        attrs = {}
+        # Counts Ollama did not send are left out rather than recorded as None
+        if tokens is not None:
+            attrs["tokens"] = tokens
+        if stats.get("prompt_eval_count") is not None:
+            attrs["prompt_tokens"] = stats["prompt_eval_count"]
+        if stats.get("load_duration"):
+            attrs["load_ms"] = stats["load_duration"] / 1e6
+        if tokens:
+            # eval_duration excludes model load and prompt processing; wall time is the fallback
+            seconds = stats["eval_duration"] / 1e9 if stats.get("eval_duration") else elapsed_ms / 1000
+            attrs["tokens_per_sec"] = tokens / seconds if seconds else None
+        return attrs
+
+    def _cached_answer(self, query, context, language):
+        # Greetings are cheap and context-free: never cached
+        if not self.answer_cache or self._is_greeting_or_conversational(query):
+            return None
+        with span("llm.cache_lookup") as s:
+            try:
+                answer = self.answer_cache.lookup(self.model, query, context, language)
+            except Exception:
+                answer = None
+            s.set(hit=answer is not None)
+            return answer
+
+    def _store_answer(self, query, context, language, answer):
+        if not self.answer_cache or self._is_greeting_or_conversational(query):
+            return
         try:
-            # Use spaCy for intent detection
-            is_greeting = self._is_greeting_or_conversational(query)
-            # Language selection
-            if language == "es":
-                lang_instruction = "Answer in Spanish, referencing official laws and standards from Spain and the USA."
-            elif language == "en":
-                lang_instruction = "Answer in English, referencing official frameworks and laws from the USA, EU, and international sources."
-            else:
-                lang_instruction = "Always answer in English, referencing official frameworks and laws from the USA, EU, and international sources."
-            # Flexible prompt: skip instructions/context for greetings
-            if is_greeting:
-                prompt = query
-            else:
-                context_str = ""
-                if context:
-                    if isinstance(context, list):
-                        context_str = "\nContext:\n" + "\n---\n".join([c["content"] for c in context])
-                    else:
-                        context_str = f"\nContext:\n{context}"
-                prompt = f"{lang_instruction}\nQuestion: {query}{context_str}"
-            # Query log for traceability
-            self._log_query(query, context, language)
-            return self.llm.invoke(prompt)
-        except Exception as e:
-            return f"[ERROR] Could not get response from LLM: {e}"
+            self.answer_cache.store(self.model, query, context, answer, language)
+        except Exception:
+            pass
 
     def _log_query(self, query, context, language):
-        log_path = "llm_query_log.json"
-        import json
+        # Append-only JSONL log, written by a background thread (see src/utils/query_log.py)
         from datetime import datetime
+        from src.utils.query_log import get_query_log
         entry = {
             "timestamp": datetime.now().isoformat(),
             "query": query,
             "context": context,
             "language": language
         }
-        if not os.path.exists(log_path):
-            with open(log_path, "w", encoding="utf-8") as f:
-                json.dump([], f)
-        with open(log_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        data.append(entry)
-        with open(log_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        with span("llm.log_query"):
+            get_query_log().append(entry)
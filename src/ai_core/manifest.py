@@ -0,0 +1,124 @@
+"""
+manifest.py - Record of indexed documents for incremental RAG ingestion
+Tracks path, size, mtime, content hash and Chroma chunk IDs per file in SQLite,
+so unchanged files are skipped and changed or deleted files can be updated in place.
+"""
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime
+
+def file_sha256(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def iter_chunk_ids(path, chunks):
+    """
+    Yield (chunk_id, chunk) with stable Chroma IDs: derived from the file path and each
+    chunk's own text (plus its occurrence number for repeated text), so an edit only
+    changes the IDs of edited chunks. A chunk is a string or a {"text": ...} record.
+    """
+    key = os.path.normcase(os.path.abspath(path))
+    seen = {}
+    for chunk in chunks:
+        text = chunk if isinstance(chunk, str) else chunk["text"]
+        chunk_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        n = seen.get(chunk_hash, 0)
+        seen[chunk_hash] = n + 1
+        yield hashlib.sha256(f"{key}|{chunk_hash}|{n}".encode("utf-8")).hexdigest()[:32], chunk
+
+def chunk_ids_for(path, chunks):
+    return [chunk_id for chunk_id, _ in iter_chunk_ids(path, chunks)]
+
+class DocumentManifest:
+    def __init__(self, path):
+        self.path = path
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime REAL, sha256 TEXT, chunk_ids TEXT, indexed_at TEXT)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value)))
+            self._conn.commit()
+
+    @staticmethod
+    def key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def get(self, path):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT path, size, mtime, sha256, chunk_ids, indexed_at FROM documents WHERE path = ?",
+                (self.key(path),)
+            ).fetchone()
+        return self._row_to_entry(row) if row else None
+
+    def put(self, path, size, mtime, sha256, chunk_ids):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?)",
+                (self.key(path), size, mtime, sha256, json.dumps(chunk_ids), datetime.now().isoformat())
+            )
+            self._conn.commit()
+
+    def touch(self, path, size, mtime):
+        """File was rewritten with identical content: refresh stat info only."""
+        with self._lock:
+            self._conn.execute("UPDATE documents SET size = ?, mtime = ? WHERE path = ?", (size, mtime, self.key(path)))
+            self._conn.commit()
+
+    def remove(self, path):
+        with self._lock:
+            self._conn.execute("DELETE FROM documents WHERE path = ?", (self.key(path),))
+            self._conn.commit()
+
+    def entries(self, prefix=None):
+        with self._lock:
+            if prefix:
+                root = self.key(prefix).rstrip(os.sep) + os.sep
+                rows = self._conn.execute(
+                    "SELECT path, size, mtime, sha256, chunk_ids, indexed_at FROM documents WHERE substr(path, 1, ?) = ?",
+                    (len(root), root)
+                ).fetchall()
+            else:
+                rows = self._conn.execute("SELECT path, size, mtime, sha256, chunk_ids, indexed_at FROM documents").fetchall()
+        return [self._row_to_entry(r) for r in rows]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM documents")
+            self._conn.commit()
+
+    @staticmethod
+    def _row_to_entry(row):
+        return {
+            "path": row[0],
+            "size": row[1],
+            "mtime": row[2],
+            "sha256": row[3],
+            "chunk_ids": json.loads(row[4] or "[]"),
+            "indexed_at": row[5]
+        }
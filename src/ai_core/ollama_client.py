@@ -0,0 +1,288 @@
+"""
+ollama_client.py - Pooled HTTP client for the Ollama API (sync and async)
+One keep-alive connection pool per host, per-request timeouts, retry with exponential
+backoff for connection errors and 5xx, and a semaphore that caps in-flight generations.
+Callers beyond the cap wait in a bounded queue; when the queue is full they get
+OllamaBusyError instead of piling more load on the server.
+Generation calls accept a stats dict that is filled with Ollama's own timing and token
+counts (eval_count, eval_duration, ...) when the response finishes.
+"""
+import json
+import time
+import random
+import asyncio
+import threading
+import contextlib
+import httpx
+
+class OllamaError(Exception):
+    pass
+
+class OllamaBusyError(OllamaError):
+    pass
+
+# Counters Ollama reports on the final response (durations in nanoseconds)
+_STATS_KEYS = ("total_duration", "load_duration", "prompt_eval_count", "prompt_eval_duration", "eval_count", "eval_duration")
+
+_RETRYABLE = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError, httpx.ReadError)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(host="http://localhost:11434", **kwargs):
+    """Shared OllamaClient per host, so every chat session and batch job reuses one pool."""
+    with _clients_lock:
+        client = _clients.get(host)
+        if client is None:
+            client = OllamaClient(host, **kwargs)
+            _clients[host] = client
+        return client
+
+class OllamaClient:
+    def __init__(self, host="http://localhost:11434", timeout=300.0, connect_timeout=5.0, max_concurrency=2,
+                 max_queue=32, queue_timeout=600.0, retries=2, backoff=0.5, pool_size=8):
+        self.host = host.rstrip("/")
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self._client = httpx.Client(base_url=self.host, timeout=self.timeout, limits=self.limits)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._waiting = 0
+        self._waiting_lock = threading.Lock()
+        # Async state is bound to the running event loop and created on first use
+        self._async_client = None
+        self._async_slots = None
+        self._async_loop = None
+
+    # ---- sync API ----
+
+    def tags(self, timeout=5.0):
+        """Names of the locally available models."""
+        response = self._request("GET", "/api/tags", timeout=timeout)
+        return [m["name"] for m in response.json().get("models", [])]
+
+    def generate(self, prompt, model, system=None, options=None, timeout=None, stats=None):
+        payload = self._payload(prompt, model, system, options, stream=False)
+        with self._generation_slot():
+            response = self._request("POST", "/api/generate", json=payload, timeout=timeout)
+        data = response.json()
+        self._fill_stats(data, stats)
+        return data.get("response", "")
+
+    def generate_stream(self, prompt, model, system=None, options=None, timeout=None, stats=None):
+        """Yield response text chunks as Ollama streams them."""
+        payload = self._payload(prompt, model, system, options, stream=True)
+        with self._generation_slot():
+            for attempt in range(self.retries + 1):
+                started = False
+                try:
+                    with self._client.stream("POST", "/api/generate", json=payload, timeout=timeout or self.timeout) as response:
+                        self._check(response, read=True)
+                        for line in response.iter_lines():
+                            chunk = self._parse_line(line, stats)
+                            if chunk is None:
+                                continue
+                            started = True
+                            if chunk:
+                                yield chunk
+                    return
+                except _RETRYABLE as e:
+                    # Only retry if nothing was yielded yet, or the caller would see duplicates
+                    if started or attempt == self.retries:
+                        raise OllamaError(f"Ollama request failed: {e}") from e
+                    time.sleep(self._delay(attempt))
+
+    def close(self):
+        self._client.close()
+
+    # ---- async API ----
+
+    async def agenerate(self, prompt, model, system=None, options=None, timeout=None, stats=None):
+        payload = self._payload(prompt, model, system, options, stream=False)
+        async with self._async_generation_slot():
+            response = await self._arequest("POST", "/api/generate", json=payload, timeout=timeout)
+        data = response.json()
+        self._fill_stats(data, stats)
+        return data.get("response", "")
+
+    async def agenerate_stream(self, prompt, model, system=None, options=None, timeout=None, stats=None):
+        payload = self._payload(prompt, model, system, options, stream=True)
+        client = self._get_async_client()
+        async with self._async_generation_slot():
+            for attempt in range(self.retries + 1):
+                started = False
+                try:
+                    async with client.stream("POST", "/api/generate", json=payload, timeout=timeout or self.timeout) as response:
+                        if response.status_code != 200:
+                            await response.aread()
+                        self._check(response)
+                        async for line in response.aiter_lines():
+                            chunk = self._parse_line(line, stats)
+                            if chunk is None:
+                                continue
+                            started = True
+                            if chunk:
+                                yield chunk
+                    return
+                except _RETRYABLE as e:
+                    if started or attempt == self.retries:
+                        raise OllamaError(f"Ollama request failed: {e}") from e
+                    await asyncio.sleep(self._delay(attempt))
+
+    async def atags(self, timeout=5.0):
+        response = await self._arequest("GET", "/api/tags", timeout=timeout)
+        return [m["name"] for m in response.json().get("models", [])]
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            self._async_slots = None
+            self._async_loop = None
+
+    def stats(self):
+        return {"max_concurrency": self.max_concurrency, "waiting": self._waiting, "max_queue": self.max_queue}
+
+    # ---- internals ----
+
+    @staticmethod
+    def _payload(prompt, model, system, options, stream):
+        payload = {"model": model, "prompt": prompt, "stream": stream}
+        if system:
+            payload["system"] = system
+        if options:
+            payload["options"] = options
+        return payload
+
+    @classmethod
+    def _parse_line(cls, line, stats=None):
+        """Text of one NDJSON stream line; None for blank lines. Raises on error lines."""
+        if not line.strip():
+            return None
+        data = json.loads(line)
+        if data.get("error"):
+            raise OllamaError(data["error"])
+        if data.get("done"):
+            cls._fill_stats(data, stats)
+        return data.get("response", "")
+
+    @staticmethod
+    def _fill_stats(data, stats):
+        if stats is None:
+            return
+        for key in _STATS_KEYS:
+            if key in data:
+                stats[key] = data[key]
+
+    def _delay(self, attempt):
+        return self.backoff * (2 ** attempt) * (1 + random.random() * 0.25)
+
+    @staticmethod
+    def _check(response, read=False):
+        if response.status_code == 200:
+            return
+        if read:
+            response.read()
+        try:
+            message = response.json().get("error", response.text)
+        except Exception:
+            message = response.text
+        error = OllamaError(f"Ollama returned HTTP {response.status_code}: {message}")
+        error.status_code = response.status_code
+        raise error
+
+    def _request(self, method, path, timeout=None, **kwargs):
+        for attempt in range(self.retries + 1):
+            try:
+                response = self._client.request(method, path, timeout=timeout or self.timeout, **kwargs)
+                if response.status_code >= 500 and attempt < self.retries:
+                    time.sleep(self._delay(attempt))
+                    continue
+                self._check(response)
+                return response
+            except _RETRYABLE as e:
+                if attempt == self.retries:
+                    raise OllamaError(f"Ollama request failed: {e}") from e
+                time.sleep(self._delay(attempt))
+
+    async def _arequest(self, method, path, timeout=None, **kwargs):
+        client = self._get_async_client()
+        for attempt in range(self.retries + 1):
+            try:
+                response = await client.request(method, path, timeout=timeout or self.timeout, **kwargs)
+                if response.status_code >= 500 and attempt < self.retries:
+                    await asyncio.sleep(self._delay(attempt))
+                    continue
+                self._check(response)
+                return response
+            except _RETRYABLE as e:
+                if attempt == self.retries:
+                    raise OllamaError(f"Ollama request failed: {e}") from e
+                await asyncio.sleep(self._delay(attempt))
+
+    def _get_async_client(self):
+        """
+        The async pool belongs to one event loop. If a different loop shows up, the old pool
+        is closed on its own loop; code that runs a short-lived loop (asyncio.run) should
+        await aclose() before that loop ends, since a finished loop can no longer close it.
+        """
+        # Async generations get their own cap; the GUI and the HTTP server do not share a process
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            if self._async_client is not None:
+                self._close_stale_async_client()
+            self._async_client = httpx.AsyncClient(base_url=self.host, timeout=self.timeout, limits=self.limits)
+            self._async_slots = asyncio.Semaphore(self.max_concurrency)
+            self._async_loop = loop
+        return self._async_client
+
+    def _close_stale_async_client(self):
+        client, loop = self._async_client, self._async_loop
+        self._async_client = None
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        else:
+            print("[WARNING] Ollama async client was not closed before its event loop ended; call aclose() first.")
+
+    def _enter_queue(self):
+        with self._waiting_lock:
+            if self._waiting >= self.max_queue:
+                raise OllamaBusyError(f"Ollama queue is full ({self.max_queue} requests waiting)")
+            self._waiting += 1
+
+    def _leave_queue(self):
+        with self._waiting_lock:
+            self._waiting -= 1
+
+    @contextlib.contextmanager
+    def _generation_slot(self):
+        self._enter_queue()
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            self._leave_queue()
+        if not acquired:
+            raise OllamaBusyError("Timed out waiting for a free Ollama generation slot")
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    @contextlib.asynccontextmanager
+    async def _async_generation_slot(self):
+        self._get_async_client()
+        self._enter_queue()
+        try:
+            await asyncio.wait_for(self._async_slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise OllamaBusyError("Timed out waiting for a free Ollama generation slot")
+        finally:
+            self._leave_queue()
+        try:
+            yield
+        finally:
+            self._async_slots.release()
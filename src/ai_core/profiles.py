@@ -0,0 +1,120 @@
+"""
+profiles.py - Performance profiles for the RAG + LLM pipeline
+A profile sets how many chunks are retrieved, whether they are reranked, the context
+token budget, the Ollama model and generation options (num_ctx, num_predict,
+num_thread) and how strict the semantic answer cache is. The active profile and the
+measured answer latency of each profile are kept in <db_path>/profiles.json; profiles
+defined there override or extend the built-in ones.
+"""
+import os
+import json
+import threading
+
+# The embedding model is fixed per index (changing it means re-embedding every chunk),
+# so profiles only record it; the other settings apply immediately.
+PROFILES = {
+    "Fast": {
+        "k": 2,
+        "rerank": False,
+        "context_tokens": 1024,
+        "model": "llama3:8b-instruct-q3_K_M",
+        "options": {"num_ctx": 2048, "num_predict": 256, "num_thread": os.cpu_count() or 4},
+        "answer_cache_threshold": 0.90,
+        "embedding_model": "sentence-transformers/multi-qa-mpnet-base-cos-v1"
+    },
+    "Balanced": {
+        "k": 3,
+        "rerank": False,
+        "context_tokens": 2048,
+        "model": "llama3:8b",
+        "options": {"num_ctx": 4096, "num_predict": 512},
+        "answer_cache_threshold": 0.95,
+        "embedding_model": "sentence-transformers/multi-qa-mpnet-base-cos-v1"
+    },
+    "Accurate": {
+        "k": 4,
+        "rerank": True,
+        "context_tokens": 3072,
+        "model": "llama3:8b",
+        "options": {"num_ctx": 8192, "num_predict": 768},
+        "answer_cache_threshold": 0.97,
+        "embedding_model": "sentence-transformers/multi-qa-mpnet-base-cos-v1"
+    }
+}
+DEFAULT_PROFILE = "Balanced"
+
+class PerformanceProfiles:
+    def __init__(self, path="profiles.json", samples=50):
+        self.path = path
+        self.samples = samples
+        self._lock = threading.Lock()
+        self.profiles = {name: dict(p) for name, p in PROFILES.items()}
+        self.active = DEFAULT_PROFILE
+        self.latency = {}
+        self._load()
+        # What profiles.json says is active; differs from `active` while a switch is unconfirmed
+        self.saved_active = self.active
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] Could not read {self.path}: {e}")
+            return
+        for name, overrides in (data.get("profiles") or {}).items():
+            self.profiles[name] = dict(self.profiles.get(name, PROFILES[DEFAULT_PROFILE]), **overrides)
+        if data.get("active") in self.profiles:
+            self.active = data["active"]
+        self.latency = data.get("latency") or {}
+
+    def _save(self):
+        # Built-in profiles are not written out, only user-defined changes to them
+        custom = {name: p for name, p in self.profiles.items() if PROFILES.get(name) != p}
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"active": self.saved_active, "profiles": custom, "latency": self.latency}, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def names(self):
+        return list(self.profiles)
+
+    def get(self, name=None):
+        return self.profiles.get(name or self.active) or self.profiles[DEFAULT_PROFILE]
+
+    def set_active(self, name, persist=True):
+        """Make name the active profile; persist=False keeps it for this session only."""
+        if name not in self.profiles:
+            raise KeyError(f"Unknown performance profile: {name}")
+        with self._lock:
+            self.active = name
+            if persist:
+                self.saved_active = name
+                self._save()
+
+    def record(self, name, seconds, tokens_per_sec=None):
+        """Add one measured answer time (and generation speed) to a profile's recent samples."""
+        with self._lock:
+            entry = self.latency.setdefault(name, {"seconds": [], "tokens_per_sec": []})
+            entry["seconds"] = (entry["seconds"] + [round(seconds, 3)])[-self.samples:]
+            if tokens_per_sec:
+                entry["tokens_per_sec"] = (entry["tokens_per_sec"] + [round(tokens_per_sec, 1)])[-self.samples:]
+            self._save()
+
+    def summary(self, name):
+        """{"count", "p50_s", "p95_s", "tokens_per_sec"} over the recent samples, or None."""
+        entry = self.latency.get(name)
+        if not entry or not entry["seconds"]:
+            return None
+        times = sorted(entry["seconds"])
+        rates = entry.get("tokens_per_sec") or []
+        return {
+            "count": len(times),
+            "p50_s": times[round(0.50 * (len(times) - 1))],
+            "p95_s": times[round(0.95 * (len(times) - 1))],
+            "tokens_per_sec": sum(rates) / len(rates) if rates else None
+        }
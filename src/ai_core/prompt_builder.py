@@ -0,0 +1,140 @@
+"""
+prompt_builder.py - Token-budgeted prompt assembly for GRCBrainLLM
+Fits the retrieved context into a token budget before it reaches Ollama: sentences
+repeated across chunks (chunk overlap, the chat-memory hit) are sent once, chunks that
+are mostly repeats are dropped, and when the context is still too long the sentences
+least related to the question go first, lower-ranked chunks before better ones.
+The instructions are sent as a system prompt that only depends on the language, so
+it is the same at the start of every request and Ollama can reuse its KV cache for it.
+"""
+import re
+from src.ai_core.chunker import StructuredChunker
+from src.ai_core.lexical_index import tokenize
+
+SYSTEM_PROMPT = (
+    "You are GRC Brain, an assistant for governance, risk and compliance questions. "
+    "Base your answer on the context when it is relevant, name the framework, law or "
+    "control it comes from, and say so when the context does not cover the question."
+)
+LANGUAGE_INSTRUCTIONS = {
+    "es": "Answer in Spanish, referencing official laws and standards from Spain and the USA.",
+    "en": "Answer in English, referencing official frameworks and laws from the USA, EU, and international sources.",
+    "auto": "Always answer in English, referencing official frameworks and laws from the USA, EU, and international sources."
+}
+# Ollama's num_ctx when the options do not set it
+DEFAULT_NUM_CTX = 2048
+DEFAULT_NUM_PREDICT = 512
+
+_SENTENCE_END = re.compile(r"((?<=[.!?;:])\s+|\s*\n\s*)")
+
+class PromptBuilder:
+    def __init__(self, context_tokens=None, count_tokens=None, duplicate_ratio=0.8, reserve_tokens=64):
+        """
+        context_tokens: max tokens of context (None: whatever fits in num_ctx).
+        count_tokens: text -> token count; defaults to the chunker's word-piece estimate.
+        duplicate_ratio: drop a chunk when this share of its sentences was already sent.
+        reserve_tokens: slack for the chat template and rounding in the estimate.
+        """
+        self.context_tokens = context_tokens
+        self.count_tokens = count_tokens or StructuredChunker().count_tokens
+        self.duplicate_ratio = duplicate_ratio
+        self.reserve_tokens = reserve_tokens
+
+    def system_prompt(self, language="auto"):
+        return f"{SYSTEM_PROMPT}\n{LANGUAGE_INSTRUCTIONS.get(language, LANGUAGE_INSTRUCTIONS['auto'])}"
+
+    def budget(self, system, query, options=None):
+        """Context tokens that fit next to the system prompt, the question and the answer."""
+        options = options or {}
+        num_ctx = options.get("num_ctx") or DEFAULT_NUM_CTX
+        num_predict = options.get("num_predict") or DEFAULT_NUM_PREDICT
+        if num_predict < 0:
+            # -1/-2 mean "until done": keep a quarter of the window for the answer
+            num_predict = num_ctx // 4
+        available = num_ctx - num_predict - self.count_tokens(system) - self.count_tokens(query) - self.reserve_tokens
+        if self.context_tokens:
+            available = min(available, self.context_tokens)
+        return max(0, available)
+
+    def build(self, query, context=None, language="auto", options=None):
+        """
+        (system, prompt, info) for one question. context is a list of search hits
+        (best first) or a plain string; info has the token counts for tracing.
+        """
+        system = self.system_prompt(language)
+        budget = self.budget(system, query, options)
+        if isinstance(context, str):
+            context = [{"content": context}] if context.strip() else []
+        chunks, info = self.fit(query, [c["content"] for c in context or []], budget)
+        prompt = f"Question: {query}"
+        if chunks:
+            prompt = "Context:\n" + "\n---\n".join(chunks) + "\n\n" + prompt
+        info["budget"] = budget
+        return system, prompt, info
+
+    def fit(self, query, chunks, budget):
+        """Deduplicated chunk texts, trimmed to budget tokens, in their original order."""
+        units = []
+        seen = set()
+        dropped = 0
+        for rank, chunk in enumerate(chunks):
+            # Split keeping the separators, so table rows stay one per line
+            pieces = _SENTENCE_END.split(chunk)
+            sentences = []
+            for i in range(0, len(pieces), 2):
+                if pieces[i].strip():
+                    newline = i > 0 and "\n" in pieces[i - 1]
+                    sentences.append((pieces[i].strip(), newline))
+            fresh = []
+            repeated = 0
+            keys = set()
+            for sentence, newline in sentences:
+                key = " ".join(sentence.lower().split())
+                if key in seen:
+                    # Already sent with a better-ranked chunk
+                    repeated += 1
+                elif key not in keys:
+                    keys.add(key)
+                    fresh.append((sentence, newline))
+            seen |= keys
+            if not fresh or repeated >= len(sentences) * self.duplicate_ratio:
+                dropped += 1
+                continue
+            for position, (sentence, newline) in enumerate(fresh):
+                units.append([rank, position, sentence, self.count_tokens(sentence), newline])
+        total = sum(u[3] for u in units)
+        info = {"chunks": len(chunks), "duplicate_chunks": dropped, "trimmed_sentences": 0}
+        if total > budget:
+            kept = self._select(query, units, budget)
+            info["trimmed_sentences"] = len(units) - len(kept)
+            units = kept
+        info["context_tokens"] = sum(u[3] for u in units)
+        out = []
+        current = None
+        for rank, _, sentence, _, newline in units:
+            if rank != current:
+                out.append(sentence)
+                current = rank
+            else:
+                out[-1] += ("\n" if newline else " ") + sentence
+        return out, info
+
+    @staticmethod
+    def _select(query, units, budget):
+        # Score = share of the question's terms in the sentence, plus a small bonus for
+        # the chunk's retrieval rank so ties keep the better chunks
+        terms = set(tokenize(query))
+        scored = []
+        for unit in units:
+            overlap = len(terms & set(tokenize(unit[2]))) / len(terms) if terms else 0.0
+            scored.append((overlap + 0.1 / (1 + unit[0]), unit))
+        scored.sort(key=lambda s: s[0], reverse=True)
+        kept = []
+        used = 0
+        for _, unit in scored:
+            # The best sentence is always kept, even if it alone exceeds the budget
+            if kept and used + unit[3] > budget:
+                continue
+            kept.append(unit)
+            used += unit[3]
+        return sorted(kept, key=lambda u: (u[0], u[1]))
@@ -1,85 +1,432 @@
 """
 GRCRAGSystem - RAG and ChromaDB Integration
 """
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
+from src.ai_core.doc_metadata import build_where
+from src.ai_core.manifest import DocumentManifest, iter_chunk_ids
+from src.ai_core.search_cache import SearchCache
+from src.utils.tracing import get_tracer, span
 import os
+import json
+
+# Bumped when ingest starts storing new chunk metadata, so indexed files are re-tagged once
+METADATA_VERSION = "2"
 
 class GRCRAGSystem:
-    def _async_similarity_search(self, queries, k=3):
+    def _chunk_text(self, text):
         """
-        Perform batched/async semantic search for multiple queries using concurrent.futures.
+        Split text (a string or an iterable of text pieces) into heading/sentence-aware
+        chunks under the embedding model's token budget. Returns a generator.
         """
-        import concurrent.futures
-        results = []
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future_to_query = {executor.submit(self.vector_db.similarity_search, q, k): q for q in queries}
-            for future in concurrent.futures.as_completed(future_to_query):
-                res = future.result()
-                results.append(res)
-        return results
-    def _chunk_text(self, text, chunk_size=1000):
+        from src.ai_core.ingest import chunk_text
+        return chunk_text(text, self.chunk_options)
+    def __init__(self, db_path="chromadb", embedding_model="sentence-transformers/multi-qa-mpnet-base-cos-v1", cache_path=None, embeddings=None):
         """
-        Split text into chunks for large document support in RAG.
+        embeddings: optional LangChain Embeddings to use instead of loading embedding_model
+        from Hugging Face (benchmarks, tests); embedding_model then only names its cache.
         """
-        return [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
-    def __init__(self, db_path="chromadb"):
+        # Heavy dependencies (torch via sentence-transformers, chromadb) load on first use
+        from langchain_chroma import Chroma
+        from src.ai_core.embedding_cache import CachedEmbeddings, EmbeddingCache
+        from src.ai_core.lexical_index import LexicalIndex
+        from src.ai_core.reranker import CrossEncoderReranker
+        if embeddings is None:
+            from langchain_huggingface import HuggingFaceEmbeddings
+            embeddings = HuggingFaceEmbeddings(model_name=embedding_model)
+            tokenizer_model = embedding_model
+        else:
+            tokenizer_model = None
         self.db_path = db_path
-        self.embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/multi-qa-mpnet-base-cos-v1")
+        self.embedding_model = embedding_model
+        # Chunk budget in embedding-model tokens (mpnet truncates input beyond 512)
+        self.chunk_options = {"max_tokens": 256, "overlap_tokens": 32, "model_name": tokenizer_model}
+        # Content-addressed cache in front of the model: identical chunks are embedded only once
+        self.embedding_cache = EmbeddingCache(cache_path or os.path.join(self.db_path, "embedding_cache.sqlite3"))
+        self.embeddings = CachedEmbeddings(embeddings, embedding_model, self.embedding_cache)
         self.vector_db = Chroma(persist_directory=self.db_path, embedding_function=self.embeddings)
+        # Chat memory has its own collection so it never competes with documents for the top k
+        self.chat_db = Chroma(collection_name="grc_chat_memory", persist_directory=self.db_path, embedding_function=self.embeddings)
+        self.manifest = DocumentManifest(os.path.join(self.db_path, "manifest.sqlite3"))
+        if self.manifest.get_meta("chat_collection") != "1":
+            self._migrate_chat_memory()
+        if not self.manifest.count():
+            # Nothing indexed yet: everything ingested from now on gets the current metadata
+            self.manifest.set_meta("metadata_version", METADATA_VERSION)
+        self.search_cache = SearchCache(max_entries=512, max_bytes=32 * 1024 * 1024, ttl=None)
+        # BM25 over the same document chunks, fused with vector hits so exact identifiers rank high
+        self.hybrid = True
+        self.lexical_index = LexicalIndex(os.path.join(self.db_path, "lexical"))
+        # Optional cross-encoder stage used by search_reranked (model loads on first use)
+        self.reranker = CrossEncoderReranker()
+        self.rerank_options = {"candidates": 20, "time_budget": 1.0, "token_budget": 768}
+        if self.lexical_index.get_meta("complete") != "1":
+            # Collection built before the lexical index existed
+            self.rebuild_lexical_index()
 
     def add_document(self, path: str):
-        # Supports multiple formats and chunks large files
-        from src.ai_core.file_loader import FileLoader
-        if not os.path.isfile(path):
-            return False
-        content = FileLoader.load_file(path)
-        if not content:
-            return False
+        # Supports multiple formats and chunks large files; unchanged files are skipped
+        summary = self.ingest_paths([path], workers=1)
+        return not summary["failed"]
+
+    def ingest_paths(self, paths, workers=None, batch_size=256, progress=None, force=False):
+        """
+        Bulk, incremental ingestion. Files are hashed, parsed and chunked in a process pool;
+        chunks from many files are grouped into large embedding batches and written to Chroma
+        with one add_documents call per batch. Unchanged files are skipped via the manifest,
+        changed files only get their changed chunks replaced.
+        progress(done, total, path, status) is called from the calling thread after each file.
+        force re-parses every file and rewrites all of its chunks (e.g. to refresh metadata).
+        Returns {"added": [...], "updated": [...], "unchanged": [...], "failed": [...]}.
+        """
+        with span("rag.ingest", files=len(paths)) as s:
+            summary = self._ingest_paths(paths, workers, batch_size, progress, force)
+            s.set(**{status: len(items) for status, items in summary.items()})
+            return summary
+
+    def _ingest_paths(self, paths, workers, batch_size, progress, force=False):
+        import concurrent.futures
         from langchain_core.documents import Document
-        chunks = self._chunk_text(content, chunk_size=1200)
-        docs = [Document(page_content=chunk, metadata={"source": os.path.basename(path)}) for chunk in chunks]
-        self.vector_db.add_documents(docs)
+        from src.ai_core.ingest import iter_chunk_records, load_and_chunk
+        summary = {"added": [], "updated": [], "unchanged": [], "failed": []}
+        total = len(paths)
+        done = 0
+        todo = []
+        entries = {}
+        for path in paths:
+            if not os.path.isfile(path):
+                status = "failed"
+            else:
+                entry = self.manifest.get(path)
+                stat = os.stat(path)
+                if entry and not force and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                    status = "unchanged"
+                else:
+                    entries[path] = entry
+                    todo.append(path)
+                    continue
+            summary[status].append(path)
+            done += 1
+            if progress:
+                progress(done, total, path, status)
+        pending_docs, pending_ids, pending_files = [], [], []
+
+        def flush():
+            for i in range(0, len(pending_docs), batch_size):
+                with span("rag.add_documents", chunks=len(pending_ids[i:i+batch_size])):
+                    self.vector_db.add_documents(pending_docs[i:i+batch_size], ids=pending_ids[i:i+batch_size])
+                with span("rag.lexical_add", chunks=len(pending_ids[i:i+batch_size])):
+                    self.lexical_index.add(pending_ids[i:i+batch_size], [d.page_content for d in pending_docs[i:i+batch_size]])
+            if pending_docs:
+                self._collection_changed()
+            # Manifest rows are written only once a file's chunks are all stored
+            for item, ids in pending_files:
+                self.manifest.put(item["path"], item["size"], item["mtime"], item["sha256"], ids)
+            pending_docs.clear()
+            pending_ids.clear()
+            pending_files.clear()
+
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(todo) > 1:
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(todo)))
+        else:
+            executor = None
+        futures = []
+        spooled = []
+        try:
+            if executor:
+                futures = [executor.submit(load_and_chunk, p, None if force else (entries[p] or {}).get("sha256"), self.chunk_options) for p in todo]
+                results = (f.result() for f in concurrent.futures.as_completed(futures))
+            else:
+                results = (load_and_chunk(p, None if force else (entries[p] or {}).get("sha256"), self.chunk_options) for p in todo)
+            for item in results:
+                spooled.append(item)
+                if item.get("parse_ms") is not None:
+                    get_tracer().record("loader.parse", item["parse_ms"], file=os.path.basename(item["path"]),
+                                        status=item["status"], chunks=item.get("chunks"))
+                path = item["path"]
+                entry = entries[path]
+                status = item["status"]
+                if status == "unchanged":
+                    self.manifest.touch(path, item["size"], item["mtime"])
+                elif status == "parsed":
+                    old_ids = set(entry["chunk_ids"]) if entry else set()
+                    ids = []
+                    records = iter_chunk_records(item["chunks_file"])
+                    for chunk_id, record in iter_chunk_ids(path, records):
+                        ids.append(chunk_id)
+                        if chunk_id in old_ids and not force:
+                            continue
+                        metadata = {"source": os.path.basename(path)}
+                        metadata.update(record["metadata"])
+                        pending_docs.append(Document(page_content=record["text"], metadata=metadata))
+                        pending_ids.append(chunk_id)
+                        if len(pending_docs) >= batch_size:
+                            flush()
+                    new_ids = set(ids)
+                    stale = [i for i in old_ids if i not in new_ids]
+                    if stale:
+                        self.vector_db.delete(ids=stale)
+                        self.lexical_index.delete(stale)
+                        self._collection_changed()
+                    pending_files.append((item, ids))
+                    status = "updated" if entry else "added"
+                summary[status].append(path)
+                done += 1
+                if progress:
+                    progress(done, total, path, status)
+            flush()
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+                spooled.extend(f.result() for f in futures if f.done() and not f.cancelled() and f.exception() is None)
+            # If ingestion aborted, spool files that were never (fully) read are still on disk
+            for item in spooled:
+                if item.get("chunks_file") and os.path.exists(item["chunks_file"]):
+                    os.remove(item["chunks_file"])
+        return summary
+
+    def remove_document(self, path):
+        """Delete a file's chunks from the vector DB and forget it in the manifest."""
+        entry = self.manifest.get(path)
+        if not entry:
+            return False
+        if entry["chunk_ids"]:
+            self.vector_db.delete(ids=entry["chunk_ids"])
+            self.lexical_index.delete(entry["chunk_ids"])
+            self._collection_changed()
+        self.manifest.remove(path)
         return True
-    def _cache_search(self):
+
+    def purge_missing(self, root=None):
+        """Remove indexed files (optionally under root) that no longer exist on disk."""
+        removed = []
+        for entry in self.manifest.entries(prefix=root):
+            if not os.path.exists(entry["path"]):
+                self.remove_document(entry["path"])
+                removed.append(entry["path"])
+        return removed
+
+    def sync_directory(self, root, extensions=(".txt", ".pdf", ".docx", ".xlsx", ".csv", ".html", ".md", ".json"), workers=None, progress=None):
         """
-        Simple in-memory cache for semantic search queries.
+        Bring the index in line with a directory tree: new files are added, changed files
+        re-chunked, deleted files purged. Cost is proportional to what changed.
         """
-        if not hasattr(self, '_search_cache'):
-            self._search_cache = {}
-        return self._search_cache
+        paths = []
+        for folder, _, files in os.walk(root):
+            for name in files:
+                if os.path.splitext(name)[1].lower() in extensions:
+                    paths.append(os.path.join(folder, name))
+        summary = self.ingest_paths(paths, workers=workers, progress=progress)
+        summary["removed"] = self.purge_missing(root)
+        return summary
+
+    def _collection_changed(self, documents=True):
+        # Any write can change search results: drop every cached result
+        self.search_cache.invalidate()
+        if documents:
+            # Document (not chat) changes also invalidate cached LLM answers
+            self.manifest.set_meta("kb_version", int(self.kb_version) + 1)
+
+    @property
+    def kb_version(self):
+        """Persistent counter bumped whenever indexed documents change."""
+        return self.manifest.get_meta("kb_version", "0")
+
     def add_chat_to_db(self, question, answer):
-        # Incremental learning: add each relevant conversation
+        # Incremental learning: add each relevant conversation to the chat memory collection
+        return self.add_chat_turns([(question, answer)])
+
+    def add_chat_turns(self, turns, ids=None):
+        """Store (question, answer) pairs in chat memory with one batched embedding + write; ids replace earlier turns."""
         from langchain_core.documents import Document
-        doc = Document(page_content=f"Question: {question}\nAnswer: {answer}", metadata={"source": "chat"})
-        self.vector_db.add_documents([doc])
+        turns = list(turns)
+        if not turns:
+            return False
+        docs = [Document(page_content=f"Question: {q}\nAnswer: {a}", metadata={"source": "chat"}) for q, a in turns]
+        with span("rag.add_chat", turns=len(docs)):
+            self.chat_db.add_documents(docs, ids=ids)
+        self._collection_changed(documents=False)
         return True
+
+    def _migrate_chat_memory(self, batch_size=500):
+        """Move chat turns stored in the document collection (older versions) to chat_db, embeddings included."""
+        collection = self.vector_db._collection
+        while True:
+            page = collection.get(where={"source": "chat"}, limit=batch_size, include=["documents", "metadatas", "embeddings"])
+            if not page["ids"]:
+                break
+            self.chat_db._collection.upsert(ids=page["ids"], embeddings=page["embeddings"],
+                                            documents=page["documents"], metadatas=page["metadatas"])
+            collection.delete(ids=page["ids"])
+        self.manifest.set_meta("chat_collection", 1)
+
+    @property
+    def needs_metadata_upgrade(self):
+        """True if indexed files were stored before the current chunk metadata existed."""
+        return self.manifest.get_meta("metadata_version", "1") != METADATA_VERSION and self.manifest.count() > 0
+
+    def upgrade_metadata(self, workers=None, progress=None):
+        """Re-tag every indexed file that still exists with the current chunk metadata (embeddings come from the cache)."""
+        paths = [e["path"] for e in self.manifest.entries() if os.path.exists(e["path"])]
+        summary = self.ingest_paths(paths, workers=workers, progress=progress, force=True) if paths else None
+        self.manifest.set_meta("metadata_version", METADATA_VERSION)
+        return summary
+
     def clean_database(self):
-        # Clean the local database
-        self.vector_db.delete_collection()
+        # Clean the local database (reset keeps the collection usable afterwards)
+        self.vector_db.reset_collection()
+        self.chat_db.reset_collection()
+        self.lexical_index.clear()
+        self.manifest.clear()
+        self.manifest.set_meta("metadata_version", METADATA_VERSION)
+        self._collection_changed()
         return True
 
-    def search(self, query: str, k=3, page=1, batch_queries=None):
+    def rebuild_lexical_index(self, batch_size=1000):
+        """(Re)build the BM25 index from the document chunks stored in Chroma."""
+        with span("rag.lexical_rebuild") as s:
+            self.lexical_index.clear()
+            offset = 0
+            while True:
+                page = self.vector_db._collection.get(where={"source": {"$ne": "chat"}}, limit=batch_size,
+                                                      offset=offset, include=["documents"])
+                if not page["ids"]:
+                    break
+                self.lexical_index.add(page["ids"], page["documents"])
+                offset += len(page["ids"])
+            self.lexical_index.set_meta("complete", 1)
+            s.set(chunks=offset)
+
+    def search_batch(self, queries, k=3, filters=None):
+        """
+        Vectorized search for many queries: one embedding forward pass for all of them and
+        one nearest-neighbour query against the collection, fused with BM25 hits. Returns
+        one result list per query, in input order; each hit has content, metadata, id and
+        distance (None for chunks only the lexical index found). filters: see search().
+        """
+        queries = list(queries)
+        if not queries:
+            return []
+        with span("rag.embed_query", queries=len(queries)):
+            vectors = self.embeddings.embed_documents(queries)
+        return self._retrieve(queries, vectors, k, build_where(filters))
+
+    def _retrieve(self, queries, vectors, n, where=None):
+        """Top-n hits per query: dense nearest neighbours, reciprocal-rank fused with BM25 hits."""
+        collection = self.vector_db._collection
+        count = collection.count()
+        if count == 0:
+            return [[] for _ in queries]
+        hybrid = self.hybrid and self.lexical_index.count > 0
+        # Fusion needs some depth on both sides to reorder the top n
+        fetch = max(2 * n, 10) if hybrid else n
+        with span("rag.vector_query", queries=len(queries), k=fetch, filtered=where is not None):
+            # The filter runs inside Chroma, so only matching chunks are scored
+            raw = collection.query(query_embeddings=vectors, n_results=min(fetch, count), where=where,
+                                   include=["documents", "metadatas", "distances"])
+        dense = []
+        for ids, docs, metas, dists in zip(raw["ids"], raw["documents"], raw["metadatas"], raw["distances"]):
+            dense.append([
+                {"id": i, "content": d, "metadata": m or {}, "distance": dist}
+                for i, d, m, dist in zip(ids, docs, metas, dists)
+            ])
+        if not hybrid:
+            return dense
+        with span("rag.lexical_query", queries=len(queries), k=fetch):
+            # BM25 knows no metadata: over-fetch, then let Chroma drop the hits the filter excludes
+            lexical = [self.lexical_index.search(q, fetch * 4 if where else fetch) for q in queries]
+            known = {hit["id"]: hit for hits in dense for hit in hits}
+            missing = list({i for hits in lexical for i, _ in hits if i not in known})
+            if missing:
+                got = collection.get(ids=missing, where=where, include=["documents", "metadatas"])
+                for i, d, m in zip(got["ids"], got["documents"], got["metadatas"]):
+                    known[i] = {"id": i, "content": d, "metadata": m or {}, "distance": None}
+        results = []
+        for dense_hits, lexical_hits in zip(dense, lexical):
+            # A lexical hit missing from Chroma (filtered out, or index out of sync) is skipped
+            lexical_hits = [known[i] for i, _ in lexical_hits if i in known][:fetch]
+            fused = self.fuse_results([dense_hits, lexical_hits])
+            results.append([{key: hit[key] for key in ("id", "content", "metadata", "distance")} for hit in fused[:n]])
+        return results
+
+    def search_chat(self, vector, k=1):
+        """Nearest past Q/A turns from chat memory, as search() results."""
+        if k <= 0 or self.chat_db._collection.count() == 0:
+            return []
+        with span("rag.chat_query", k=k):
+            results = self.chat_db.similarity_search_by_vector(vector, k=k)
+        return [{"content": r.page_content, "metadata": r.metadata} for r in results]
+
+    @staticmethod
+    def fuse_results(per_query, rrf_k=60):
+        """
+        Merge per-query result lists into one deduplicated list ranked by reciprocal-rank
+        fusion; each hit records the indices of the queries that retrieved it.
+        """
+        fused = {}
+        for query_index, hits in enumerate(per_query):
+            for rank, hit in enumerate(hits):
+                key = hit.get("id") or hit["content"]
+                item = fused.get(key)
+                if item is None:
+                    item = dict(hit, score=0.0, queries=[])
+                    fused[key] = item
+                item["score"] += 1.0 / (rrf_k + rank + 1)
+                item["queries"].append(query_index)
+        return sorted(fused.values(), key=lambda h: h["score"], reverse=True)
+
+    def search(self, query: str, k=3, page=1, batch_queries=None, filters=None, chat_k=0):
         """
-        Perform semantic search with pagination, chunking, caching, and async/batched search for best performance.
-        If batch_queries is provided, run async search for all queries and return combined results.
+        Perform hybrid (vector + BM25) search with pagination and caching.
+        If batch_queries is provided, search all of them in one vectorized pass and return
+        their results deduplicated and ranked by reciprocal-rank fusion.
+        filters narrows the documents searched by chunk metadata, e.g. {"framework": "GDPR",
+        "jurisdiction": ["EU", "ES"], "source": "rgpd.txt", "doc_year": {"$gte": 2020}}.
+        chat_k appends up to that many past Q/A turns from chat memory after the k documents.
         """
-        cache = self._cache_search()
         if batch_queries:
-            # Batched/async search for multiple queries
-            batch_results = self._async_similarity_search(batch_queries, k=k)
-            combined = []
-            for res in batch_results:
-                combined.extend(res)
-            return [{"content": r.page_content, "metadata": r.metadata} for r in combined]
-        cache_key = f"{query}|{k}|{page}"
-        if cache_key in cache:
-            results = cache[cache_key]
-        else:
+            with span("rag.search", k=k, queries=len(batch_queries)):
+                return self.fuse_results(self.search_batch(batch_queries, k=k, filters=filters))
+        where = build_where(filters)
+        with span("rag.search", k=k, page=page, filtered=where is not None) as s:
+            # Bounded LRU cache keyed by the normalized query; invalidated on every write
+            cache_key = self.search_cache.key(query, k, page, json.dumps(where, sort_keys=True), chat_k)
+            cached = self.search_cache.get(cache_key)
+            s.set(cache_hit=cached is not None)
+            if cached is not None:
+                return cached
+            generation = self.search_cache.generation
             offset = (page - 1) * k
-            results = self.vector_db.similarity_search(query, k=k+offset)
-            cache[cache_key] = results
-        paged_results = results[offset:offset+k]
-        if len(results) > 100:
-            print("[WARNING] The database is large. Use pagination and limit k for best performance.")
-        return [{"content": r.page_content, "metadata": r.metadata} for r in paged_results]
+            # Embedding, the Chroma query and the BM25 query are timed separately
+            with span("rag.embed_query"):
+                vector = self.embeddings.embed_query(query)
+            results = self._retrieve([query], [vector], k + offset, where)[0]
+            if len(results) > 100:
+                print("[WARNING] The database is large. Use pagination and limit k for best performance.")
+            paged_results = [{"content": r["content"], "metadata": r["metadata"]} for r in results[offset:offset+k]]
+            if chat_k and page == 1:
+                paged_results += self.search_chat(vector, chat_k)
+            self.search_cache.put(cache_key, paged_results, generation)
+            return paged_results
+
+    def search_reranked(self, query, k=3, filters=None, chat_k=0, candidates=None, time_budget=None, token_budget=None):
+        """
+        search() over a larger candidate set, rescored by the cross-encoder; returns at most k
+        chunks that fit token_budget (chunk tokens). Budgets default to rerank_options.
+        Falls back to plain retrieval order when no cross-encoder is available.
+        """
+        options = self.rerank_options
+        candidates = max(k, candidates or options["candidates"])
+        hits = self.search(query, k=candidates, filters=filters)
+        best = self.reranker.rerank(
+            query, hits, top_n=k,
+            token_budget=token_budget if token_budget is not None else options["token_budget"],
+            time_budget=time_budget if time_budget is not None else options["time_budget"],
+            count_tokens=self._count_tokens
+        )
+        if chat_k:
+            best += self.search_chat(self.embeddings.embed_query(query), chat_k)
+        return best
+
+    def _count_tokens(self, text):
+        from src.ai_core.ingest import get_chunker
+        return get_chunker(self.chunk_options).count_tokens(text)
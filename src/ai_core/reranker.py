@@ -0,0 +1,85 @@
+"""
+reranker.py - Optional cross-encoder rerank stage between retrieval and the LLM
+Retrieval fetches a larger candidate set cheaply; a small local cross-encoder rescores
+(query, chunk) pairs in batches on CPU and only the best chunks that fit a token budget
+go into the prompt. A time budget stops scoring early: candidates that were not scored
+keep their retrieval order behind the scored ones. Without sentence-transformers the
+stage is skipped and retrieval order is kept.
+"""
+import time
+import threading
+from src.utils.tracing import span
+
+DEFAULT_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+class CrossEncoderReranker:
+    def __init__(self, model_name=DEFAULT_MODEL, batch_size=16, max_length=512, device="cpu", model=None):
+        """model: optional object with predict(pairs, batch_size=...) to use instead of loading model_name."""
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.device = device
+        self.model = model
+        self.error = None
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        return self._load() is not None
+
+    def _load(self):
+        # Loaded on first use, off the Tk thread; a failed import is remembered, not retried
+        if self.model is None and self.error is None:
+            with self._lock:
+                if self.model is None and self.error is None:
+                    try:
+                        from sentence_transformers import CrossEncoder
+                        self.model = CrossEncoder(self.model_name, max_length=self.max_length, device=self.device)
+                    except Exception as e:
+                        self.error = f"[WARNING] Reranking disabled, could not load {self.model_name}: {e}"
+                        print(self.error)
+        return self.model
+
+    def rerank(self, query, candidates, top_n=3, token_budget=None, time_budget=None, count_tokens=None):
+        """
+        Best candidates for the query, most relevant first: at most top_n, and (when
+        token_budget is set) no more than fits in token_budget tokens as measured by
+        count_tokens. time_budget (seconds) caps the time spent scoring. Each returned hit
+        gets a "rerank_score" (None if it was not scored).
+        """
+        candidates = list(candidates)
+        model = self._load()
+        if model is None or len(candidates) <= 1:
+            return self._select(candidates, top_n, token_budget, count_tokens)
+        with span("rag.rerank", candidates=len(candidates)) as s:
+            started = time.perf_counter()
+            scores = []
+            for i in range(0, len(candidates), self.batch_size):
+                batch = candidates[i:i + self.batch_size]
+                scores.extend(float(x) for x in model.predict([(query, c["content"]) for c in batch], batch_size=self.batch_size))
+                elapsed = time.perf_counter() - started
+                # Stop if the next batch would likely overrun the budget
+                if time_budget is not None and elapsed + elapsed / len(scores) * self.batch_size > time_budget:
+                    break
+            scored = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+            ranked = [dict(candidates[i], rerank_score=scores[i]) for i in scored]
+            ranked += [dict(c, rerank_score=None) for c in candidates[len(scores):]]
+            s.set(scored=len(scores))
+            return self._select(ranked, top_n, token_budget, count_tokens)
+
+    @staticmethod
+    def _select(ranked, top_n, token_budget, count_tokens):
+        if not token_budget or count_tokens is None:
+            return ranked[:top_n]
+        selected = []
+        used = 0
+        for hit in ranked:
+            if len(selected) >= top_n:
+                break
+            tokens = count_tokens(hit["content"])
+            # The best chunk is always kept, even if it alone exceeds the budget
+            if selected and used + tokens > token_budget:
+                continue
+            selected.append(hit)
+            used += tokens
+        return selected
@@ -0,0 +1,103 @@
+"""
+search_cache.py - Bounded LRU/TTL cache for GRCRAGSystem search results
+Keys are built from the normalized query, entries are evicted by count and by
+approximate size, and every write to the collection bumps a generation counter
+that invalidates all cached results.
+"""
+import re
+import time
+import threading
+from collections import OrderedDict
+
+_STOPWORDS = {
+    "a", "an", "the", "of", "to", "in", "on", "for", "and", "or", "is", "are", "was", "be",
+    "what", "which", "does", "do", "about", "say", "says", "tell", "me", "please", "can", "you",
+    "how", "with", "by", "it", "its", "this", "that"
+}
+# Keep identifier punctuation (Art. 32, PR.AC-1, A.8.24) inside tokens
+_TOKEN = re.compile(r"[\w]+(?:[.\-][\w]+)*")
+
+def normalize_query(query):
+    """Case-fold, drop punctuation and filler words so trivially different phrasings share a key."""
+    tokens = _TOKEN.findall(query.casefold())
+    kept = [t for t in tokens if t not in _STOPWORDS]
+    return " ".join(kept or tokens)
+
+def _result_size(results):
+    size = 0
+    for r in results:
+        size += len(r.get("content", "")) + len(repr(r.get("metadata", {}))) + 64
+    return size
+
+class SearchCache:
+    def __init__(self, max_entries=512, max_bytes=32 * 1024 * 1024, ttl=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._entries = OrderedDict()  # key -> (results, size, stored_at)
+        self._lock = threading.Lock()
+
+    def key(self, query, *params):
+        return (normalize_query(query),) + params
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and self.ttl is not None and time.monotonic() - item[2] > self.ttl:
+                self._drop(key)
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, results, generation=None):
+        """
+        Store results. Pass the generation read before the search started: if the collection
+        changed meanwhile, the (possibly stale) results are not cached.
+        """
+        size = _result_size(results)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if size > self.max_bytes:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (results, size, time.monotonic())
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def invalidate(self):
+        """Called on every write to the collection."""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "generation": self.generation
+            }
+
+    def _drop(self, key):
+        results, size, _ = self._entries.pop(key)
+        self._bytes -= size
@@ -0,0 +1,148 @@
+"""
+services.py - Shared, lazily built AI services for GRC Brain AI
+Builds the LLM client, the RAG system (torch/transformers/chromadb) and the answer cache
+exactly once, in a background thread, and reports readiness so the UI can open as soon
+as the LLM check is done while the embedding model is still warming up.
+"""
+import os
+import threading
+
+class ServiceContainer:
+    def __init__(self, db_path="chromadb", ollama_host="http://localhost:11434", model=None, profile=None):
+        """model: Ollama model to use instead of the active profile's; profile: profile to activate."""
+        self.db_path = db_path
+        self.ollama_host = ollama_host
+        self.llm = None
+        self.rag = None
+        self.answer_cache = None
+        self.chat_memory = None
+        self.rag_error = None
+        self.progress = 0.0
+        self.status = "Starting..."
+        self.llm_ready = threading.Event()
+        self.rag_ready = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        from src.ai_core.profiles import PerformanceProfiles
+        # Active performance profile and its measured latency, persisted next to the index
+        self.profiles = PerformanceProfiles(os.path.join(self.db_path, "profiles.json"))
+        if profile:
+            # Saved as active only once its model is known to load (see _apply)
+            self.profiles.set_active(profile, persist=False)
+        self.profile_notice = None
+        # An explicitly requested model wins over the profile until the profile is switched
+        self.pinned_model = model
+        self.model = model or self.profiles.get()["model"]
+
+    def start(self):
+        """Start warming up in the background. Safe to call more than once."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._warm_up, name="ServiceWarmUp", daemon=True)
+                self._thread.start()
+        return self
+
+    def wait_rag(self, timeout=None):
+        """Block until the RAG system is built (or failed). Returns it, or None."""
+        self.rag_ready.wait(timeout)
+        return self.rag
+
+    @property
+    def profile(self):
+        return self.profiles.get()
+
+    def apply_profile(self, name=None):
+        """
+        Switch the running pipeline to a performance profile (no restart): generation
+        options, model, context budget, rerank budget and answer-cache strictness. Parts
+        that are still loading pick it up when they are built. Blocks on an Ollama call
+        when the model changes, so call it off the Tk thread. Returns a notice or None.
+        """
+        if name:
+            self.pinned_model = None
+        return self._apply(name)
+
+    def _apply(self, name=None):
+        name = name or self.profiles.active
+        profile = self.profiles.get(name)
+        notice = None
+        model_loaded = True
+        if self.llm is not None:
+            self.llm.options = dict(profile["options"])
+            self.llm.context_tokens = profile["context_tokens"]
+            wanted = self.pinned_model or profile.get("model")
+            if wanted and (wanted != self.llm.model or self.llm.llm is None):
+                error = self.llm.set_model(wanted)
+                if error:
+                    model_loaded = False
+                    # An explicit model is never swapped for another behind the caller's back
+                    notice = f"{name}: {error}" if self.pinned_model else self._fall_back(name, wanted, error)
+        # Only a profile whose model loads is remembered for the next start
+        self.profiles.set_active(name, persist=model_loaded)
+        if self.rag is not None:
+            self.rag.rerank_options["token_budget"] = profile["context_tokens"]
+            if profile.get("embedding_model") and profile["embedding_model"] != self.rag.embedding_model:
+                notice = f"{name}: the index uses {self.rag.embedding_model}; re-index to change the embedding model"
+        if self.answer_cache is not None:
+            self.answer_cache.threshold = profile["answer_cache_threshold"]
+        self.profile_notice = notice
+        return notice
+
+    def _apply_loaded(self):
+        # Second pass once the RAG side exists: the model was already settled by the first
+        profile = self.profiles.get()
+        self.rag.rerank_options["token_budget"] = profile["context_tokens"]
+        self.answer_cache.threshold = profile["answer_cache_threshold"]
+        if profile.get("embedding_model") and profile["embedding_model"] != self.rag.embedding_model:
+            self.profile_notice = self.profile_notice or f"{self.profiles.active}: the index uses {self.rag.embedding_model}; re-index to change the embedding model"
+
+    def _fall_back(self, name, wanted, error):
+        """The model of a profile did not load: keep (or load) a working one and say so."""
+        from src.ai_core.profiles import DEFAULT_PROFILE
+        if self.llm.llm is None:
+            # Nothing loaded yet (e.g. cold start on a profile whose model was never pulled)
+            fallback = self.profiles.get(DEFAULT_PROFILE)["model"]
+            if fallback == wanted or self.llm.set_model(fallback):
+                return f"{name}: {error}"
+        # e.g. the quantized build is not pulled: keep answering with the current model
+        return f"{name}: using {self.llm.model} ({wanted} is not available)"
+
+    def _step(self, progress, status):
+        self.progress = progress
+        self.status = status
+
+    def _warm_up(self):
+        self._step(0.05, "Connecting to Ollama...")
+        from src.ai_core.llm_client import GRCBrainLLM
+        self.llm = GRCBrainLLM(host=self.ollama_host, model=self.model)
+        self._apply()
+        self._step(0.25, "Ollama ready." if self.llm.llm is not None else "Ollama not available.")
+        self.llm_ready.set()
+        try:
+            self._step(0.3, "Loading embedding model...")
+            # Heavy imports (torch, transformers, chromadb) happen here, off the Tk thread
+            from src.ai_core.rag_system import GRCRAGSystem
+            self.rag = GRCRAGSystem(db_path=self.db_path)
+            if self.rag.needs_metadata_upgrade:
+                self._step(0.6, "Tagging indexed documents with framework metadata...")
+                self.rag.upgrade_metadata()
+            self._step(0.8, "Warming up embeddings...")
+            self.rag.embeddings.embed_query("warm up")
+            from src.ai_core.answer_cache import SemanticAnswerCache
+            # Near-identical questions over the same context are answered from disk
+            self.answer_cache = SemanticAnswerCache(
+                path=os.path.join(self.db_path, "answer_cache.sqlite3"),
+                embeddings=self.rag.embeddings,
+                kb_version=lambda: self.rag.kb_version
+            )
+            self.llm.answer_cache = self.answer_cache
+            from src.ai_core.chat_memory import ChatMemoryBuffer
+            # Answered turns reach chat memory in batches, off the answer path
+            self.chat_memory = ChatMemoryBuffer(self.rag)
+            self._apply_loaded()
+            self._step(1.0, "Ready.")
+        except Exception as e:
+            self.rag_error = f"[ERROR] Could not load the knowledge base: {e}"
+            self._step(1.0, self.rag_error)
+        finally:
+            self.rag_ready.set()
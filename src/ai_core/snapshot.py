@@ -0,0 +1,161 @@
+"""
+snapshot.py - Knowledge-base snapshots: export and restore without re-embedding
+A snapshot is one zip file (.kbsnap) with:
+  snapshot.json    format version, embedding model, vector size and counts
+  records.jsonl    one {"id", "collection", "document", "metadata"} per line
+  embeddings.npy   float32 [count, dim]; row i is the vector of line i
+Export pages through the document and chat-memory collections by ID; import upserts
+the stored vectors in batches (nothing is embedded again) and re-indexes the chunks
+for BM25. The vectors are only usable with the embedding model that produced them.
+"""
+import io
+import os
+import json
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime
+import numpy as np
+from src.ai_core.embedding_cache import text_hash
+from src.utils.tracing import span
+
+FORMAT_VERSION = 1
+EXTENSION = ".kbsnap"
+
+def _collections(rag):
+    return [("documents", rag.vector_db._collection), ("chat", rag.chat_db._collection)]
+
+def export_snapshot(rag, path, batch_size=1000, progress=None):
+    """
+    Write every chunk and chat turn of rag to path. progress(done, total) is called
+    after each batch. Returns {"path", "count", "documents", "chat", "dim"}.
+    """
+    with span("kb.export") as s:
+        ids = {name: collection.get(include=[])["ids"] for name, collection in _collections(rag)}
+        total = sum(len(v) for v in ids.values())
+        counts = {name: 0 for name in ids}
+        dim = None
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        # Vectors are spooled raw first: the .npy header needs the final row count
+        with tempfile.TemporaryDirectory(dir=folder) as tmp:
+            raw_path = os.path.join(tmp, "embeddings.raw")
+            records_path = os.path.join(tmp, "records.jsonl")
+            with open(raw_path, "wb") as raw, open(records_path, "w", encoding="utf-8") as records:
+                for name, collection in _collections(rag):
+                    for i in range(0, len(ids[name]), batch_size):
+                        page = collection.get(ids=ids[name][i:i + batch_size], include=["documents", "metadatas", "embeddings"])
+                        if not len(page["ids"]):
+                            continue
+                        vectors = np.asarray(page["embeddings"], dtype="<f4")
+                        if dim is None:
+                            dim = vectors.shape[1]
+                        raw.write(vectors.tobytes())
+                        for chunk_id, document, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+                            records.write(json.dumps({"id": chunk_id, "collection": name, "document": document,
+                                                      "metadata": metadata or {}}, ensure_ascii=False) + "\n")
+                        counts[name] += len(page["ids"])
+                        if progress:
+                            progress(sum(counts.values()), total)
+            count = sum(counts.values())
+            header = {
+                "format": FORMAT_VERSION,
+                "embedding_model": rag.embedding_model,
+                "dim": dim or 0,
+                "count": count,
+                "documents": counts["documents"],
+                "chat": counts["chat"],
+                "created": datetime.now().isoformat(timespec="seconds")
+            }
+            tmp_path = os.path.join(tmp, "snapshot" + EXTENSION)
+            with zipfile.ZipFile(tmp_path, "w", allowZip64=True) as zf:
+                zf.writestr("snapshot.json", json.dumps(header, indent=2))
+                zf.write(records_path, "records.jsonl", compress_type=zipfile.ZIP_DEFLATED)
+                # float32 vectors barely compress: store them as is
+                with zf.open("embeddings.npy", "w", force_zip64=True) as out:
+                    np.lib.format.write_array_header_1_0(out, {"descr": "<f4", "fortran_order": False, "shape": (count, dim or 0)})
+                    with open(raw_path, "rb") as raw:
+                        shutil.copyfileobj(raw, out, 16 * 2**20)
+            os.replace(tmp_path, path)
+        s.set(count=count)
+        return {"path": path, "count": count, "documents": counts["documents"], "chat": counts["chat"], "dim": dim or 0}
+
+def read_header(path):
+    with zipfile.ZipFile(path) as zf:
+        return json.loads(zf.read("snapshot.json"))
+
+def import_snapshot(rag, path, batch_size=1000, progress=None, seed_cache=True):
+    """
+    Upsert every record of a snapshot into rag with its stored vector. Existing chunks
+    with the same id are replaced, others are kept. seed_cache also stores the vectors
+    in the embedding cache, so re-ingesting the same files later skips the model.
+    Raises ValueError if the snapshot was made with another embedding model.
+    Returns {"count", "documents", "chat"}.
+    """
+    with span("kb.import") as s, zipfile.ZipFile(path) as zf:
+        header = json.loads(zf.read("snapshot.json"))
+        if header.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format: {header.get('format')}")
+        if header["embedding_model"] != rag.embedding_model:
+            raise ValueError(f"Snapshot vectors come from {header['embedding_model']}, but this knowledge base uses "
+                             f"{rag.embedding_model}. Re-ingest the source documents instead.")
+        collections = dict(_collections(rag))
+        counts = {"documents": 0, "chat": 0}
+        with zf.open("embeddings.npy") as vectors, zf.open("records.jsonl") as lines:
+            version = np.lib.format.read_magic(vectors)
+            read_header_fn = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            shape, _, dtype = read_header_fn(vectors)
+            count, dim = shape
+            row_bytes = dim * dtype.itemsize
+            records = io.TextIOWrapper(lines, encoding="utf-8")
+            done = 0
+            while done < count:
+                batch = [json.loads(records.readline()) for _ in range(min(batch_size, count - done))]
+                block = np.frombuffer(vectors.read(len(batch) * row_bytes), dtype=dtype).reshape(len(batch), dim)
+                for name in ("documents", "chat"):
+                    rows = [i for i, r in enumerate(batch) if r["collection"] == name]
+                    if not rows:
+                        continue
+                    part = [batch[i] for i in rows]
+                    ids = [r["id"] for r in part]
+                    documents = [r["document"] for r in part]
+                    embeddings = block[rows].astype(np.float32)
+                    # Chroma rejects empty metadata dicts
+                    metadatas = [r["metadata"] or {"source": "snapshot"} for r in part]
+                    collections[name].upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+                    if name == "documents":
+                        rag.lexical_index.add(ids, documents)
+                    if seed_cache:
+                        rag.embedding_cache.put_many(rag.embedding_model, zip((text_hash(d) for d in documents), embeddings))
+                    counts[name] += len(part)
+                done += len(batch)
+                if progress:
+                    progress(done, count)
+        rag._collection_changed()
+        s.set(count=done)
+        return {"count": done, "documents": counts["documents"], "chat": counts["chat"]}
+
+def import_legacy_json(rag, path, batch_size=256, progress=None):
+    """Import a JSON list of {"content", "metadata"} (old exports, no vectors): embedded in batches."""
+    import uuid
+    from langchain_core.documents import Document
+    with open(path, "r", encoding="utf-8") as f:
+        kb_data = json.load(f)
+    counts = {"documents": 0, "chat": 0}
+    for i in range(0, len(kb_data), batch_size):
+        docs = [Document(page_content=d["content"], metadata=d.get("metadata") or {"source": "import"}) for d in kb_data[i:i + batch_size]]
+        # Old exports mixed chat turns in with the documents
+        chat = [d for d in docs if d.metadata.get("source") == "chat"]
+        docs = [d for d in docs if d.metadata.get("source") != "chat"]
+        if chat:
+            rag.chat_db.add_documents(chat)
+        if docs:
+            ids = [str(uuid.uuid4()) for _ in docs]
+            rag.vector_db.add_documents(docs, ids=ids)
+            rag.lexical_index.add(ids, [d.page_content for d in docs])
+        counts["documents"] += len(docs)
+        counts["chat"] += len(chat)
+        if progress:
+            progress(min(i + batch_size, len(kb_data)), len(kb_data))
+    rag._collection_changed()
+    return {"count": len(kb_data), "documents": counts["documents"], "chat": counts["chat"]}
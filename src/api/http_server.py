@@ -0,0 +1,405 @@
+"""
+http_server.py - Headless asyncio HTTP API for the GRC Brain AI RAG + LLM pipeline
+Endpoints (JSON in, JSON out):
+  GET  /health                               readiness, queue depth, cache and stage latency stats
+  POST /search  {"query", "k", "filters", "rerank"}
+                                             retrieval only
+  POST /ask     {"query", "k", "filters", "rerank", "language", "stream"}
+                                             answer with sources; "stream": true returns
+                                             NDJSON lines {"token": ...} then {"done": true, ...}
+                                             "filters": chunk metadata, e.g. {"framework": "GDPR"}
+                                             "rerank": rescore candidates with the cross-encoder
+  POST /ingest  {"paths": [...]}             index server-side files under the ingest root
+Jobs go through a bounded queue served by a fixed pool of workers. A full queue
+answers 503 (backpressure) and every job has a deadline (504 when exceeded).
+"""
+import os
+import json
+import asyncio
+import concurrent.futures
+from src.utils.tracing import get_tracer
+
+_REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+            500: "Internal Server Error", 503: "Service Unavailable", 504: "Gateway Timeout"}
+MAX_BODY = 1024 * 1024
+MAX_K = 50
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+class _Job:
+    def __init__(self, func):
+        self.func = func
+        self.future = asyncio.get_running_loop().create_future()
+        self.task = None
+
+class GRCBrainServer:
+    def __init__(self, services, host="127.0.0.1", port=8765, workers=4, queue_size=64, request_timeout=120.0,
+                 ingest_root=None):
+        """ingest_root: only files under this folder can be indexed via /ingest (None disables /ingest)"""
+        self.services = services
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.queue_size = queue_size
+        self.request_timeout = request_timeout
+        self.ingest_root = os.path.realpath(ingest_root) if ingest_root else None
+        # Blocking RAG calls (embedding, Chroma) run here, never on the event loop
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="grc-api")
+        self.queue = None
+        self._server = None
+        self._worker_tasks = []
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    async def start(self):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        # Port 0 means "pick a free port": report the real one
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        if self.services.llm is not None:
+            # The async Ollama pool belongs to this loop: close it before the loop ends
+            await self.services.llm.client.aclose()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    # ---- job queue ----
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                if job.future.done():
+                    # Caller already gave up (timeout / disconnect) while the job was queued
+                    continue
+                job.task = asyncio.ensure_future(job.func())
+                try:
+                    result = await job.task
+                    if not job.future.done():
+                        job.future.set_result(result)
+                except asyncio.CancelledError:
+                    if not job.future.done():
+                        job.future.cancel()
+                    # Only the job was cancelled (deadline); a cancelled worker must stop
+                    if asyncio.current_task().cancelling():
+                        raise
+                except Exception as e:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+            finally:
+                self.queue.task_done()
+
+    def _submit(self, func):
+        job = _Job(func)
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise HTTPError(503, "Server busy: request queue is full, retry later")
+        return job
+
+    async def _run_job(self, func, timeout):
+        job = self._submit(func)
+        try:
+            result = await asyncio.wait_for(asyncio.shield(job.future), timeout)
+            self.completed += 1
+            return result
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            self._cancel(job)
+            raise HTTPError(504, f"Request exceeded its {timeout:.0f}s deadline")
+        except asyncio.CancelledError:
+            self._cancel(job)
+            raise
+
+    @staticmethod
+    def _cancel(job):
+        if job.task is not None:
+            job.task.cancel()
+        if not job.future.done():
+            job.future.cancel()
+
+    async def _blocking(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def _rag(self):
+        rag = await self._blocking(self.services.wait_rag)
+        if rag is None:
+            raise HTTPError(503, self.services.rag_error or "Knowledge base not available")
+        return rag
+
+    # ---- endpoints ----
+
+    async def health(self, body):
+        llm = self.services.llm
+        return {
+            "status": "ok" if self.services.rag_ready.is_set() and self.services.rag is not None else "starting",
+            "llm": bool(llm and llm.llm),
+            "llm_error": llm.error if llm else None,
+            "rag": self.services.rag is not None,
+            "loading": self.services.status,
+            "queue": {"depth": self.queue.qsize(), "max": self.queue_size, "workers": self.workers},
+            "requests": {"completed": self.completed, "rejected": self.rejected, "timed_out": self.timed_out},
+            "cache": {
+                "search": self.services.rag.search_cache.stats() if self.services.rag else None,
+                "answers": self.services.answer_cache.stats() if self.services.answer_cache else None
+            },
+            # Per-stage latency (and generation tokens/sec) over recent requests
+            "stages": get_tracer().stats()
+        }
+
+    async def search(self, body):
+        query = self._require(body, "query")
+        k = self._k(body)
+        filters = self._filters(body)
+        rerank = self._flag(body, "rerank")
+
+        async def job():
+            rag = await self._rag()
+            return {"results": await self._blocking(self._retrieve, rag, query, k, filters, rerank)}
+        return await self._run_job(job, self._timeout(body))
+
+    async def ask(self, body):
+        query = self._require(body, "query")
+        k = self._k(body)
+        filters = self._filters(body)
+        rerank = self._flag(body, "rerank")
+        language = body.get("language", "en")
+
+        async def job():
+            rag = await self._rag()
+            context = await self._blocking(self._retrieve, rag, query, k, filters, rerank)
+            answer = await self.services.llm.aask(query, context=context, language=language)
+            return {"answer": answer, "sources": self._sources(context)}
+        return await self._run_job(job, self._timeout(body))
+
+    async def ask_stream(self, body, writer):
+        query = self._require(body, "query")
+        k = self._k(body)
+        filters = self._filters(body)
+        rerank = self._flag(body, "rerank")
+        language = body.get("language", "en")
+        timeout = self._timeout(body)
+        # Bounded: a slow client slows the generator down instead of buffering the answer
+        events = asyncio.Queue(maxsize=256)
+
+        async def job():
+            rag = await self._rag()
+            context = await self._blocking(self._retrieve, rag, query, k, filters, rerank)
+            async for chunk in self.services.llm.aask_stream(query, context=context, language=language):
+                await events.put({"token": chunk})
+            await events.put({"done": True, "sources": self._sources(context)})
+
+        job_handle = self._submit(job)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        await self._write_head(writer, 200, "application/x-ndjson", chunked=True)
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                getter = asyncio.ensure_future(events.get())
+                done, _ = await asyncio.wait({getter, job_handle.future}, timeout=max(0, remaining), return_when=asyncio.FIRST_COMPLETED)
+                if getter in done:
+                    event = getter.result()
+                    await self._write_chunk(writer, json.dumps(event, ensure_ascii=False) + "\n")
+                    if event.get("done"):
+                        self.completed += 1
+                        break
+                    continue
+                getter.cancel()
+                if not done:
+                    self.timed_out += 1
+                    await self._write_chunk(writer, json.dumps({"error": f"Request exceeded its {timeout:.0f}s deadline"}) + "\n")
+                    break
+                # The job ended before its final event: flush what it queued, then report why
+                while not events.empty():
+                    await self._write_chunk(writer, json.dumps(events.get_nowait(), ensure_ascii=False) + "\n")
+                error = None if job_handle.future.cancelled() else job_handle.future.exception()
+                message = error.message if isinstance(error, HTTPError) else str(error or "Request cancelled")
+                await self._write_chunk(writer, json.dumps({"error": message}) + "\n")
+                break
+        finally:
+            self._cancel(job_handle)
+            await self._write_chunk(writer, "")
+
+    async def ingest(self, body):
+        paths = body.get("paths")
+        if not isinstance(paths, list) or not paths or not all(isinstance(p, str) for p in paths):
+            raise HTTPError(400, "'paths' must be a non-empty list of server-side file paths")
+        paths = [self._ingest_path(p) for p in paths]
+
+        async def job():
+            rag = await self._rag()
+            return await self._blocking(rag.ingest_paths, paths)
+        return await self._run_job(job, self._timeout(body, default=max(self.request_timeout, 3600.0)))
+
+    # ---- HTTP plumbing ----
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            method, path, body = await self._read_request(reader)
+            routes = {
+                ("GET", "/health"): self.health,
+                ("POST", "/search"): self.search,
+                ("POST", "/ask"): self.ask,
+                ("POST", "/ingest"): self.ingest
+            }
+            if (method, path) not in routes:
+                if any(p == path for _, p in routes):
+                    raise HTTPError(405, f"{method} not allowed on {path}")
+                raise HTTPError(404, f"Unknown endpoint {path}")
+            if path == "/ask" and body.get("stream"):
+                await self.ask_stream(body, writer)
+            else:
+                await self._send_json(writer, 200, await routes[(method, path)](body))
+        except HTTPError as e:
+            await self._send_json(writer, e.status, {"error": e.message})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            await self._send_json(writer, 500, {"error": str(e)})
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    @staticmethod
+    async def _read_request(reader):
+        head = await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", "0") or 0)
+        if length > MAX_BODY:
+            raise HTTPError(413, "Request body too large")
+        body = {}
+        if length:
+            raw = await reader.readexactly(length)
+            try:
+                body = json.loads(raw.decode("utf-8"))
+            except ValueError:
+                raise HTTPError(400, "Body must be valid JSON")
+            if not isinstance(body, dict):
+                raise HTTPError(400, "Body must be a JSON object")
+        return method.upper(), target.split("?", 1)[0], body
+
+    @staticmethod
+    def _require(body, field):
+        value = body.get(field)
+        if not isinstance(value, str) or not value.strip():
+            raise HTTPError(400, f"'{field}' is required")
+        return value
+
+    @staticmethod
+    def _k(body):
+        k = body.get("k", 3)
+        if isinstance(k, bool) or not isinstance(k, int) or not 1 <= k <= MAX_K:
+            raise HTTPError(400, f"'k' must be an integer between 1 and {MAX_K}")
+        return k
+
+    @staticmethod
+    def _retrieve(rag, query, k, filters, rerank):
+        if rerank:
+            return rag.search_reranked(query, k=k, filters=filters)
+        return rag.search(query, k, filters=filters)
+
+    @staticmethod
+    def _flag(body, name, default=False):
+        value = body.get(name, default)
+        if not isinstance(value, bool):
+            raise HTTPError(400, f"'{name}' must be true or false")
+        return value
+
+    @staticmethod
+    def _filters(body):
+        filters = body.get("filters")
+        if filters is None:
+            return None
+        if not isinstance(filters, dict) or not all(isinstance(key, str) and not key.startswith("$") for key in filters):
+            raise HTTPError(400, "'filters' must be an object mapping metadata fields to values")
+        for value in filters.values():
+            if isinstance(value, list):
+                if not all(isinstance(v, (str, int, float)) for v in value):
+                    raise HTTPError(400, "'filters' lists may only hold strings and numbers")
+            elif isinstance(value, dict):
+                if not all(op in ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$in", "$nin") for op in value):
+                    raise HTTPError(400, "'filters' operators must be one of $eq, $ne, $gt, $gte, $lt, $lte, $in, $nin")
+            elif not isinstance(value, (str, int, float)) or isinstance(value, bool):
+                raise HTTPError(400, "'filters' values must be strings, numbers, lists or operator objects")
+        return filters
+
+    def _timeout(self, body, default=None):
+        limit = default or self.request_timeout
+        timeout = body.get("timeout", limit)
+        if isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or not timeout > 0:
+            raise HTTPError(400, "'timeout' must be a positive number of seconds")
+        return min(float(timeout), limit)
+
+    def _ingest_path(self, path):
+        """Resolve a requested path; anything outside the ingest root is refused."""
+        if self.ingest_root is None:
+            raise HTTPError(403, "Ingestion over HTTP is disabled (start the server with --ingest-root)")
+        real = os.path.realpath(os.path.join(self.ingest_root, path))
+        if os.path.commonpath([real, self.ingest_root]) != self.ingest_root:
+            raise HTTPError(403, f"Path is outside the ingest root: {path}")
+        return real
+
+    @staticmethod
+    def _sources(context):
+        sources = []
+        for c in context or []:
+            src = (c.get("metadata") or {}).get("source", "")
+            if src and src not in sources:
+                sources.append(src)
+        return sources
+
+    @staticmethod
+    async def _write_head(writer, status, content_type, length=None, chunked=False):
+        head = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", f"Content-Type: {content_type}", "Connection: close"]
+        if chunked:
+            head.append("Transfer-Encoding: chunked")
+        elif length is not None:
+            head.append(f"Content-Length: {length}")
+        if status == 503:
+            head.append("Retry-After: 1")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+
+    @staticmethod
+    async def _write_chunk(writer, text):
+        data = text.encode("utf-8")
+        writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+        await writer.drain()
+
+    async def _send_json(self, writer, status, obj):
+        data = json.dumps(obj, ensure_ascii=False, default=str).encode("utf-8")
+        await self._write_head(writer, status, "application/json", length=len(data))
+        writer.write(data)
+        await writer.drain()
@@ -0,0 +1,77 @@
+"""
+stub_ollama.py - Minimal stand-in for the Ollama API, for testing the HTTP server offline
+Implements GET /api/tags and POST /api/generate (streaming and non-streaming) with a
+canned answer and a configurable per-token delay.
+Run: python -m src.api.stub_ollama --port 11435 --model llama3:8b
+"""
+import json
+import time
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    model = "llama3:8b"
+    token_delay = 0.02
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, obj):
+        data = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send(200, {"models": [{"name": self.model}]})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self._send(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if request.get("model") != self.model:
+            self._send(404, {"error": f"model '{request.get('model')}' not found"})
+            return
+        question = request.get("prompt", "").split("Question:")[-1].split("\n")[0].strip()
+        tokens = ["Stub", " answer", " to", ": ", question or "(empty)"]
+        # Same final counters as Ollama, so token rates can be measured against the stub
+        counters = {"prompt_eval_count": len(request.get("prompt", "").split()), "eval_count": len(tokens),
+                    "eval_duration": int(self.token_delay * len(tokens) * 1e9)}
+        if not request.get("stream", True):
+            time.sleep(self.token_delay * len(tokens))
+            self._send(200, dict(counters, model=self.model, response="".join(tokens), done=True))
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, token in enumerate(tokens + [""]):
+            time.sleep(self.token_delay)
+            done = i == len(tokens)
+            line = (json.dumps(dict(counters if done else {}, model=self.model, response=token, done=done)) + "\n").encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+def serve(host="127.0.0.1", port=11435, model="llama3:8b", token_delay=0.02):
+    handler = type("Handler", (StubOllamaHandler,), {"model": model, "token_delay": token_delay})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"Stub Ollama serving '{model}' on http://{host}:{port}")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub Ollama server for local testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--model", default="llama3:8b")
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.model, args.token_delay)
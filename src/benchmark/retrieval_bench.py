@@ -0,0 +1,251 @@
+"""
+retrieval_bench.py - Retrieval benchmark for GRCRAGSystem
+Builds a fresh index from official_docs/*.txt and/or a synthetic corpus of a given size,
+replays a labeled query set through GRCRAGSystem.search and reports search latency
+percentiles, ingestion throughput, index size on disk, peak RSS and recall@k / MRR.
+Results are saved as JSON so runs can be compared over time.
+Runs offline with HashingEmbeddings (deterministic, no model download) or any local
+sentence-transformers model.
+"""
+import os
+import re
+import sys
+import json
+import glob
+import time
+import random
+import shutil
+import hashlib
+import tempfile
+import platform
+import subprocess
+from datetime import datetime
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+QUERIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "queries.json")
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic bag-of-words embedder (feature hashing of unigrams and bigrams).
+    Lexical rather than semantic, but stable across runs and machines, so latency and
+    recall numbers are comparable without downloading a model.
+    """
+    def __init__(self, dim=384):
+        self.dim = dim
+        self._slots = {}
+
+    def _slot(self, token):
+        slot = self._slots.get(token)
+        if slot is None:
+            h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            slot = (h % self.dim, 1.0 if (h >> 63) & 1 else -1.0)
+            self._slots[token] = slot
+        return slot
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        tokens = re.findall(r"\w+", text.lower())
+        for token in tokens + [a + " " + b for a, b in zip(tokens, tokens[1:])]:
+            index, sign = self._slot(token)
+            vector[index] += sign
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+def load_queries(path=QUERIES_PATH):
+    """Labeled queries: [{"query": ..., "relevant": [source file names]}]"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+_WORDS = ("risk assessment control policy access audit evidence incident response asset inventory "
+          "supplier encryption key management logging monitoring backup continuity awareness training "
+          "vulnerability patch configuration identity authentication privilege segregation retention "
+          "classification privacy consent breach notification governance oversight board reporting "
+          "third party cloud network segmentation firewall malware physical security change management "
+          "documentation review approval exception register owner treatment residual appetite").split()
+
+def build_synthetic_corpus(folder, chunks, sections_per_file=100, queries=200, seed=42):
+    """
+    Write about `chunks` chunks of GRC-like text (one heading-delimited section per chunk)
+    and return labeled queries that each target one section's control identifier.
+    """
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    files = max(1, (chunks + sections_per_file - 1) // sections_per_file)
+    targets = set(rng.sample(range(chunks), min(queries, chunks)))
+    labeled = []
+    section = 0
+    for file_index in range(files):
+        name = f"synthetic_{file_index:05d}.txt"
+        with open(os.path.join(folder, name), "w", encoding="utf-8") as f:
+            for _ in range(sections_per_file):
+                if section >= chunks:
+                    break
+                control = f"SYN-{file_index:05d}-{section % sections_per_file:03d}"
+                topic = rng.sample(_WORDS, 3)
+                body = " ".join(rng.choice(_WORDS) for _ in range(110))
+                f.write(f"Control {control} {' '.join(topic).title()}\n\n")
+                f.write(f"Control {control} requires {' and '.join(topic)}. {body.capitalize()}.\n\n")
+                if section in targets:
+                    labeled.append({"query": f"What does control {control} require about {topic[0]} and {topic[1]}?", "relevant": [name]})
+                section += 1
+    return labeled
+
+def percentile(values, p):
+    return float(np.percentile(values, p)) if values else None
+
+def folder_size(path):
+    total = 0
+    for folder, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(folder, name))
+            except OSError:
+                pass
+    return total
+
+def peak_rss_mb():
+    """Peak resident memory of this process and its (ingestion) children, in MB."""
+    try:
+        import resource
+        scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+        own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+        children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+        return {"process": own / 2**20, "children": children / 2**20}
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return {"process": getattr(info, "peak_wset", info.rss) / 2**20, "children": None}
+    except ImportError:
+        return None
+
+def score(results, relevant, k):
+    """recall@k and reciprocal rank of one query, with relevance judged by source file."""
+    sources = [(r.get("metadata") or {}).get("source") for r in results[:k]]
+    relevant = set(relevant)
+    found = relevant.intersection(sources)
+    rank = next((i for i, s in enumerate(sources, start=1) if s in relevant), None)
+    return len(found) / len(relevant), (1.0 / rank if rank else 0.0)
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+def run_benchmark(docs="official_docs", synthetic=0, queries_path=QUERIES_PATH, embedder="hashing", k=3,
+                  repeat=3, workers=None, work_dir=None, keep=False, synthetic_queries=200, hybrid=True, log=print):
+    from src.ai_core.rag_system import GRCRAGSystem
+    own_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix="grc_bench_")
+    db_path = os.path.join(work_dir, "db")
+    if os.path.exists(db_path):
+        shutil.rmtree(db_path)
+    try:
+        paths = sorted(glob.glob(os.path.join(docs, "*.txt"))) if docs else []
+        labeled = load_queries(queries_path) if paths and queries_path else []
+        if synthetic:
+            log(f"Generating synthetic corpus of {synthetic} chunks...")
+            folder = os.path.join(work_dir, "synthetic")
+            labeled += build_synthetic_corpus(folder, synthetic, queries=synthetic_queries)
+            paths += sorted(glob.glob(os.path.join(folder, "*.txt")))
+        if not paths:
+            raise ValueError("Nothing to index: no official docs found and no synthetic corpus requested")
+        if embedder == "hashing":
+            rag = GRCRAGSystem(db_path=db_path, embedding_model="hashing-384", embeddings=HashingEmbeddings())
+        else:
+            rag = GRCRAGSystem(db_path=db_path, embedding_model=embedder)
+        rag.hybrid = hybrid
+
+        log(f"Indexing {len(paths)} files...")
+        t0 = time.perf_counter()
+        summary = rag.ingest_paths(paths, workers=workers)
+        ingest_seconds = time.perf_counter() - t0
+        chunks = rag.vector_db._collection.count()
+
+        log(f"Replaying {len(labeled)} queries x {repeat}...")
+        cold, warm = [], []
+        recalls, reciprocal_ranks = [], []
+        for run in range(max(1, repeat)):
+            for item in labeled:
+                # Measure the search itself, not the result cache in front of it
+                rag.search_cache.invalidate()
+                t0 = time.perf_counter()
+                results = rag.search(item["query"], k=k)
+                elapsed = (time.perf_counter() - t0) * 1000
+                if run == 0:
+                    cold.append(elapsed)
+                    recall, rr = score(results, item["relevant"], k)
+                    recalls.append(recall)
+                    reciprocal_ranks.append(rr)
+                else:
+                    warm.append(elapsed)
+        latencies = cold + warm
+        return {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+            "config": {
+                "embedder": embedder, "hybrid": hybrid, "k": k, "repeat": repeat, "docs": docs, "synthetic_chunks": synthetic,
+                "chunk_options": {key: value for key, value in rag.chunk_options.items() if key != "model_name"}
+            },
+            "corpus": {"files": len(paths), "chunks": chunks, "failed_files": len(summary["failed"]), "queries": len(labeled)},
+            "ingestion": {"seconds": ingest_seconds, "chunks_per_second": chunks / ingest_seconds if ingest_seconds else None},
+            "index_bytes": folder_size(db_path),
+            "latency_ms": {
+                "p50": percentile(latencies, 50), "p95": percentile(latencies, 95), "p99": percentile(latencies, 99),
+                "mean": float(np.mean(latencies)) if latencies else None,
+                # First pass embeds each query; later passes hit the embedding cache
+                "cold_p50": percentile(cold, 50), "warm_p50": percentile(warm, 50)
+            },
+            "quality": {
+                f"recall@{k}": float(np.mean(recalls)) if recalls else None,
+                "mrr": float(np.mean(reciprocal_ranks)) if reciprocal_ranks else None
+            },
+            "peak_rss_mb": peak_rss_mb()
+        }
+    finally:
+        if own_dir and not keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+def save_results(results, folder="bench_results"):
+    os.makedirs(folder, exist_ok=True)
+    stamp = results["timestamp"].replace(":", "").replace("-", "")
+    path = os.path.join(folder, f"retrieval_{stamp}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    return path
+
+def compare(results, baseline):
+    """Lines describing how the key metrics moved against a previous results file."""
+    k = results["config"]["k"]
+    metrics = [
+        ("latency p50 (ms)", ("latency_ms", "p50")),
+        ("latency p95 (ms)", ("latency_ms", "p95")),
+        ("latency p99 (ms)", ("latency_ms", "p99")),
+        ("chunks/s", ("ingestion", "chunks_per_second")),
+        ("index MB", ("index_bytes",)),
+        (f"recall@{k}", ("quality", f"recall@{k}")),
+        ("MRR", ("quality", "mrr"))
+    ]
+    lines = []
+    for label, keys in metrics:
+        new, old = results, baseline
+        for key in keys:
+            new = new.get(key) if isinstance(new, dict) else None
+            old = old.get(key) if isinstance(old, dict) else None
+        if new is None or old is None:
+            continue
+        if keys == ("index_bytes",):
+            new, old = new / 2**20, old / 2**20
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        lines.append(f"{label:<18} {old:>12.3f} -> {new:>12.3f}  ({change})")
+    return lines
@@ -0,0 +1,156 @@
+"""
+cli.py - Command-line tools for GRC Brain AI
+  python -m src.cli batch questions.csv [-o answers.csv] [--concurrency 4] [--k 3]
+  python -m src.cli bench [--synthetic 10000] [--embedder hashing] [--compare old.json]
+batch answers a questionnaire (CSV with a "question" column, JSONL or one question per
+line) with the same RAG + LLM pipeline as the chat, and writes answers with sources.
+An interrupted run resumes from its checkpoint when started again with the same output.
+bench measures retrieval latency, ingestion throughput and recall on a fresh index.
+"""
+import os
+import sys
+import argparse
+
+def _batch(args):
+    from src.ai_core.batch import BatchRunner, read_questions
+    from src.ai_core.ollama_client import get_client
+    from src.ai_core.services import ServiceContainer
+    questions = read_questions(args.questions, column=args.column, id_column=args.id_column)
+    if not questions:
+        print(f"[ERROR] No questions found in {args.questions}")
+        return 1
+    output = args.output or os.path.splitext(args.questions)[0] + ".answers.csv"
+    # Size the shared Ollama pool for this run before anything else creates it
+    get_client(args.ollama_host, max_concurrency=args.concurrency, max_queue=max(32, args.concurrency * 4), pool_size=max(8, args.concurrency))
+    services = ServiceContainer(db_path=args.db_path, ollama_host=args.ollama_host, model=args.model, profile=args.profile).start()
+    print("Loading knowledge base...")
+    rag = services.wait_rag()
+    if rag is None:
+        print(services.rag_error)
+        return 1
+    if services.llm.llm is None:
+        print(services.llm.error)
+        return 1
+    filters = {"framework": args.framework, "jurisdiction": args.jurisdiction}
+    runner = BatchRunner(rag, services.llm, k=args.k, concurrency=args.concurrency,
+                         retrieval_batch=args.retrieval_batch, language=args.language, filters=filters)
+
+    def progress(done, total, per_hour):
+        sys.stdout.write(f"\r{done}/{total} answered ({per_hour:.0f} questions/hour)")
+        sys.stdout.flush()
+
+    try:
+        summary = runner.run(questions, output, resume=not args.restart, progress=progress)
+    except KeyboardInterrupt:
+        print(f"\nInterrupted. Run the same command again to resume from {runner.checkpoint_path(output)}")
+        return 130
+    print()
+    print(f"{summary['answered']} answered, {summary['resumed']} resumed from checkpoint, {summary['failed']} failed "
+          f"in {summary['seconds']:.0f}s ({summary['per_hour']:.0f} questions/hour)")
+    print(f"Answers written to {summary['output']}")
+    if summary["failed"]:
+        print(f"Failed questions stay in {runner.checkpoint_path(output)} and are retried on the next run.")
+    return 0 if not summary["failed"] else 2
+
+def _bench(args):
+    import json
+    from src.benchmark.retrieval_bench import compare, run_benchmark, save_results
+    results = run_benchmark(docs=None if args.no_docs else args.docs, synthetic=args.synthetic, queries_path=args.queries,
+                            embedder=args.embedder, k=args.k, repeat=args.repeat, workers=args.workers,
+                            work_dir=args.work_dir, keep=args.keep, synthetic_queries=args.synthetic_queries,
+                            hybrid=not args.dense_only)
+    latency = results["latency_ms"]
+    quality = results["quality"]
+    print(f"Corpus: {results['corpus']['files']} files, {results['corpus']['chunks']} chunks, {results['corpus']['queries']} queries")
+    print(f"Ingestion: {results['ingestion']['chunks_per_second']:.1f} chunks/s, index {results['index_bytes'] / 2**20:.1f} MB")
+    print(f"Search latency ms: p50 {latency['p50']:.2f}  p95 {latency['p95']:.2f}  p99 {latency['p99']:.2f}")
+    print(f"recall@{args.k}: {quality[f'recall@{args.k}']:.3f}  MRR: {quality['mrr']:.3f}")
+    if results["peak_rss_mb"]:
+        print(f"Peak RSS MB: {results['peak_rss_mb']['process']:.0f} (ingestion workers: {results['peak_rss_mb']['children'] or 0:.0f})")
+    path = save_results(results, args.results_dir)
+    print(f"Results saved to {path}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.compare}:")
+        for line in compare(results, baseline):
+            print("  " + line)
+    return 0
+
+def _snapshot(args):
+    from src.ai_core.rag_system import GRCRAGSystem
+    from src.ai_core.snapshot import export_snapshot, import_legacy_json, import_snapshot
+    rag = GRCRAGSystem(db_path=args.db_path)
+
+    def progress(done, total):
+        sys.stdout.write(f"\r{done}/{total} records")
+        sys.stdout.flush()
+
+    if args.command == "export":
+        summary = export_snapshot(rag, args.path, batch_size=args.batch_size, progress=progress)
+    elif args.path.lower().endswith(".json"):
+        summary = import_legacy_json(rag, args.path, progress=progress)
+    else:
+        try:
+            summary = import_snapshot(rag, args.path, batch_size=args.batch_size, progress=progress)
+        except ValueError as e:
+            print(f"[ERROR] {e}")
+            return 1
+    print()
+    print(f"{summary['documents']} chunks and {summary['chat']} chat turns {'exported to' if args.command == 'export' else 'imported from'} {args.path}")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description="GRC Brain AI command-line tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    batch = commands.add_parser("batch", help="Answer a questionnaire file in bulk")
+    batch.add_argument("questions", help="CSV (question column), JSONL or TXT (one question per line)")
+    batch.add_argument("-o", "--output", help="Output .csv or .jsonl (default: <questions>.answers.csv)")
+    batch.add_argument("--column", default="question", help="Question column in CSV/JSONL input")
+    batch.add_argument("--id-column", default="id", help="Id column in CSV/JSONL input (default: row number)")
+    batch.add_argument("--k", type=int, default=3, help="Context chunks per question")
+    batch.add_argument("--concurrency", type=int, default=4, help="Generations in flight against Ollama")
+    batch.add_argument("--retrieval-batch", type=int, default=64, help="Questions per vectorized retrieval call")
+    batch.add_argument("--language", default="en", choices=["en", "es", "auto"])
+    batch.add_argument("--framework", action="append", help="Only use chunks of this framework (GDPR, NIST, ISO27001, ENS, ...); repeatable")
+    batch.add_argument("--jurisdiction", action="append", help="Only use chunks of this jurisdiction (EU, US, ES, International); repeatable")
+    batch.add_argument("--ollama-host", default="http://localhost:11434")
+    batch.add_argument("--model", default=None, help="Ollama model (default: the performance profile's)")
+    batch.add_argument("--profile", default=None, help="Performance profile to use and make active (Fast, Balanced, Accurate)")
+    batch.add_argument("--db-path", default="chromadb")
+    batch.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint and start over")
+    bench = commands.add_parser("bench", help="Benchmark retrieval latency, throughput and recall")
+    bench.add_argument("--docs", default="official_docs", help="Folder of .txt documents to index")
+    bench.add_argument("--no-docs", action="store_true", help="Index only the synthetic corpus")
+    bench.add_argument("--queries", default=None, help="Labeled queries JSON (default: src/benchmark/queries.json)")
+    bench.add_argument("--synthetic", type=int, default=0, help="Also index a synthetic corpus of this many chunks")
+    bench.add_argument("--synthetic-queries", type=int, default=200, help="Labeled queries generated for the synthetic corpus")
+    bench.add_argument("--embedder", default="hashing", help="'hashing' (offline, deterministic) or a sentence-transformers model")
+    bench.add_argument("--k", type=int, default=3)
+    bench.add_argument("--dense-only", action="store_true", help="Vector search only, without BM25 fusion")
+    bench.add_argument("--repeat", type=int, default=3, help="Times each query is replayed")
+    bench.add_argument("--workers", type=int, default=None, help="Ingestion worker processes")
+    bench.add_argument("--work-dir", default=None, help="Where to build the index (default: a temp folder)")
+    bench.add_argument("--keep", action="store_true", help="Keep the temporary index after the run")
+    bench.add_argument("--results-dir", default="bench_results")
+    bench.add_argument("--compare", default=None, help="Previous results JSON to compare against")
+    for name, help_text in (("export", "Write the knowledge base (text, metadata, vectors) to a .kbsnap snapshot"),
+                            ("import", "Load a .kbsnap snapshot (or an old JSON export) into the knowledge base")):
+        snapshot = commands.add_parser(name, help=help_text)
+        snapshot.add_argument("path", help="Snapshot file")
+        snapshot.add_argument("--db-path", default="chromadb")
+        snapshot.add_argument("--batch-size", type=int, default=1000, help="Records per Chroma call")
+    args = parser.parse_args(argv)
+    if args.command == "batch":
+        return _batch(args)
+    if args.command == "bench":
+        if args.queries is None:
+            from src.benchmark.retrieval_bench import QUERIES_PATH
+            args.queries = QUERIES_PATH
+        return _bench(args)
+    if args.command in ("export", "import"):
+        return _snapshot(args)
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,6 +2,7 @@
 GRCBrainApp - Main Application Window
 """
 import customtkinter as ctk
+from src.ai_core.services import ServiceContainer
 from src.gui.tabs.chat_tab import ChatTab
 
 class GRCBrainApp(ctk.CTk):
@@ -11,11 +12,11 @@ class GRCBrainApp(ctk.CTk):
         self.geometry("900x600")
         self.configure(bg="#181818")
         self.loader_frame = None
+        # Build LLM/RAG once, in the background, while the loader animates
+        self.services = ServiceContainer().start()
         self.after(100, self._show_loader)
 
     def _show_loader(self):
-        import time
-        import threading
         import os
         from PIL import Image, ImageTk
         self.loader_frame = ctk.CTkFrame(self, fg_color="#181818")
@@ -147,44 +148,26 @@ class GRCBrainApp(ctk.CTk):
         self.progress_canvas.place(relx=0.5, rely=0.95, anchor="s")
         self.progress_bar_bg = self.progress_canvas.create_rectangle(10, 10, 310, 22, fill="#23272a", outline="#ff9900", width=2)
         self.progress_bar_fg = self.progress_canvas.create_rectangle(10, 10, 10, 22, fill="#ff9900", outline="", width=0)
-        def animate_bar():
-            for i in range(1, 301):
-                try:
-                    if hasattr(self, 'progress_canvas') and self.progress_canvas.winfo_exists():
-                        self.progress_canvas.coords(self.progress_bar_fg, 10, 10, 10+i, 22)
-                        self.progress_canvas.update()
-                    else:
-                        break
-                except Exception:
-                    break
-                time.sleep(0.01)
-        threading.Thread(target=animate_bar, daemon=True).start()
-        def animate_and_load():
-            from src.ai_core.llm_client import GRCBrainLLM
-            from src.ai_core.rag_system import GRCRAGSystem
-            llm_ready = False
-            rag_ready = False
-            llm_check = None
-            rag_check = None
-            for i in range(30):
-                time.sleep(0.07)
-                if i == 5:
-                    llm_check = GRCBrainLLM()
-                    llm_ready = llm_check.llm is not None
-                if i == 15:
-                    rag_check = GRCRAGSystem()
-                    rag_ready = True
-            while not llm_ready:
-                time.sleep(0.2)
-                llm_check = GRCBrainLLM()
-            time.sleep(0.2)
-            self.after(0, self._finish_loader)
+        self._status_text_id = self.anim_canvas.create_text(win_w // 2, win_h - 70, text=self.services.status, font=('Segoe UI', 13), fill='white')
+        def update_progress():
+            # Real readiness from the service container, polled on the Tk thread
+            if not self.loader_frame or not self.progress_canvas.winfo_exists():
+                return
+            self.progress_canvas.coords(self.progress_bar_fg, 10, 10, 10 + int(300 * self.services.progress), 22)
+            self.anim_canvas.itemconfigure(self._status_text_id, text=self.services.status)
+            if self.services.llm_ready.is_set():
+                # Open the chat as soon as the LLM check is done; embeddings keep warming up
+                self._finish_loader()
+            else:
+                self.after(50, update_progress)
         def _finish_loader():
             if self.loader_frame:
                 self.loader_frame.destroy()
+                self.loader_frame = None
             self._setup_ui()
         self._finish_loader = _finish_loader
-        threading.Thread(target=animate_and_load, daemon=True).start()
+        update_progress()
+
     def _setup_ui(self):
-        self.chat_tab = ChatTab(self)
+        self.chat_tab = ChatTab(self, services=self.services)
         self.chat_tab.pack(fill="both", expand=True)
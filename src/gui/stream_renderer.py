@@ -0,0 +1,69 @@
+"""
+StreamRenderer - Incremental, frame-capped text rendering for streamed LLM answers
+Worker threads call feed()/finish(); all widget updates happen on the Tk thread
+through after(), at most `fps` times per second.
+"""
+import threading
+
+class StreamRenderer:
+    def __init__(self, textbox, tag="ai", fps=30):
+        self.textbox = textbox
+        self.tag = tag
+        self.interval = max(1, int(1000 / fps))
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._finished = False
+        self._stopped = False
+        self._on_done = None
+
+    def start(self):
+        """Start the render loop. Must be called from the Tk thread."""
+        self.textbox.after(self.interval, self._tick)
+
+    def feed(self, text):
+        """Queue text for display. Safe to call from any thread."""
+        if text:
+            with self._lock:
+                self._buffer.append(text)
+
+    def finish(self, on_done=None):
+        """Mark the stream complete; on_done runs on the Tk thread after the last chunk is drawn."""
+        with self._lock:
+            self._on_done = on_done
+            self._finished = True
+
+    def stop(self, note=""):
+        """
+        Tk thread only: draw what has arrived plus note right away, then ignore anything
+        fed later (the answer was cancelled); on_done is not called.
+        """
+        with self._lock:
+            text = "".join(self._buffer) + note
+            self._buffer.clear()
+            self._stopped = True
+        try:
+            if text:
+                self.textbox.insert("end", text, self.tag)
+        except Exception:
+            pass
+
+    def _tick(self):
+        if self._stopped:
+            return
+        with self._lock:
+            text = "".join(self._buffer)
+            self._buffer.clear()
+            finished = self._finished
+            on_done = self._on_done
+        try:
+            if text:
+                self.textbox.insert("end", text, self.tag)
+                self.textbox._textbox.see("end")
+        except Exception:
+            # Widget destroyed while streaming: stop rendering
+            return
+        if finished:
+            if on_done:
+                on_done()
+            return
+        self.textbox.after(self.interval, self._tick)
@@ -2,26 +2,80 @@
 ChatTab - Minimalist Professional Chat Interface for GRC Brain AI
 """
 import customtkinter as ctk
-import threading
-from src.ai_core.llm_client import GRCBrainLLM
-from src.ai_core.rag_system import GRCRAGSystem
+from src.ai_core.services import ServiceContainer
 from src.utils.feedback import FeedbackManager
+from src.gui.stream_renderer import StreamRenderer
+from src.gui.task_scheduler import TaskScheduler
+from src.utils.tracing import get_tracer, span
 from tkinter import filedialog, messagebox
 
 class ChatTab(ctk.CTkFrame):
-    def __init__(self, parent):
+    # Model selector label -> Ollama model name
+    MODELS = {"Llama 3 (Ollama)": "llama3:8b", "Mistral": "mistral", "Phi-3": "phi3"}
+
+    def __init__(self, parent, services=None):
         super().__init__(parent, fg_color="#222")
-        self.llm = GRCBrainLLM()
-        self.rag = GRCRAGSystem()
+        # Heavy components are built once by the shared container, never per tab
+        self.services = services or ServiceContainer().start()
+        self.services.llm_ready.wait()
+        self.llm = self.services.llm
         self.feedback = FeedbackManager()
         self.last_question = None
         self.last_answer = None
         self.feedback_btn = None
         self.history = []
-        self.k_results = 3
         self.page = 1
         self.uploaded_files = []  # Track uploaded files: [{'filename': ..., 'path': ..., 'date': ...}]
+        # Performance profile (src/ai_core/profiles.py): k and rerank are read here, the rest
+        # is applied to the LLM and caches by the container. Worker threads read the plain
+        # attributes, never the Tk variable.
+        profile = self.services.profile
+        self.performance_mode = ctk.StringVar(value=self.services.profiles.active)
+        self.k_results = profile["k"]
+        self.rerank_enabled = profile["rerank"]
+        # All background work goes through the scheduler; workers never touch widgets
+        self.scheduler = TaskScheduler(self).start()
+        # "Enable Data Retention" in Settings: answered turns go to chat memory only when on
+        self.data_retention_enabled = True
+        self._ask_task = None
+        self._ask_renderer = None
         self._setup_ui()
+        if not self.services.rag_ready.is_set():
+            self.info_bar.configure(text="⏳ Loading knowledge base...")
+            self.after(300, self._poll_services)
+        elif self.services.profile_notice:
+            self.info_bar.configure(text=f"⚠️ {self.services.profile_notice}")
+
+    @property
+    def rag(self):
+        # Worker threads only: waits if the embedding model is still warming up
+        rag = self.services.wait_rag()
+        if rag is None:
+            raise RuntimeError(self.services.rag_error or "Knowledge base not available.")
+        return rag
+
+    def _ready_rag(self, title):
+        """Tk callbacks: the RAG system if it is loaded, otherwise explain why not (never blocks)."""
+        if not self.services.rag_ready.is_set():
+            messagebox.showinfo(title, f"The knowledge base is still loading ({self.services.status}). Please try again in a moment.")
+            return None
+        if self.services.rag is None:
+            messagebox.showerror(title, self.services.rag_error or "Knowledge base not available.")
+            return None
+        return self.services.rag
+
+    def _poll_services(self):
+        if self.services.rag_ready.is_set():
+            if self.services.rag_error:
+                self.info_bar.configure(text=self.services.rag_error)
+            elif self.services.profile_notice:
+                # e.g. the profile's model is not pulled and another one is answering
+                self.info_bar.configure(text=f"⚠️ {self.services.profile_notice}")
+            else:
+                self._flash("✅ Knowledge base ready.")
+        else:
+            self.info_bar.configure(text=f"⏳ {self.services.status}")
+            self.after(300, self._poll_services)
 
     def _setup_ui(self):
         # Top bar with settings icon
@@ -81,37 +135,40 @@ class ChatTab(ctk.CTkFrame):
             info += f"🧠 Intent: {', '.join(matched_phrases)}  "
         self.info_bar.configure(text=info)
 
+    def _flash(self, text, ms=2000):
+        """Show a message in the info bar and clear it after ms, unless it was replaced (Tk thread)."""
+        self.info_bar.configure(text=text)
+        def clear():
+            if self.info_bar.cget("text") == text:
+                self.info_bar.configure(text="")
+        self.after(ms, clear)
+
     def _clear_chat(self):
         self.chat_display.delete("1.0", "end")
-        self.info_bar.configure(text="🧹 Screen cleared.")
-        import threading
-        def clear_info():
-            import time
-            time.sleep(2)
-            self.info_bar.configure(text="")
-        threading.Thread(target=clear_info, daemon=True).start()
+        self._flash("🧹 Screen cleared.")
 
     def _show_logs(self):
-        import os, json
-        log_path = os.path.join(os.getcwd(), "llm_query_log.json")
-        if os.path.exists(log_path):
-            with open(log_path, "r", encoding="utf-8") as f:
-                try:
-                    log_entries = json.load(f)
-                except Exception as e:
-                    messagebox.showerror("Logs & Usage Stats", f"Error reading log file: {e}")
-                    return
+        from src.utils.query_log import get_query_log
+        try:
+            # Only the tail segment is read; rotated segments stay on disk untouched
+            log_entries = get_query_log().read_tail(30)
+        except Exception as e:
+            messagebox.showerror("Logs & Usage Stats", f"Error reading log file: {e}")
+            return
+        if log_entries:
             # Build readable table
             table = "Timestamp        | Query         | Context Summary\n" + "-"*60 + "\n"
-            for entry in log_entries[:30]:
+            for entry in log_entries:
                 ts = entry.get("timestamp", "")[:19]
                 q = entry.get("query", "")[:20]
-                ctxs = entry.get("context", [])
+                ctxs = entry.get("context") or []
+                if not isinstance(ctxs, list):
+                    ctxs = [{"content": str(ctxs)}]
                 ctx_summary = ", ".join([c.get("content", "")[:40].replace("\n", " ") for c in ctxs])
                 if len(ctx_summary) > 60:
                     ctx_summary = ctx_summary[:57] + "..."
                 table += f"{ts:<18} | {q:<13} | {ctx_summary}\n"
-            messagebox.showinfo("Logs & Usage Stats", table + "\n(Showing latest 30 entries)")
+            messagebox.showinfo("Logs & Usage Stats", table + f"\n(Showing latest {len(log_entries)} entries)")
         else:
             messagebox.showinfo("Logs & Usage Stats", "No logs found.")
 
@@ -156,93 +213,122 @@ class ChatTab(ctk.CTkFrame):
         win.configure(bg="#23272a")
         ctk.CTkLabel(win, text="Export / Import Knowledge Base", font=("Segoe UI", 18, "bold"), text_color="#ff9800", bg_color="#23272a").pack(pady=(18,8))
         ctk.CTkLabel(win, text="Export current knowledge base to file:", font=("Segoe UI", 14), text_color="#fff", bg_color="#23272a").pack(pady=(8,2))
-        export_btn = ctk.CTkButton(win, text="Export to JSON", command=self._export_kb, fg_color="#23272a", text_color="#ff9800", font=("Segoe UI", 15), corner_radius=18)
+        export_btn = ctk.CTkButton(win, text="Export Snapshot", command=self._export_kb, fg_color="#23272a", text_color="#ff9800", font=("Segoe UI", 15), corner_radius=18)
         export_btn.pack(pady=(2,8))
         ctk.CTkLabel(win, text="Import knowledge base from file:", font=("Segoe UI", 14), text_color="#fff", bg_color="#23272a").pack(pady=(8,2))
-        import_btn = ctk.CTkButton(win, text="Import from JSON", command=self._import_kb, fg_color="#23272a", text_color="#ff9800", font=("Segoe UI", 15), corner_radius=18)
+        import_btn = ctk.CTkButton(win, text="Import Snapshot", command=self._import_kb, fg_color="#23272a", text_color="#ff9800", font=("Segoe UI", 15), corner_radius=18)
         import_btn.pack(pady=(2,8))
 
     def _export_kb(self):
-        # Export all documents in the vector DB to JSON
-        import json
-        import json
-        docs = self.rag.vector_db.similarity_search("*", k=1000)
-        kb_data = [{"content": d.page_content, "metadata": d.metadata} for d in docs]
-        file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files", "*.json")])
-        if file_path:
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(kb_data, f, indent=2)
-            messagebox.showinfo("Export Knowledge Base", f"Knowledge base exported to {file_path}")
+        # Snapshot of every chunk and chat turn with its vector (see src/ai_core/snapshot.py)
+        from src.ai_core.snapshot import EXTENSION, export_snapshot
+        rag = self._ready_rag("Export Knowledge Base")
+        if rag is None:
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=EXTENSION, filetypes=[("Knowledge base snapshot", f"*{EXTENSION}")])
+        if not file_path:
+            return
+        self._run_kb_job("Export Knowledge Base", "Exporting", lambda progress: export_snapshot(rag, file_path, progress=progress),
+                         lambda summary: f"Exported {summary['documents']} chunks and {summary['chat']} chat turns to {file_path}")
 
     def _import_kb(self):
-        import json
-        file_path = filedialog.askopenfilename(filetypes=[("JSON files", "*.json")])
-        if file_path:
-            with open(file_path, "r", encoding="utf-8") as f:
-                kb_data = json.load(f)
-            # Add each document to the vector DB
-            from langchain_core.documents import Document
-            for doc in kb_data:
-                d = Document(page_content=doc["content"], metadata=doc.get("metadata", {}))
-                self.rag.vector_db.add_documents([d])
-            messagebox.showinfo("Import Knowledge Base", f"Knowledge base imported from {file_path}")
+        from src.ai_core.snapshot import EXTENSION, import_legacy_json, import_snapshot
+        rag = self._ready_rag("Import Knowledge Base")
+        if rag is None:
+            return
+        file_path = filedialog.askopenfilename(filetypes=[("Knowledge base snapshot", f"*{EXTENSION}"), ("JSON export (re-embedded)", "*.json")])
+        if not file_path:
+            return
+        if file_path.lower().endswith(".json"):
+            job = lambda progress: import_legacy_json(rag, file_path, progress=progress)
+        else:
+            job = lambda progress: import_snapshot(rag, file_path, progress=progress)
+        self._run_kb_job("Import Knowledge Base", "Importing", job,
+                         lambda summary: f"Imported {summary['documents']} chunks and {summary['chat']} chat turns from {file_path}")
+
+    def _run_kb_job(self, title, verb, job, describe):
+        """Run a snapshot export/import on the ingest pool, with progress in the info bar."""
+        def progress(done, total):
+            self.scheduler.ui(self.info_bar.configure, text=f"⏳ {verb} knowledge base: {done}/{total}")
+        def done(summary):
+            message = describe(summary)
+            self.info_bar.configure(text=f"✅ {message}")
+            messagebox.showinfo(title, message)
+        def failed(e):
+            error = f"{verb} failed: {e}"
+            self.info_bar.configure(text=f"❌ {error}")
+            messagebox.showerror(title, error)
+        self.info_bar.configure(text=f"⏳ {verb} knowledge base...")
+        self.scheduler.submit("ingest", lambda task: job(progress), on_done=done, on_error=failed)
 
     def _reset_settings(self):
         # Real reset logic: clear chat history and clean RAG database
-        self.history.clear()
-        self.rag.clean_database()
-        self.info_bar.configure(text="Settings and data have been reset to default.")
-        messagebox.showinfo("Reset Settings", "Settings and data have been reset to default.")
+        rag = self._ready_rag("Reset Settings")
+        if rag is None:
+            return
+        self._clean_database(rag, "Reset Settings", "Settings and data have been reset to default.")
+
+    def _clean_database(self, rag, title, message):
+        """Wipe the knowledge base and chat memory on the rag lane; history and dialogs on the Tk thread."""
+        def done(_):
+            self.history.clear()
+            self.info_bar.configure(text=message)
+            messagebox.showinfo(title, message)
+        def failed(e):
+            self.info_bar.configure(text=f"❌ {title} failed: {e}")
+            messagebox.showerror(title, f"{title} failed: {e}")
+        self.info_bar.configure(text="⏳ Deleting knowledge base data...")
+        self.scheduler.submit("rag", lambda task: rag.clean_database(), on_done=done, on_error=failed)
 
     # ...existing code...
 
     def _on_model_change(self, value):
-        # Switch LLM model (stub: implement actual model switching logic)
-        self.model_var.set(value)
-        self.info_bar.configure(text=f"⚡ Model switched to: {value}")
-        import threading
-        def clear_info():
-            import time
-            time.sleep(3)
-            self.info_bar.configure(text="")
-        threading.Thread(target=clear_info, daemon=True).start()
-        # TODO: reload LLM with selected model and keep RAG integration
-
-    def _get_response(self, query):
+        # Same GRCBrainLLM (and RAG wiring), pointed at another local Ollama model
+        model = self.MODELS.get(value, value)
+        self.info_bar.configure(text=f"⏳ Switching model to: {value}...")
+        # On the LLM lane: waits for the answer being generated instead of switching mid-stream
+        self.scheduler.submit("llm", lambda task: self.llm.set_model(model), on_done=lambda error: self._model_switched(value, error))
+
+    def _model_switched(self, value, error):
+        if error:
+            self.info_bar.configure(text=f"❌ {error}")
+            return
+        self._flash(f"⚡ Model switched to: {value}", 3000)
+
+    def _get_response(self, task, query, renderer):
+        on_done = None
+        # Root span of one question: search, prompt, generation and logging nest under it
+        with span("chat.ask", chars=len(query)) as s:
+            try:
+                on_done = self._answer(task, query, renderer)
+            except Exception as e:
+                # Includes a knowledge base that failed to load: show it instead of hanging the renderer
+                s.set(error=str(e))
+                renderer.feed(f"Brain: [ERROR] {e}\n")
+            finally:
+                renderer.finish(on_done=on_done)
+        if on_done is not None and not task.cancelled:
+            self._record_latency(s)
+
+    def _record_latency(self, s):
+        # Answer time of the active profile, with the generation speed of this answer
+        rate = None
+        for record in get_tracer().records("llm.generate", 20):
+            if record["trace"] == getattr(s, "trace", None):
+                rate = record["attrs"].get("tokens_per_sec")
+        self.services.profiles.record(self.services.profiles.active, s.elapsed_ms() / 1000, rate)
+
+    def _answer(self, task, query, renderer):
+        """Worker-thread part of _get_response; returns the renderer's on_done callback."""
         k = self.k_results
         page = self.page
         language = "en"
-        # Check if user is requesting a PDF by name
-        import re
-        pdf_match = re.search(r"(?:pdf|document|archivo)\s+(de|del|de la)?\s*([\w\-.]+\.pdf)", query, re.IGNORECASE)
-        if pdf_match:
-            requested_pdf = pdf_match.group(2).strip().lower()
-            file_info = next((f for f in self.uploaded_files if f["filename"].lower() == requested_pdf), None)
-            if file_info:
-                self.chat_display.insert("end", f"Brain: Aquí tienes el PDF solicitado: {file_info['filename']}\n", "ai")
-                def open_file(path=file_info["path"]):
-                    import os, platform
-                    if platform.system() == "Windows":
-                        os.startfile(path)
-                    elif platform.system() == "Darwin":
-                        os.system(f"open '{path}'")
-                    else:
-                        os.system(f"xdg-open '{path}'")
-                start_idx = self.chat_display.index("end-2c")
-                self.chat_display.insert("end", f"📄 {file_info['filename']}\n", "ai")
-                self.chat_display._textbox.tag_add(f"file_{file_info['filename']}", start_idx, f"{start_idx} lineend")
-                self.chat_display._textbox.tag_bind(f"file_{file_info['filename']}", "<Button-1>", lambda e, p=file_info["path"]: open_file(p))
-                self.info_bar.configure(text="✅ PDF entregado al usuario.")
-                import threading
-                def clear_info():
-                    import time
-                    time.sleep(2)
-                    self.info_bar.configure(text="")
-                threading.Thread(target=clear_info, daemon=True).start()
-                return
         # Normal response flow
-        context = self.rag.search(query, k=k, page=page)
-        context_str = "\n".join([c["content"] for c in context]) if context else ""
+        # Documents first; one similar past answer from chat memory rides along
+        if self.rerank_enabled and page == 1:
+            context = self.rag.search_reranked(query, k=k, chat_k=1)
+        else:
+            context = self.rag.search(query, k=k, page=page, chat_k=1)
         sources = []
         if context:
             for c in context:
@@ -250,15 +336,57 @@ class ChatTab(ctk.CTkFrame):
                 if src and src not in sources:
                     sources.append(src)
         sources_str = ", ".join(sources)
-        full_query = f"{query}\nContext:\n{context_str}"
-        response = self.llm.ask(query, context=context, language=language)
+        if task.cancelled:
+            return None
+        # Stream the answer: chunks are drawn by the renderer on the Tk thread as they arrive
+        renderer.feed("Brain: ")
+        parts = []
+        stream = self.llm.ask_stream(query, context=context, language=language)
+        try:
+            for chunk in stream:
+                if task.cancelled:
+                    # A newer question replaced this one: closing the stream stops Ollama
+                    return None
+                parts.append(chunk)
+                renderer.feed(chunk)
+        finally:
+            stream.close()
+        renderer.feed("\n")
+        response = "".join(parts)
         self.last_answer = response
         self.history.append({"question": query, "answer": response, "language": language, "sources": sources_str})
-        self.rag.add_chat_to_db(query, response)
-        self.chat_display._textbox.tag_configure("ai", background="#23272a", foreground="#e2e8f0", justify="left", lmargin1=10, lmargin2=10, rmargin=60, font=("Inter", 16))
-        # Display answer
-        self.chat_display.insert("end", f"Brain: {response}\n", "ai")
-        self.chat_display._textbox.see("end")
+        if self.data_retention_enabled and self.services.chat_memory is not None:
+            # Queued: embedded and written in batches by the write-behind buffer
+            self.services.chat_memory.add(query, response)
+        return lambda: self._render_sources(sources)
+
+    def _deliver_file(self, query):
+        """Tk thread: if the user asks for an uploaded PDF by name, link it instead of answering."""
+        import re
+        pdf_match = re.search(r"(?:pdf|document|archivo)\s+(de|del|de la)?\s*([\w\-.]+\.pdf)", query, re.IGNORECASE)
+        if not pdf_match:
+            return False
+        requested_pdf = pdf_match.group(2).strip().lower()
+        file_info = next((f for f in self.uploaded_files if f["filename"].lower() == requested_pdf), None)
+        if not file_info:
+            return False
+        self.chat_display.insert("end", f"Brain: Aquí tienes el PDF solicitado: {file_info['filename']}\n", "ai")
+        def open_file(path=file_info["path"]):
+            import os, platform
+            if platform.system() == "Windows":
+                os.startfile(path)
+            elif platform.system() == "Darwin":
+                os.system(f"open '{path}'")
+            else:
+                os.system(f"xdg-open '{path}'")
+        start_idx = self.chat_display.index("end-2c")
+        self.chat_display.insert("end", f"📄 {file_info['filename']}\n", "ai")
+        self.chat_display._textbox.tag_add(f"file_{file_info['filename']}", start_idx, f"{start_idx} lineend")
+        self.chat_display._textbox.tag_bind(f"file_{file_info['filename']}", "<Button-1>", lambda e, p=file_info["path"]: open_file(p))
+        self._flash("✅ PDF entregado al usuario.")
+        return True
+
+    def _render_sources(self, sources):
         # Only show 'Sources:' and file buttons if there are actual sources (uploaded files/links)
         if sources:
             shown = False
@@ -280,15 +408,11 @@ class ChatTab(ctk.CTkFrame):
                     self.chat_display.insert("end", f"📄 {file_info['filename']}\n", "ai")
                     self.chat_display._textbox.tag_add(f"file_{file_info['filename']}", start_idx, f"{start_idx} lineend")
                     self.chat_display._textbox.tag_bind(f"file_{file_info['filename']}", "<Button-1>", lambda e, p=src: open_file(p))
+                    self.chat_display._textbox.see("end")
         # If no sources, do not show anything extra
         # Info bar feedback for response
         self.info_bar.configure(text="✅ Response received.")
-        import threading
-        def clear_info():
-            import time
-            time.sleep(2)
-            self.info_bar.configure(text="")
-        threading.Thread(target=clear_info, daemon=True).start()
+        self.after(2000, lambda: self.info_bar.configure(text=""))
 
     def _on_upload(self):
         import os
@@ -304,42 +428,58 @@ class ChatTab(ctk.CTkFrame):
             ("JSON files", "*.json")
         ])
         if file_paths:
-            for file_path in file_paths:
-                success = self.rag.add_document(file_path)
-                if success:
-                    file_info = {
-                        "filename": os.path.basename(file_path),
-                        "path": file_path,
-                        "date": datetime.now().isoformat()
-                    }
-                    self.uploaded_files.append(file_info)
-                    self.info_bar.configure(text=f"✅ {file_info['filename']} added to the knowledge base.")
-                    import threading
-                    def clear_info():
-                        import time
-                        time.sleep(3)
-                        self.info_bar.configure(text="")
-                    threading.Thread(target=clear_info, daemon=True).start()
+            if self.services.rag_ready.is_set() and self.services.rag is None:
+                messagebox.showerror("Add Document", self.services.rag_error or "Knowledge base not available.")
+                return
+            self.upload_btn.configure(state="disabled")
+            self.info_bar.configure(text=f"⏳ Indexing {len(file_paths)} file(s)...")
+
+            def on_progress(done, total, path, status):
+                # Called from the ingestion thread: hand the widget update to the Tk thread
+                if status == "failed":
+                    text = f"❌ Could not upload {os.path.basename(path)}. Only supported formats are allowed."
                 else:
-                    self.info_bar.configure(text=f"❌ Could not upload {os.path.basename(file_path)}. Only supported formats are allowed.")
-                    import threading
-                    def clear_info():
-                        import time
-                        time.sleep(3)
-                        self.info_bar.configure(text="")
-                    threading.Thread(target=clear_info, daemon=True).start()
+                    text = f"⏳ {done}/{total} indexed: {os.path.basename(path)}"
+                self.scheduler.ui(self.info_bar.configure, text=text)
+
+            def on_finished(summary):
+                for file_path in summary["added"] + summary["updated"] + summary["unchanged"]:
+                    if not any(f["path"] == file_path for f in self.uploaded_files):
+                        self.uploaded_files.append({
+                            "filename": os.path.basename(file_path),
+                            "path": file_path,
+                            "date": datetime.now().isoformat()
+                        })
+                indexed = len(file_paths) - len(summary["failed"])
+                if summary["failed"]:
+                    names = ", ".join(os.path.basename(p) for p in summary["failed"])
+                    self.info_bar.configure(text=f"❌ Could not upload {names}. Only supported formats are allowed.")
+                elif indexed == 1:
+                    self.info_bar.configure(text=f"✅ {os.path.basename(file_paths[0])} added to the knowledge base.")
+                else:
+                    self.info_bar.configure(text=f"✅ {indexed} files added to the knowledge base.")
+                self.upload_btn.configure(state="normal")
+                self.after(3000, lambda: self.info_bar.configure(text=""))
+
+            def ingest(task):
+                try:
+                    return self.rag.ingest_paths(list(file_paths), progress=on_progress)
+                except Exception as e:
+                    print(f"[ERROR] Ingestion failed: {e}")
+                    return {"added": [], "updated": [], "unchanged": [], "failed": list(file_paths)}
+            self.scheduler.submit("ingest", ingest, on_done=on_finished)
 
     def _open_settings(self):
         win = ctk.CTkToplevel(self)
         win.title("Settings")
-        win.geometry("420x520")
+        win.geometry("420x780")
         # Position window to the right of main window
         parent_x = self.winfo_rootx()
         parent_y = self.winfo_rooty()
         parent_w = self.winfo_width()
         win_x = parent_x + parent_w + 10
         win_y = parent_y + 40
-        win.geometry(f"420x520+{win_x}+{win_y}")
+        win.geometry(f"420x780+{win_x}+{win_y}")
         win.configure(bg="#23272a")
         win.grid_columnconfigure(0, weight=1)
         ctk.CTkLabel(win, text="Settings", font=("Segoe UI", 20, "bold"), text_color="#ff9800", bg_color="#23272a").grid(row=0, column=0, pady=(18,8), sticky="ew")
@@ -349,16 +489,40 @@ class ChatTab(ctk.CTkFrame):
         perf_frame.grid(row=1, column=0, padx=24, pady=(8,8), sticky="ew")
         perf_frame.grid_columnconfigure(0, weight=1)
         ctk.CTkLabel(perf_frame, text="Performance Mode", font=("Segoe UI", 16, "bold"), text_color="#ff9800", bg_color="#23272a").grid(row=0, column=0, pady=(0,6), sticky="w")
-        self.performance_mode = ctk.StringVar(value="Accurate")
         def set_perf_mode(val):
             self.performance_mode.set(val)
-            self.info_bar.configure(text=f"Performance mode set to: {val}")
-        perf_selector = ctk.CTkOptionMenu(perf_frame, variable=self.performance_mode, values=["Fast", "Accurate"], command=set_perf_mode, fg_color="#23272a", text_color="#ff9800", font=("Segoe UI", 13))
-        perf_selector.grid(row=1, column=0, pady=(2,8), sticky="ew")
+            profile = self.services.profiles.get(val)
+            self.k_results = profile["k"]
+            self.rerank_enabled = profile["rerank"]
+            self.info_bar.configure(text=f"⏳ Switching to {val} mode...")
+            # May switch the Ollama model: on the LLM lane, between answers
+            self.scheduler.submit("llm", lambda task: self.services.apply_profile(val),
+                                  on_done=lambda notice: self.info_bar.configure(text=notice or f"Performance mode set to: {val}"))
+        perf_selector = ctk.CTkOptionMenu(perf_frame, variable=self.performance_mode, values=self.services.profiles.names(), command=set_perf_mode, fg_color="#23272a", text_color="#ff9800", font=("Segoe UI", 13))
+        perf_selector.grid(row=1, column=0, pady=(2,4), sticky="ew")
+        profiles_label = ctk.CTkLabel(perf_frame, text="", font=("Consolas", 11), text_color="#e2e8f0", bg_color="#23272a", justify="left", anchor="w")
+        profiles_label.grid(row=2, column=0, pady=(0,8), sticky="ew")
+
+        # Performance Stats Section: live per-stage latency from the tracer's ring buffer
+        stats_frame = ctk.CTkFrame(win, fg_color="#23272a")
+        stats_frame.grid(row=2, column=0, padx=24, pady=(8,8), sticky="ew")
+        stats_frame.grid_columnconfigure(0, weight=1)
+        ctk.CTkLabel(stats_frame, text="Performance Stats", font=("Segoe UI", 16, "bold"), text_color="#ff9800", bg_color="#23272a").grid(row=0, column=0, pady=(0,6), sticky="w")
+        stats_label = ctk.CTkLabel(stats_frame, text="", font=("Consolas", 11), text_color="#e2e8f0", bg_color="#23272a", justify="left", anchor="w")
+        stats_label.grid(row=1, column=0, sticky="ew")
+        def refresh_stats():
+            if not win.winfo_exists():
+                return
+            stats_label.configure(text=self._format_stats(get_tracer().stats()))
+            profiles_label.configure(text=self._format_profiles())
+            win.after(1000, refresh_stats)
+        refresh_stats()
+        trace_btn = ctk.CTkButton(stats_frame, text="Export Trace", fg_color="#23272a", text_color="#ff9800", font=("Segoe UI", 15), corner_radius=18, command=self._export_trace)
+        trace_btn.grid(row=2, column=0, pady=(6,8), sticky="ew")
 
         # Database Management Section
         db_frame = ctk.CTkFrame(win, fg_color="#23272a")
-        db_frame.grid(row=2, column=0, padx=24, pady=(12,8), sticky="ew")
+        db_frame.grid(row=3, column=0, padx=24, pady=(12,8), sticky="ew")
         db_frame.grid_columnconfigure(0, weight=1)
         ctk.CTkLabel(db_frame, text="Database Management", font=("Segoe UI", 16, "bold"), text_color="#ff9800", bg_color="#23272a").grid(row=0, column=0, pady=(0,6), sticky="w")
         backup_btn = ctk.CTkButton(db_frame, text="Backup Database", fg_color="#388e3c", text_color="#fffde7", font=("Segoe UI", 15), corner_radius=18, command=self._export_kb)
@@ -366,34 +530,38 @@ class ChatTab(ctk.CTkFrame):
         def confirm_delete():
             if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete ALL AI data? This cannot be undone."):
                 if messagebox.askyesno("Final Confirmation", "This will permanently delete all knowledge base and chat history. Proceed?"):
-                    self.rag.clean_database()
-                    self.history.clear()
-                    self.info_bar.configure(text="All AI data deleted.")
-                    messagebox.showinfo("Delete All Data", "All AI data has been deleted.")
+                    rag = self._ready_rag("Delete All Data")
+                    if rag is None:
+                        return
+                    self._clean_database(rag, "Delete All Data", "All AI data has been deleted.")
         delete_btn = ctk.CTkButton(db_frame, text="Delete All Data", fg_color="#c62828", text_color="#fffde7", font=("Segoe UI", 15, "bold"), corner_radius=18, command=confirm_delete)
         delete_btn.grid(row=2, column=0, pady=(2,8), sticky="ew")
 
         # Privacy Controls Section
         privacy_frame = ctk.CTkFrame(win, fg_color="#23272a")
-        privacy_frame.grid(row=3, column=0, padx=24, pady=(8,8), sticky="ew")
+        privacy_frame.grid(row=4, column=0, padx=24, pady=(8,8), sticky="ew")
         privacy_frame.grid_columnconfigure(0, weight=1)
         ctk.CTkLabel(privacy_frame, text="Privacy Controls", font=("Segoe UI", 16, "bold"), text_color="#ff9800", bg_color="#23272a").grid(row=0, column=0, pady=(0,6), sticky="w")
         self.logging_enabled = ctk.BooleanVar(value=True)
-        self.data_retention_enabled = ctk.BooleanVar(value=True)
+        retention_var = ctk.BooleanVar(value=self.data_retention_enabled)
         def toggle_logging():
             self.info_bar.configure(text=f"Logging {'enabled' if self.logging_enabled.get() else 'disabled'}.")
         def toggle_retention():
-            self.info_bar.configure(text=f"Data retention {'enabled' if self.data_retention_enabled.get() else 'disabled'}.")
+            # Worker threads read the plain flag; turning it off also drops turns not stored yet
+            self.data_retention_enabled = retention_var.get()
+            if self.services.chat_memory is not None:
+                self.services.chat_memory.set_enabled(self.data_retention_enabled)
+            self.info_bar.configure(text=f"Data retention {'enabled' if self.data_retention_enabled else 'disabled'}.")
         log_switch = ctk.CTkSwitch(privacy_frame, text="Enable Logging", variable=self.logging_enabled, command=toggle_logging, fg_color="#23272a", progress_color="#ff9800")
         log_switch.grid(row=1, column=0, pady=(2,2), sticky="w")
-        retention_switch = ctk.CTkSwitch(privacy_frame, text="Enable Data Retention", variable=self.data_retention_enabled, command=toggle_retention, fg_color="#23272a", progress_color="#ff9800")
+        retention_switch = ctk.CTkSwitch(privacy_frame, text="Enable Data Retention", variable=retention_var, command=toggle_retention, fg_color="#23272a", progress_color="#ff9800")
         retention_switch.grid(row=2, column=0, pady=(2,8), sticky="w")
         export_user_btn = ctk.CTkButton(privacy_frame, text="Export User Data", fg_color="#23272a", text_color="#ff9800", font=("Segoe UI", 15), corner_radius=18, command=self._show_logs)
         export_user_btn.grid(row=3, column=0, pady=(2,8), sticky="ew")
 
         # About/Support Section
         about_frame = ctk.CTkFrame(win, fg_color="#23272a")
-        about_frame.grid(row=4, column=0, padx=24, pady=(8,8), sticky="ew")
+        about_frame.grid(row=5, column=0, padx=24, pady=(8,8), sticky="ew")
         about_frame.grid_columnconfigure(0, weight=1)
         ctk.CTkLabel(about_frame, text="About & Support", font=("Segoe UI", 16, "bold"), text_color="#ff9800", bg_color="#23272a").grid(row=0, column=0, pady=(0,6), sticky="w")
         ctk.CTkLabel(about_frame, text="Brain AI v1.0\nAuthor: dogsouldev\nFor support visit:", font=("Segoe UI", 13), text_color="#fff", bg_color="#23272a").grid(row=1, column=0, sticky="w")
@@ -403,14 +571,68 @@ class ChatTab(ctk.CTkFrame):
         support_btn = ctk.CTkButton(about_frame, text="Support Website", fg_color="#23272a", text_color="#ff9800", font=("Segoe UI", 15), corner_radius=18, command=open_support)
         support_btn.grid(row=2, column=0, pady=(2,8), sticky="ew")
 
+    # Stages shown in the stats panel, in pipeline order
+    STATS_STAGES = [
+        ("chat.ask", "Total"), ("rag.search", "Search"), ("rag.embed_query", "  Embed"),
+        ("rag.vector_query", "  Chroma"), ("rag.lexical_query", "  BM25"), ("rag.rerank", "Rerank"), ("llm.cache_lookup", "Answer cache"), ("llm.prompt", "Prompt"),
+        ("llm.generate", "Generate"), ("llm.log_query", "Query log"), ("rag.add_chat", "Chat memory")
+    ]
+
+    def _format_profiles(self):
+        lines = []
+        for name in self.services.profiles.names():
+            summary = self.services.profiles.summary(name)
+            if summary is None:
+                lines.append(f"{name:<10} not measured yet")
+                continue
+            rate = f"  {summary['tokens_per_sec']:.0f} tok/s" if summary["tokens_per_sec"] else ""
+            lines.append(f"{name:<10} p50 {summary['p50_s']:.1f}s  p95 {summary['p95_s']:.1f}s  n={summary['count']}{rate}")
+        return "\n".join(lines)
+
+    def _format_stats(self, stats):
+        if not stats:
+            return "No questions timed yet."
+        lines = [f"{'stage':<13}{'n':>5}{'p50 ms':>9}{'p95 ms':>9}"]
+        for name, label in self.STATS_STAGES:
+            entry = stats.get(name)
+            if entry:
+                lines.append(f"{label:<13}{entry['count']:>5}{entry['p50_ms']:>9.0f}{entry['p95_ms']:>9.0f}")
+        generate = stats.get("llm.generate") or {}
+        if generate.get("tokens_per_sec"):
+            lines.append(f"Generation: {generate['tokens_per_sec']:.1f} tokens/s ({generate['tokens']} tokens)")
+        ttft = [r["attrs"]["ttft_ms"] for r in get_tracer().records("llm.generate", limit=50) if r["attrs"].get("ttft_ms")]
+        if ttft:
+            lines.append(f"First token: {sorted(ttft)[len(ttft) // 2]:.0f} ms (median of last {len(ttft)})")
+        return "\n".join(lines)
+
+    def _export_trace(self):
+        path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Trace JSON", "*.json")], initialfile="grc_brain_trace.json")
+        if not path:
+            return
+        try:
+            count = get_tracer().export_chrome(path)
+            messagebox.showinfo("Export Trace", f"{count} spans exported to {path}.\nOpen it in chrome://tracing or https://ui.perfetto.dev")
+        except Exception as e:
+            messagebox.showerror("Export Trace", f"Could not export trace: {e}")
+
     def _on_ask(self):
         query = self.input_entry.get()
         if not query.strip():
             self.info_bar.configure(text="Please enter a message.")
             return
+        if self._ask_task is not None and not self._ask_task.done():
+            # Only the latest question gets an answer: stop the one still streaming
+            self._ask_task.cancel()
+            self._ask_renderer.stop(" [stopped]\n")
         self.chat_display.insert("end", f"\nYou: {query}\n", "user")
         self.chat_display._textbox.see("end")
-        self.last_question = query
-        threading.Thread(target=self._get_response, args=(query,), daemon=True).start()
         self.input_entry.delete(0, "end")
+        self.last_question = query
+        if self._deliver_file(query):
+            return
+        self.chat_display._textbox.tag_configure("ai", background="#23272a", foreground="#e2e8f0", justify="left", lmargin1=10, lmargin2=10, rmargin=60, font=("Inter", 16))
+        renderer = StreamRenderer(self.chat_display, tag="ai")
+        renderer.start()
+        self._ask_renderer = renderer
+        self._ask_task = self.scheduler.submit("llm", self._get_response, query, renderer)
 
@@ -0,0 +1,109 @@
+"""
+TaskScheduler - Background work for the GUI with Tk-safe result dispatch
+Jobs run on small, bounded thread pools, one per kind of work ("llm", "rag", "ingest"),
+so a long ingestion never delays an answer and a burst of clicks cannot start dozens
+of threads. Workers never touch Tk: they hand callables to ui(), and the Tk thread runs
+them from a queue drained by after() with a per-frame time budget, so the window keeps
+redrawing at the target frame rate while results pour in.
+"""
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+LANES = {"llm": 1, "rag": 2, "ingest": 1}
+
+class Task:
+    """Handle of a submitted job. Jobs check `cancelled` and stop early when it is set."""
+
+    def __init__(self, lane):
+        self.lane = lane
+        self.future = None
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+        if self.future is not None:
+            # Not started yet: it never runs
+            self.future.cancel()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+class TaskScheduler:
+    def __init__(self, widget, lanes=None, fps=60):
+        self.widget = widget
+        self.interval = max(1, int(1000 / fps))
+        # Spend at most half a frame running queued UI updates, then let Tk draw
+        self.frame_budget = self.interval / 2000
+        self._updates = queue.SimpleQueue()
+        self._pools = {
+            lane: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"GUI-{lane}")
+            for lane, workers in (lanes or LANES).items()
+        }
+        self._running = False
+
+    def start(self):
+        """Start draining UI updates. Must be called from the Tk thread."""
+        if not self._running:
+            self._running = True
+            self.widget.after(self.interval, self._drain)
+        return self
+
+    def submit(self, lane, fn, *args, on_done=None, on_error=None):
+        """
+        Run fn(task, *args) on the lane's pool. on_done(result) / on_error(exc) run on
+        the Tk thread (not for cancelled tasks); without on_error errors are printed.
+        """
+        task = Task(lane)
+
+        def run():
+            if task.cancelled:
+                return None
+            try:
+                result = fn(task, *args)
+            except Exception as e:
+                if on_error:
+                    self.ui(on_error, e)
+                else:
+                    print(f"[ERROR] Background task failed: {e}")
+                return None
+            if on_done and not task.cancelled:
+                self.ui(on_done, result)
+            return result
+
+        task.future = self._pools[lane].submit(run)
+        return task
+
+    def ui(self, fn, *args):
+        """Run fn(*args) on the Tk thread at the next frame. Safe to call from any thread."""
+        self._updates.put((fn, args))
+
+    def shutdown(self):
+        self._running = False
+        for pool in self._pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _drain(self):
+        if not self._running:
+            return
+        deadline = time.perf_counter() + self.frame_budget
+        while time.perf_counter() < deadline:
+            try:
+                fn, args = self._updates.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                fn(*args)
+            except Exception as e:
+                # A widget closed while its update was queued must not stop the loop
+                print(f"[WARNING] UI update failed: {e}")
+        try:
+            self.widget.after(self.interval, self._drain)
+        except Exception:
+            # Widget destroyed: stop
+            self.shutdown()
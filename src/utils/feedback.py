@@ -1,37 +1,183 @@
 """
 FeedbackManager - Feedback management and self-improvement for GRC Brain AI
+Ratings are stored in SQLite (WAL mode) with indexes on timestamp and rating. Running
+totals, the rating distribution and per-question aggregates are updated in the same
+transaction as each insert, so overall stats and the worst-rated questions are read
+without scanning the log. An old feedback_log.json is imported once, streamed item
+by item, and kept next to the database as feedback_log.json.migrated.
 """
 import os
-import json
-from datetime import datetime
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from src.utils.json_stream import iter_json
+
+def _rating(value):
+    rating = float(value)
+    return int(rating) if rating.is_integer() else rating
+
+def _timestamp(value):
+    """ISO timestamp for a window bound: datetime, ISO string, or timedelta (that long ago)."""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, timedelta):
+        value = datetime.now() - value
+    return value.isoformat()
+
+def _question_key(question):
+    return " ".join(question.lower().split())
 
 class FeedbackManager:
-    def __init__(self, log_path="feedback_log.json"):
-        self.log_path = log_path
-        if not os.path.exists(self.log_path):
-            with open(self.log_path, "w", encoding="utf-8") as f:
-                json.dump([], f)
+    def __init__(self, db_path="feedback.sqlite3", legacy_path="feedback_log.json"):
+        self.db_path = db_path
+        self.legacy_path = legacy_path
+        folder = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(folder, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS feedback ("
+            " id INTEGER PRIMARY KEY, timestamp TEXT NOT NULL, question TEXT, answer TEXT, rating REAL NOT NULL, comment TEXT);"
+            "CREATE INDEX IF NOT EXISTS feedback_timestamp ON feedback (timestamp);"
+            "CREATE INDEX IF NOT EXISTS feedback_rating ON feedback (rating);"
+            # Aggregates kept up to date on insert
+            "CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0), count INTEGER NOT NULL, rating_sum REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS rating_counts (rating REAL PRIMARY KEY, count INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS questions ("
+            " key TEXT PRIMARY KEY, question TEXT, count INTEGER NOT NULL, rating_sum REAL NOT NULL,"
+            " min_rating REAL NOT NULL, last_timestamp TEXT);"
+            "CREATE INDEX IF NOT EXISTS questions_avg ON questions (rating_sum / count);"
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);"
+        )
+        self._conn.commit()
+        if legacy_path and os.path.exists(legacy_path) and not self._get_meta("legacy_migrated"):
+            self.migrate_legacy(legacy_path)
+
+    def _get_meta(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _insert(self, entries):
+        """Insert (timestamp, question, answer, rating, comment) rows and update the aggregates. Caller commits."""
+        self._conn.executemany("INSERT INTO feedback (timestamp, question, answer, rating, comment) VALUES (?, ?, ?, ?, ?)", entries)
+        self._conn.executemany(
+            "INSERT INTO totals VALUES (0, 1, ?) ON CONFLICT (id) DO UPDATE SET count = count + 1, rating_sum = rating_sum + excluded.rating_sum",
+            [(e[3],) for e in entries]
+        )
+        self._conn.executemany(
+            "INSERT INTO rating_counts VALUES (?, 1) ON CONFLICT (rating) DO UPDATE SET count = count + 1",
+            [(e[3],) for e in entries]
+        )
+        self._conn.executemany(
+            "INSERT INTO questions VALUES (?, ?, 1, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET"
+            " count = count + 1, rating_sum = rating_sum + excluded.rating_sum,"
+            " min_rating = MIN(min_rating, excluded.min_rating), last_timestamp = MAX(last_timestamp, excluded.last_timestamp)",
+            [(_question_key(e[1]), e[1], e[3], e[3], e[0]) for e in entries]
+        )
 
     def add_feedback(self, question, answer, rating, comment=None):
-        entry = {
-            "timestamp": datetime.now().isoformat(),
-            "question": question,
-            "answer": answer,
-            "rating": rating,
-            "comment": comment or ""
+        entry = (datetime.now().isoformat(), question or "", answer or "", _rating(rating), comment or "")
+        with self._lock:
+            with self._conn:
+                self._insert([entry])
+
+    def migrate_legacy(self, path, batch_size=1000):
+        """Import a JSON array of feedback entries in one streaming pass; returns (imported, skipped)."""
+        imported = skipped = 0
+        batch = []
+        with self._lock:
+            # One transaction: an interrupted migration leaves nothing behind and is retried
+            with self._conn, open(path, "r", encoding="utf-8") as f:
+                for _, item in iter_json(f):
+                    try:
+                        batch.append((item.get("timestamp") or datetime.now().isoformat(), item.get("question") or "",
+                                      item.get("answer") or "", _rating(item["rating"]), item.get("comment") or ""))
+                    except (AttributeError, KeyError, TypeError, ValueError):
+                        skipped += 1
+                        continue
+                    if len(batch) >= batch_size:
+                        self._insert(batch)
+                        imported += len(batch)
+                        batch = []
+                if batch:
+                    self._insert(batch)
+                    imported += len(batch)
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('legacy_migrated', ?)", (datetime.now().isoformat(),))
+        try:
+            os.replace(path, path + ".migrated")
+        except OSError as e:
+            print(f"[WARNING] Feedback migrated, but {path} could not be renamed: {e}")
+        if skipped:
+            print(f"[WARNING] Skipped {skipped} feedback entries without a valid rating in {path}")
+        return imported, skipped
+
+    def get_feedback(self, since=None, until=None, limit=None):
+        """Entries (oldest first), optionally within [since, until) and capped to the latest `limit`."""
+        query = "SELECT timestamp, question, answer, rating, comment FROM feedback"
+        clauses, params = self._window(since, until)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        if limit:
+            query = f"SELECT * FROM ({query} ORDER BY timestamp DESC LIMIT ?)"
+            params.append(limit)
+        query += " ORDER BY timestamp"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [{"timestamp": t, "question": q, "answer": a, "rating": _rating(r), "comment": c} for t, q, a, r, c in rows]
+
+    @staticmethod
+    def _window(since, until):
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(_timestamp(since))
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(_timestamp(until))
+        return clauses, params
+
+    def get_stats(self, since=None, until=None):
+        """
+        {"total", "avg_rating", "by_rating"}. Without a window this reads the running
+        aggregates; since/until (datetime, ISO string or timedelta) use the timestamp index.
+        """
+        with self._lock:
+            if since is None and until is None:
+                row = self._conn.execute("SELECT count, rating_sum FROM totals WHERE id = 0").fetchone() or (0, 0)
+                by_rating = self._conn.execute("SELECT rating, count FROM rating_counts ORDER BY rating").fetchall()
+            else:
+                clauses, params = self._window(since, until)
+                where = " WHERE " + " AND ".join(clauses)
+                row = self._conn.execute(f"SELECT COUNT(*), COALESCE(SUM(rating), 0) FROM feedback{where}", params).fetchone()
+                by_rating = self._conn.execute(f"SELECT rating, COUNT(*) FROM feedback{where} GROUP BY rating ORDER BY rating", params).fetchall()
+        total, rating_sum = row
+        return {
+            "total": total,
+            "avg_rating": rating_sum / total if total else 0,
+            "by_rating": {_rating(r): n for r, n in by_rating}
         }
-        with open(self.log_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        data.append(entry)
-        with open(self.log_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-
-    def get_feedback(self):
-        with open(self.log_path, "r", encoding="utf-8") as f:
-            return json.load(f)
-
-    def get_stats(self):
-        feedback = self.get_feedback()
-        total = len(feedback)
-        avg_rating = sum(f["rating"] for f in feedback) / total if total else 0
-        return {"total": total, "avg_rating": avg_rating}
+
+    def worst_questions(self, limit=10, min_count=1, since=None, until=None):
+        """Questions with the lowest average rating: [{"question", "count", "avg_rating", "min_rating", "last_timestamp"}]."""
+        with self._lock:
+            if since is None and until is None:
+                rows = self._conn.execute(
+                    "SELECT question, count, rating_sum / count, min_rating, last_timestamp FROM questions"
+                    " WHERE count >= ? ORDER BY rating_sum / count, count DESC LIMIT ?", (min_count, limit)
+                ).fetchall()
+            else:
+                clauses, params = self._window(since, until)
+                rows = self._conn.execute(
+                    "SELECT MIN(question), COUNT(*), AVG(rating), MIN(rating), MAX(timestamp) FROM feedback"
+                    f" WHERE {' AND '.join(clauses)} GROUP BY LOWER(TRIM(question))"
+                    " HAVING COUNT(*) >= ? ORDER BY AVG(rating), COUNT(*) DESC LIMIT ?", params + [min_count, limit]
+                ).fetchall()
+        return [{"question": q, "count": n, "avg_rating": avg, "min_rating": _rating(low), "last_timestamp": last}
+                for q, n, avg, low, last in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
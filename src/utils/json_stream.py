@@ -0,0 +1,101 @@
+"""
+json_stream.py - Incremental JSON reading for large files
+Yields the items of a top-level JSON array (or the key/value pairs of a top-level
+object) while reading the file in blocks, so memory is bounded by the largest item.
+"""
+import json
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+class _Reader:
+    def __init__(self, f, block_size):
+        self.f = f
+        self.block_size = block_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size=None):
+        if self.eof:
+            return False
+        data = self.f.read(size or self.block_size)
+        if not data:
+            self.eof = True
+            return False
+        # Drop consumed text before growing the buffer
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def skip_ws(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf) or not self.fill():
+                return
+
+    def peek(self):
+        self.skip_ws()
+        return self.buf[self.pos] if self.pos < len(self.buf) else ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        self.skip_ws()
+        size = self.block_size
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+                # A value touching the end of the buffer may be truncated (e.g. a number)
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return obj
+            except ValueError:
+                if self.eof:
+                    raise
+            # Grow geometrically so a huge item is not re-parsed once per block
+            self.fill(size)
+            size *= 2
+
+def iter_json(f, block_size=1024 * 1024):
+    """
+    Stream a JSON document from a text file object.
+    Top-level array: yields (index, item). Top-level object: yields (key, value).
+    Any other top-level value is yielded once as (None, value).
+    """
+    reader = _Reader(f, block_size)
+    first = reader.peek()
+    if first == "[":
+        reader.pos += 1
+        index = 0
+        if reader.peek() == "]":
+            return
+        while True:
+            yield index, reader.value()
+            index += 1
+            nxt = reader.peek()
+            reader.pos += 1
+            if nxt == "]":
+                return
+            if nxt != ",":
+                raise ValueError(f"Expected ',' or ']' after array item {index}")
+    elif first == "{":
+        reader.pos += 1
+        if reader.peek() == "}":
+            return
+        while True:
+            key = reader.value()
+            reader.expect(":")
+            yield key, reader.value()
+            nxt = reader.peek()
+            reader.pos += 1
+            if nxt == "}":
+                return
+            if nxt != ",":
+                raise ValueError(f"Expected ',' or '}}' after key {key!r}")
+    elif first:
+        yield None, reader.value()
@@ -0,0 +1,173 @@
+"""
+query_log.py - Append-only JSONL query log with a background writer for GRC Brain AI
+Entries go to <base>.jsonl through a bounded queue. A single writer thread appends
+them in batches, fsyncs at most once per flush interval and rotates the active
+segment by size or age. Rotated segments are listed in <base>.index.json.
+"""
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+from collections import deque
+from datetime import datetime
+
+_logs = {}
+_logs_lock = threading.Lock()
+
+def get_query_log(base_path="llm_query_log", **kwargs):
+    """Returns the shared QueryLog for base_path, so every writer in the process uses one thread."""
+    key = os.path.abspath(base_path)
+    with _logs_lock:
+        log = _logs.get(key)
+        if log is None:
+            log = QueryLog(base_path, **kwargs)
+            _logs[key] = log
+        return log
+
+class QueryLog:
+    def __init__(self, base_path="llm_query_log", max_bytes=5 * 1024 * 1024, max_age=24 * 3600,
+                 queue_size=1000, batch_size=64, flush_interval=1.0):
+        self.base_path = base_path
+        self.active_path = f"{base_path}.jsonl"
+        self.index_path = f"{base_path}.index.json"
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._index_lock = threading.Lock()
+        self._index = self._load_index()
+        folder = os.path.dirname(os.path.abspath(self.active_path))
+        os.makedirs(folder, exist_ok=True)
+        self._file = open(self.active_path, "a", encoding="utf-8")
+        if not self._index.get("active_started"):
+            self._index["active_started"] = time.time()
+            self._save_index()
+        self._thread = threading.Thread(target=self._run, name="QueryLogWriter", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def append(self, entry, timeout=0.5):
+        """Queue an entry for writing. Never blocks the caller for more than timeout seconds."""
+        if self._stop.is_set():
+            return False
+        try:
+            self._queue.put(entry, timeout=timeout)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def close(self):
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+    def segments(self):
+        """Rotated segments, oldest first: [{'file', 'started', 'ended', 'entries', 'bytes'}, ...]"""
+        with self._index_lock:
+            return list(self._index.get("segments", []))
+
+    def read_tail(self, limit=30):
+        """
+        Return the latest entries (newest first) reading only the active segment,
+        or the last rotated one if the active segment was just rotated and is empty.
+        """
+        path = self.active_path
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            segments = self.segments()
+            if not segments:
+                return []
+            path = os.path.join(os.path.dirname(os.path.abspath(self.active_path)), segments[-1]["file"])
+            if not os.path.exists(path):
+                return []
+        tail = deque(maxlen=limit)
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    tail.append(json.loads(line))
+                except ValueError:
+                    # A torn last line after a crash is skipped, not fatal
+                    continue
+        return list(reversed(tail))
+
+    def _load_index(self):
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                pass
+        return {"segments": [], "active_started": None}
+
+    def _save_index(self):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def _run(self):
+        pending = 0
+        last_sync = time.monotonic()
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                batch = []
+            while batch and len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch:
+                for entry in batch:
+                    self._file.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+                pending += len(batch)
+                self._file.flush()
+            now = time.monotonic()
+            if pending and (now - last_sync >= self.flush_interval or self._stop.is_set()):
+                os.fsync(self._file.fileno())
+                pending = 0
+                last_sync = now
+            self._maybe_rotate()
+            if self._stop.is_set() and self._queue.empty():
+                break
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+    def _maybe_rotate(self):
+        size = self._file.tell()
+        if size == 0:
+            return
+        started = self._index.get("active_started") or time.time()
+        if size < self.max_bytes and time.time() - started < self.max_age:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        with open(self.active_path, "r", encoding="utf-8") as f:
+            entries = sum(1 for _ in f)
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        segment_name = f"{os.path.basename(self.base_path)}.{stamp}.jsonl"
+        segment_path = os.path.join(os.path.dirname(os.path.abspath(self.active_path)), segment_name)
+        os.replace(self.active_path, segment_path)
+        with self._index_lock:
+            self._index.setdefault("segments", []).append({
+                "file": segment_name,
+                "started": datetime.fromtimestamp(started).isoformat(),
+                "ended": datetime.now().isoformat(),
+                "entries": entries,
+                "bytes": size
+            })
+            self._index["active_started"] = time.time()
+            self._save_index()
+        self._file = open(self.active_path, "a", encoding="utf-8")
@@ -2,6 +2,7 @@
 spellcheck_utils.py - English-only spellchecking utility for DsD GRC AI
 """
 from spellchecker import SpellChecker
+from src.utils.tracing import span
 
 class SpellcheckUtils:
     def phrase_match(self, text, patterns=None):
@@ -23,9 +24,10 @@ class SpellcheckUtils:
         Preprocess user input: spellcheck, autocorrect, and phrase match for regulatory/legal/colloquial terms.
         Returns dict with corrected text, misspelled words, suggestions, and matched phrases.
         """
-        spell_result = self.check_spelling(text)
-        corrected = self.autocorrect(text)
-        matched_phrases = self.phrase_match(corrected)
+        with span("spellcheck", words=len(text.split())):
+            spell_result = self.check_spelling(text)
+            corrected = self.autocorrect(text)
+            matched_phrases = self.phrase_match(corrected)
         return {
             'original': text,
             'corrected': corrected,
@@ -0,0 +1,206 @@
+"""
+tracing.py - Lightweight in-process tracing for the GRC Brain AI ask pipeline
+Spans time each stage (spellcheck, embedding, Chroma query, prompt building, Ollama
+generation, query logging) and nest per thread / asyncio task. Finished spans go to a
+bounded ring buffer; stats() summarizes them per stage and export_chrome() writes the
+Chrome trace event format (chrome://tracing, https://ui.perfetto.dev).
+"""
+import os
+import json
+import time
+import itertools
+import threading
+import functools
+import contextvars
+from collections import deque
+
+_current = contextvars.ContextVar("grc_trace_span", default=None)
+_tracer = None
+_tracer_lock = threading.Lock()
+
+def get_tracer():
+    """Shared Tracer for the process."""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+        return _tracer
+
+def span(name, **attrs):
+    """with span("rag.search", k=3) as s: ... s.set(hits=3)"""
+    return get_tracer().span(name, **attrs)
+
+def traced(name):
+    """Decorator form of span() for whole functions."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+class Span:
+    __slots__ = ("tracer", "name", "attrs", "id", "parent", "trace", "start", "end", "_token", "_parent_span")
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.id = None
+        self.parent = None
+        self.trace = None
+        self.start = None
+        self.end = None
+        self._token = None
+        self._parent_span = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+        return self
+
+    def elapsed_ms(self):
+        return ((self.end or time.perf_counter()) - self.start) * 1000
+
+    def __enter__(self):
+        parent = _current.get()
+        self._parent_span = parent
+        self.id = next(self.tracer._ids)
+        self.parent = parent.id if parent else None
+        self.trace = parent.trace if parent else self.id
+        self._token = _current.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        if exc_type is not None and exc_type is not GeneratorExit:
+            self.attrs["error"] = f"{exc_type.__name__}: {exc}"
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # Ended in another context (e.g. a generator closed elsewhere): just restore the parent
+            _current.set(self._parent_span)
+        self.tracer._finish(self)
+        return False
+
+class _NoSpan:
+    def set(self, **attrs):
+        return self
+
+    def elapsed_ms(self):
+        return 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+class Tracer:
+    def __init__(self, capacity=5000, enabled=True):
+        self.enabled = enabled
+        self.spans = deque(maxlen=capacity)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # perf_counter has no epoch: remember where it was at a known wall-clock time
+        self._origin = (time.time(), time.perf_counter())
+
+    def span(self, name, **attrs):
+        return Span(self, name, attrs) if self.enabled else _NoSpan()
+
+    def _finish(self, span):
+        record = {
+            "id": span.id,
+            "parent": span.parent,
+            "trace": span.trace,
+            "name": span.name,
+            "start": self._origin[0] + (span.start - self._origin[1]),
+            "ms": (span.end - span.start) * 1000,
+            "thread": threading.current_thread().name,
+            "tid": threading.get_ident(),
+            "attrs": dict(span.attrs)
+        }
+        with self._lock:
+            self.spans.append(record)
+
+    def record(self, name, ms, **attrs):
+        """Add a stage that was timed elsewhere (e.g. in an ingestion worker process) as a child of the current span."""
+        if not self.enabled:
+            return
+        parent = _current.get()
+        end = time.perf_counter()
+        record = {
+            "id": next(self._ids),
+            "parent": parent.id if parent else None,
+            "trace": parent.trace if parent else None,
+            "name": name,
+            "start": self._origin[0] + (end - ms / 1000 - self._origin[1]),
+            "ms": ms,
+            "thread": threading.current_thread().name,
+            "tid": threading.get_ident(),
+            "attrs": attrs
+        }
+        if record["trace"] is None:
+            record["trace"] = record["id"]
+        with self._lock:
+            self.spans.append(record)
+
+    def records(self, name=None, limit=None):
+        with self._lock:
+            spans = list(self.spans)
+        if name:
+            spans = [s for s in spans if s["name"] == name]
+        return spans[-limit:] if limit else spans
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+    def stats(self):
+        """{stage: {count, mean_ms, p50_ms, p95_ms, max_ms[, tokens, tokens_per_sec]}} over the ring buffer."""
+        by_name = {}
+        for record in self.records():
+            by_name.setdefault(record["name"], []).append(record)
+        stats = {}
+        for name, records in by_name.items():
+            times = sorted(r["ms"] for r in records)
+            entry = {
+                "count": len(times),
+                "mean_ms": sum(times) / len(times),
+                "p50_ms": times[int(0.50 * (len(times) - 1))],
+                "p95_ms": times[int(0.95 * (len(times) - 1))],
+                "max_ms": times[-1]
+            }
+            rates = [r["attrs"]["tokens_per_sec"] for r in records if r["attrs"].get("tokens_per_sec")]
+            if rates:
+                entry["tokens"] = sum((r["attrs"].get("tokens") or 0) for r in records)
+                entry["tokens_per_sec"] = sum(rates) / len(rates)
+            stats[name] = entry
+        return stats
+
+    def export_chrome(self, path):
+        """Write the buffered spans as Chrome trace events; returns the number of spans written."""
+        records = self.records()
+        pid = os.getpid()
+        events = []
+        threads = {}
+        for r in records:
+            threads[r["tid"]] = r["thread"]
+            events.append({
+                "name": r["name"],
+                "cat": r["name"].split(".", 1)[0],
+                "ph": "X",
+                "ts": r["start"] * 1e6,
+                "dur": r["ms"] * 1000,
+                "pid": pid,
+                "tid": r["tid"],
+                "args": dict(r["attrs"], span=r["id"], parent=r["parent"], trace=r["trace"])
+            })
+        for tid, thread_name in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}})
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+        return len(records)
@@ -0,0 +1,7 @@
+"""
+conftest.py - Shared pytest setup: makes the `src` package importable from the repo root
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
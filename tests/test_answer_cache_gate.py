@@ -0,0 +1,44 @@
+"""
+test_answer_cache_gate.py - GRCBrainLLM consults the answer cache for questions, not greetings
+"""
+import pytest
+from src.ai_core.llm_client import GRCBrainLLM
+
+class RecordingCache:
+    def __init__(self, answer=None):
+        self.answer = answer
+        self.lookups = []
+        self.stored = []
+
+    def lookup(self, model, query, context, language):
+        self.lookups.append(query)
+        return self.answer
+
+    def store(self, model, query, context, answer, language):
+        self.stored.append((query, answer))
+
+def make_llm(cache):
+    # No Ollama needed: only the cache helpers are exercised
+    llm = GRCBrainLLM.__new__(GRCBrainLLM)
+    llm.model = "llama3:8b"
+    llm.answer_cache = cache
+    return llm
+
+@pytest.mark.parametrize("question", [
+    "Which GDPR article covers notification of personal data breaches?",
+    "What are the supplier security requirements in ISO 27001?",
+])
+def test_questions_use_the_cache(question):
+    cache = RecordingCache(answer="Article 33.")
+    llm = make_llm(cache)
+    assert llm._cached_answer(question, "", "en") == "Article 33."
+    llm._store_answer(question, "", "en", "Article 33.")
+    assert cache.lookups == [question]
+    assert cache.stored == [(question, "Article 33.")]
+
+def test_greetings_skip_the_cache():
+    cache = RecordingCache(answer="cached")
+    llm = make_llm(cache)
+    assert llm._cached_answer("hi there", "", "en") is None
+    llm._store_answer("hi there", "", "en", "Hello!")
+    assert cache.lookups == [] and cache.stored == []
@@ -0,0 +1,33 @@
+"""
+test_conversational.py - Greeting detection used by the prompt, the answer cache and chat memory
+"""
+import pytest
+from src.ai_core.llm_client import is_conversational
+from src.ai_core.chat_memory import ChatMemoryBuffer
+
+QUESTIONS = [
+    "Which GDPR article covers notification of personal data breaches?",
+    "What are the supplier security requirements in ISO 27001?",
+    "Can your organisation rely on SOC 2 for vendor due diligence?",
+    "What is ISO 27001?",
+    "Explain NIST CSF",
+]
+
+GREETINGS = ["hi", "Hello!", "hey there", "Good morning", "what's up?", "How are you today?", "thanks", "ok great"]
+
+@pytest.mark.parametrize("question", QUESTIONS)
+def test_questions_are_not_conversational(question):
+    assert not is_conversational(question)
+
+@pytest.mark.parametrize("greeting", GREETINGS)
+def test_greetings_are_conversational(greeting):
+    assert is_conversational(greeting)
+
+@pytest.mark.parametrize("question", QUESTIONS)
+def test_chat_memory_keeps_questions(question):
+    assert ChatMemoryBuffer.worth_keeping(question, "An answer.")
+
+def test_chat_memory_drops_greetings_and_errors():
+    assert not ChatMemoryBuffer.worth_keeping("hi", "Hello! How can I help?")
+    assert not ChatMemoryBuffer.worth_keeping(QUESTIONS[0], "[ERROR] Could not get response from LLM")
+    assert not ChatMemoryBuffer.worth_keeping(QUESTIONS[0], "  ")
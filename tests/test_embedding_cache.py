@@ -0,0 +1,55 @@
+"""
+test_embedding_cache.py - CachedEmbeddings: persistent document vectors, bounded query vectors
+"""
+import pytest
+
+pytest.importorskip("langchain_core")
+from src.ai_core.embedding_cache import EmbeddingCache, CachedEmbeddings, text_hash
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.documents = 0
+        self.queries = 0
+
+    def embed_documents(self, texts):
+        self.documents += len(texts)
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text):
+        self.queries += 1
+        return [float(len(text)), 2.0]
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"))
+    yield cache
+    cache.close()
+
+def test_documents_are_embedded_once_and_persisted(cache):
+    model = CountingEmbeddings()
+    embeddings = CachedEmbeddings(model, "m", cache)
+    assert embeddings.embed_documents(["a", "bb", "a"]) == [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0]]
+    assert model.documents == 2
+    assert CachedEmbeddings(model, "m", cache).embed_documents(["bb"]) == [[2.0, 1.0]]
+    assert model.documents == 2
+    assert cache.count("m") == 2
+
+def test_query_vectors_stay_in_memory_and_are_bounded(cache):
+    model = CountingEmbeddings()
+    embeddings = CachedEmbeddings(model, "m", cache, max_queries=2)
+    for query in ["q1", "q2", "q1", "q3"]:
+        embeddings.embed_query(query)
+    assert model.queries == 3
+    assert cache.count() == 0
+    # q2 was least recently used when q3 came in
+    embeddings.embed_query("q1")
+    assert model.queries == 3
+    embeddings.embed_query("q2")
+    assert model.queries == 4
+
+def test_persisted_query_vectors_are_removed(cache):
+    cache.put_many("m#query", [(text_hash("old question"), [0.5, 0.5])])
+    cache.put_many("m", [(text_hash("chunk"), [1.0, 1.0])])
+    CachedEmbeddings(CountingEmbeddings(), "m", cache)
+    assert cache.count("m#query") == 0
+    assert cache.count("m") == 1
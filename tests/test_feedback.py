@@ -0,0 +1,71 @@
+"""
+test_feedback.py - FeedbackManager running aggregates and legacy JSON migration
+"""
+import json
+import os
+from datetime import datetime, timedelta
+import pytest
+from src.utils.feedback import FeedbackManager
+
+@pytest.fixture
+def manager(tmp_path):
+    fm = FeedbackManager(str(tmp_path / "feedback.sqlite3"), legacy_path=str(tmp_path / "feedback_log.json"))
+    yield fm
+    fm.close()
+
+def test_running_aggregates(manager):
+    manager.add_feedback("What is GDPR Article 33?", "Breach notification.", 5)
+    manager.add_feedback("what is  GDPR article 33?", "Breach notification.", 3)
+    manager.add_feedback("Explain ISO 27001 A.5.19", "Supplier relationships.", 1, comment="wrong control")
+    stats = manager.get_stats()
+    assert stats["total"] == 3
+    assert stats["avg_rating"] == pytest.approx(3.0)
+    assert stats["by_rating"] == {1: 1, 3: 1, 5: 1}
+    worst = manager.worst_questions()
+    assert [w["question"] for w in worst] == ["Explain ISO 27001 A.5.19", "What is GDPR Article 33?"]
+    assert (worst[1]["count"], worst[1]["avg_rating"], worst[1]["min_rating"]) == (2, 4.0, 3)
+    assert manager.worst_questions(min_count=2)[0]["count"] == 2
+
+def test_aggregates_match_a_windowed_scan(manager):
+    for rating in (1, 2, 2, 4.5, 5):
+        manager.add_feedback("q", "a", rating)
+    assert manager.get_stats() == manager.get_stats(since=timedelta(days=1))
+    assert manager.get_stats(until=datetime.now() - timedelta(days=1))["total"] == 0
+
+def test_get_feedback_limit_returns_latest_oldest_first(manager):
+    for i in range(5):
+        manager.add_feedback(f"q{i}", "a", i + 1)
+    assert [f["question"] for f in manager.get_feedback(limit=2)] == ["q3", "q4"]
+    assert manager.get_feedback(limit=1)[0]["rating"] == 5
+
+def test_migrate_legacy(tmp_path):
+    legacy = tmp_path / "feedback_log.json"
+    legacy.write_text(json.dumps([
+        {"timestamp": "2024-01-01T10:00:00", "question": "Q1", "answer": "A1", "rating": 4, "comment": ""},
+        {"timestamp": "2024-01-02T10:00:00", "question": "Q2", "answer": "A2", "rating": "2"},
+        {"question": "no rating"},
+        "not an entry"
+    ]), encoding="utf-8")
+    fm = FeedbackManager(str(tmp_path / "feedback.sqlite3"), legacy_path=str(legacy))
+    try:
+        stats = fm.get_stats()
+        assert stats["total"] == 2
+        assert stats["by_rating"] == {2: 1, 4: 1}
+        assert [f["timestamp"] for f in fm.get_feedback()] == ["2024-01-01T10:00:00", "2024-01-02T10:00:00"]
+        assert not legacy.exists()
+        assert os.path.exists(str(legacy) + ".migrated")
+    finally:
+        fm.close()
+    # A new legacy file is not imported a second time
+    legacy.write_text(json.dumps([{"question": "Q3", "answer": "A3", "rating": 1}]), encoding="utf-8")
+    fm = FeedbackManager(str(tmp_path / "feedback.sqlite3"), legacy_path=str(legacy))
+    try:
+        assert fm.get_stats()["total"] == 2
+    finally:
+        fm.close()
+
+def test_migrate_legacy_reports_counts(manager, tmp_path):
+    path = tmp_path / "old.json"
+    path.write_text(json.dumps([{"question": f"q{i}", "rating": 3} for i in range(5)] + [{"rating": "bad"}]), encoding="utf-8")
+    assert manager.migrate_legacy(str(path), batch_size=2) == (5, 1)
+    assert manager.get_stats()["total"] == 5
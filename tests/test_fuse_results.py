@@ -0,0 +1,40 @@
+"""
+test_fuse_results.py - Reciprocal-rank fusion of per-query search results
+"""
+import pytest
+from src.ai_core.rag_system import GRCRAGSystem
+
+fuse_results = GRCRAGSystem.fuse_results
+
+def hit(chunk_id, content=None):
+    return {"id": chunk_id, "content": content or f"text {chunk_id}", "metadata": {"source": "doc.txt"}}
+
+def test_hits_found_by_several_queries_rank_first():
+    fused = fuse_results([[hit("a"), hit("b")], [hit("b"), hit("c")]], rrf_k=60)
+    assert [h["id"] for h in fused] == ["b", "a", "c"]
+    assert fused[0]["score"] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused[0]["queries"] == [0, 1]
+    assert fused[1]["queries"] == [0]
+
+def test_duplicates_are_merged_and_inputs_untouched():
+    first = hit("a")
+    fused = fuse_results([[first], [hit("a")], [hit("a")]])
+    assert len(fused) == 1
+    assert fused[0]["queries"] == [0, 1, 2]
+    assert fused[0]["metadata"] == {"source": "doc.txt"}
+    assert "score" not in first and "queries" not in first
+
+def test_hits_without_id_are_keyed_by_content():
+    fused = fuse_results([[{"content": "same"}], [{"content": "same"}, {"content": "other"}]])
+    assert [h["content"] for h in fused] == ["same", "other"]
+
+def test_rrf_k_flattens_rank_differences():
+    per_query = [[hit("a"), hit("b")]]
+    sharp = fuse_results(per_query, rrf_k=0)
+    flat = fuse_results(per_query, rrf_k=1000)
+    assert sharp[0]["score"] / sharp[1]["score"] == pytest.approx(2.0)
+    assert flat[0]["score"] / flat[1]["score"] == pytest.approx(1002 / 1001)
+
+def test_empty_input():
+    assert fuse_results([]) == []
+    assert fuse_results([[], []]) == []
@@ -0,0 +1,63 @@
+"""
+test_prompt_builder.py - PromptBuilder.fit deduplication and budget trimming
+"""
+from src.ai_core.prompt_builder import PromptBuilder
+
+def words(text):
+    return len(text.split())
+
+def builder(**kwargs):
+    # Word counts keep the expected budgets readable
+    return PromptBuilder(count_tokens=words, **kwargs)
+
+def test_everything_fits():
+    chunks = ["GDPR Article 33 covers breach notification.", "ISO 27001 lists supplier controls."]
+    out, info = builder().fit("breach notification", chunks, budget=100)
+    assert out == chunks
+    assert info == {"chunks": 2, "duplicate_chunks": 0, "trimmed_sentences": 0, "context_tokens": 11}
+
+def test_sentences_repeated_across_chunks_are_sent_once():
+    first = "Controllers notify the authority within 72 hours. Processors notify the controller."
+    second = "Processors notify the controller. Records of breaches are kept."
+    out, info = builder().fit("breach", [first, second], budget=100)
+    assert out == [first, "Records of breaches are kept."]
+    assert info["duplicate_chunks"] == 0
+
+def test_chunks_that_are_mostly_repeats_are_dropped():
+    first = "One. Two. Three. Four. Five."
+    second = "One. Two. Three. Four. Six."
+    out, info = builder(duplicate_ratio=0.8).fit("q", [first, second], budget=100)
+    assert out == [first]
+    assert info["duplicate_chunks"] == 1
+
+def test_sentence_repeated_inside_one_chunk_is_not_a_duplicate_chunk():
+    chunk = "Encrypt data at rest. Encrypt data at rest."
+    out, info = builder().fit("encrypt", [chunk], budget=100)
+    assert out == ["Encrypt data at rest."]
+    assert info["duplicate_chunks"] == 0
+
+def test_over_budget_keeps_sentences_related_to_the_question():
+    chunks = [
+        "Breach notification is due within 72 hours. The weather was pleasant that day.",
+        "Lunch was served at noon in the cafeteria. Notification goes to the supervisory authority."
+    ]
+    out, info = builder().fit("breach notification deadline", chunks, budget=14)
+    assert out == ["Breach notification is due within 72 hours.", "Notification goes to the supervisory authority."]
+    assert info["trimmed_sentences"] == 2
+    assert info["context_tokens"] <= 14
+
+def test_best_sentence_is_kept_even_over_budget():
+    out, info = builder().fit("access control policy", ["Access control policy must be documented and approved."], budget=2)
+    assert out == ["Access control policy must be documented and approved."]
+    assert info["context_tokens"] == 8
+
+def test_table_rows_keep_their_line_breaks():
+    chunk = "Control | Owner\nA.5.1 | CISO\nA.5.2 | DPO"
+    out, _ = builder().fit("owner", [chunk], budget=100)
+    assert out == [chunk]
+
+def test_build_puts_context_before_the_question():
+    system, prompt, info = builder().build("What is Article 33?", [{"content": "Article 33 covers breach notification."}], language="en")
+    assert "Answer in English" in system
+    assert prompt == "Context:\nArticle 33 covers breach notification.\n\nQuestion: What is Article 33?"
+    assert info["budget"] > 0
@@ -0,0 +1,79 @@
+"""
+test_search_cache.py - SearchCache LRU/TTL eviction and generation-based invalidation
+"""
+from src.ai_core import search_cache
+from src.ai_core.search_cache import SearchCache, normalize_query
+
+RESULTS = [{"content": "Article 33 requires notification within 72 hours.", "metadata": {"source": "gdpr.txt"}}]
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_normalized_queries_share_a_key():
+    cache = SearchCache()
+    assert cache.key("What does GDPR Art. 33 say?", 3) == cache.key("gdpr art. 33", 3)
+    assert cache.key("gdpr art. 33", 3) != cache.key("gdpr art. 33", 5)
+    assert normalize_query("the of") == "the of"
+
+def test_hit_and_miss_counters():
+    cache = SearchCache()
+    key = cache.key("gdpr breach", 3)
+    assert cache.get(key) is None
+    cache.put(key, RESULTS)
+    assert cache.get(key) == RESULTS
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(search_cache.time, "monotonic", clock)
+    cache = SearchCache(ttl=60)
+    cache.put("k", RESULTS)
+    clock.now += 59
+    assert cache.get("k") == RESULTS
+    clock.now += 2
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
+
+def test_least_recently_used_is_evicted_first():
+    cache = SearchCache(max_entries=2)
+    cache.put("a", RESULTS)
+    cache.put("b", RESULTS)
+    cache.get("a")
+    cache.put("c", RESULTS)
+    assert cache.get("b") is None
+    assert cache.get("a") == RESULTS and cache.get("c") == RESULTS
+    assert cache.stats()["evictions"] == 1
+
+def test_byte_limit_evicts_and_oversized_results_are_skipped():
+    size = search_cache._result_size(RESULTS)
+    cache = SearchCache(max_bytes=size * 2)
+    for key in ("a", "b", "c"):
+        cache.put(key, RESULTS)
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["bytes"] <= size * 2
+    cache.put("huge", RESULTS * 3)
+    assert cache.get("huge") is None
+
+def test_invalidate_bumps_generation_and_clears():
+    cache = SearchCache()
+    cache.put("k", RESULTS)
+    cache.invalidate()
+    assert cache.get("k") is None
+    assert cache.stats()["generation"] == 1
+    assert cache.stats()["bytes"] == 0
+
+def test_results_from_an_older_generation_are_not_stored():
+    cache = SearchCache()
+    generation = cache.generation
+    # The collection changes while the search is running
+    cache.invalidate()
+    cache.put("k", RESULTS, generation=generation)
+    assert cache.get("k") is None
+    cache.put("k", RESULTS, generation=cache.generation)
+    assert cache.get("k") == RESULTS
@@ -0,0 +1,86 @@
+"""
+test_snapshot.py - Knowledge-base snapshot export/import round trip (no re-embedding)
+"""
+import hashlib
+import zipfile
+import pytest
+
+pytest.importorskip("langchain_chroma")
+from langchain_core.embeddings import Embeddings
+from src.ai_core.rag_system import GRCRAGSystem
+from src.ai_core.snapshot import export_snapshot, import_snapshot, read_header
+
+class HashEmbeddings(Embeddings):
+    """Deterministic 16-dim vectors; counts calls so the test can tell nothing was re-embedded."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def _vector(self, text):
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        return [b / 255.0 for b in digest[:16]]
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+def make_rag(path, model="test-hash-16"):
+    return GRCRAGSystem(db_path=str(path), embedding_model=model, embeddings=HashEmbeddings())
+
+@pytest.fixture
+def source(tmp_path):
+    doc = tmp_path / "gdpr.txt"
+    doc.write_text(
+        "Article 33. In the case of a personal data breach, the controller shall notify the supervisory "
+        "authority within 72 hours.\n\nArticle 34. The controller shall communicate the breach to the data "
+        "subject without undue delay.", encoding="utf-8")
+    rag = make_rag(tmp_path / "source_db")
+    assert rag.add_document(str(doc))
+    rag.add_chat_turns([("Which article covers breach notification?", "Article 33 of the GDPR.")])
+    return rag
+
+def contents(rag):
+    result = {}
+    for name, collection in (("documents", rag.vector_db._collection), ("chat", rag.chat_db._collection)):
+        page = collection.get(include=["documents", "metadatas", "embeddings"])
+        result[name] = {
+            i: (d, m, [round(float(x), 6) for x in e])
+            for i, d, m, e in zip(page["ids"], page["documents"], page["metadatas"], page["embeddings"])
+        }
+    return result
+
+def test_round_trip_restores_chunks_vectors_and_bm25(source, tmp_path):
+    path = str(tmp_path / "kb.kbsnap")
+    summary = export_snapshot(source, path, batch_size=1)
+    assert summary["chat"] == 1 and summary["documents"] >= 1
+    assert summary["dim"] == 16
+    header = read_header(path)
+    assert header["embedding_model"] == "test-hash-16"
+    assert header["count"] == summary["count"]
+    with zipfile.ZipFile(path) as zf:
+        assert set(zf.namelist()) == {"snapshot.json", "records.jsonl", "embeddings.npy"}
+
+    target = make_rag(tmp_path / "target_db")
+    restored = import_snapshot(target, path, batch_size=2)
+    assert restored == {"count": summary["count"], "documents": summary["documents"], "chat": 1}
+    assert contents(target) == contents(source)
+    # Stored vectors were used: the target's model never embedded a document
+    assert target.embeddings.embeddings.calls == 0
+    hits = target.search("72 hours supervisory authority", k=1)
+    assert hits and "72 hours" in hits[0]["content"]
+
+def test_import_rejects_another_embedding_model(source, tmp_path):
+    path = str(tmp_path / "kb.kbsnap")
+    export_snapshot(source, path)
+    other = make_rag(tmp_path / "other_db", model="another-model")
+    with pytest.raises(ValueError):
+        import_snapshot(other, path)
+
+def test_empty_knowledge_base(tmp_path):
+    rag = make_rag(tmp_path / "empty_db")
+    path = str(tmp_path / "empty.kbsnap")
+    assert export_snapshot(rag, path)["count"] == 0
+    assert import_snapshot(make_rag(tmp_path / "restore_db"), path)["count"] == 0
@@ -0,0 +1,22 @@
+"""
+test_tracing.py - Tracer.stats token totals and GRCBrainLLM span attributes
+"""
+from src.utils.tracing import Tracer
+from src.ai_core.llm_client import GRCBrainLLM
+
+def test_stats_tolerates_missing_token_counts():
+    tracer = Tracer()
+    tracer.record("llm.generate", 100.0, tokens=40, tokens_per_sec=20.0)
+    tracer.record("llm.generate", 50.0, tokens=None, tokens_per_sec=10.0)
+    tracer.record("llm.generate", 80.0, tokens_per_sec=15.0)
+    entry = tracer.stats()["llm.generate"]
+    assert entry["count"] == 3
+    assert entry["tokens"] == 40
+    assert entry["tokens_per_sec"] == 15.0
+
+def test_token_attrs_omit_unknown_counts():
+    assert GRCBrainLLM._token_attrs({}, 120.0) == {}
+    attrs = GRCBrainLLM._token_attrs({"eval_count": 50, "eval_duration": 2e9, "prompt_eval_count": 300}, 3000.0)
+    assert attrs == {"tokens": 50, "prompt_tokens": 300, "tokens_per_sec": 25.0}
+    # Streaming without Ollama's counters: the chunk count and wall time stand in
+    assert GRCBrainLLM._token_attrs({}, 2000.0, chunks=10) == {"tokens": 10, "tokens_per_sec": 5.0}